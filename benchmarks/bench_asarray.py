@@ -0,0 +1,37 @@
+import numpy as np
+
+from streamlines.asarray import distance, length, reorient, resample, smooth
+
+from .synthetic import random_points
+
+
+class AsArray(object):
+    """Benchmarks the kernels that operate on a single streamline"""
+
+    params = [20, 200, 2000]
+    param_names = ['nb_points']
+
+    def setup(self, nb_points):
+        self.left = random_points(nb_points, seed=0)
+        self.right = random_points(nb_points, seed=1)
+
+    def time_distance(self, nb_points):
+        distance(self.left, self.right)
+
+    def time_length(self, nb_points):
+        length(self.left)
+
+    def time_reorient(self, nb_points):
+        reorient(self.left, self.right)
+
+    def time_resample(self, nb_points):
+        resample(self.left, 20)
+
+    def time_smooth(self, nb_points):
+        smooth(self.left)
+
+    def peakmem_resample(self, nb_points):
+        resample(self.left, 20)
+
+    def peakmem_smooth(self, nb_points):
+        smooth(self.left)
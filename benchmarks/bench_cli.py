@@ -0,0 +1,57 @@
+import os
+import tempfile
+
+from streamlines.cli.commands.filter import filter
+from streamlines.cli.commands.info import info
+from streamlines.cli.commands.merge import merge
+from streamlines.cli.commands.reorient import reorient
+from streamlines.cli.commands.smooth import smooth
+
+from .synthetic import SCALES
+from .synthetic import random_file
+
+
+class CLI(object):
+    """Benchmarks the commands of the CLI from file to file"""
+
+    params = SCALES
+    param_names = ['nb_streamlines']
+    timeout = 3600
+
+    def setup_cache(self):
+
+        directory = tempfile.mkdtemp()
+        for nb_streamlines in SCALES:
+            filename = os.path.join(directory, f'{nb_streamlines}.trk')
+            random_file(filename, nb_streamlines)
+
+        return directory
+
+    def setup(self, directory, nb_streamlines):
+        self.input = os.path.join(directory, f'{nb_streamlines}.trk')
+        self.output = os.path.join(directory, f'{nb_streamlines}-out.trk')
+
+    def teardown(self, directory, nb_streamlines):
+        if os.path.exists(self.output):
+            os.remove(self.output)
+
+    def time_filter(self, directory, nb_streamlines):
+        filter(self.input, self.output, min_length=50)
+
+    def time_info(self, directory, nb_streamlines):
+        info(self.input)
+
+    def time_merge(self, directory, nb_streamlines):
+        merge([self.input, self.input], self.output)
+
+    def time_reorient(self, directory, nb_streamlines):
+        reorient(self.input, self.output)
+
+    def time_smooth(self, directory, nb_streamlines):
+        smooth(self.input, self.output)
+
+    def peakmem_filter(self, directory, nb_streamlines):
+        filter(self.input, self.output, min_length=50)
+
+    def peakmem_smooth(self, directory, nb_streamlines):
+        smooth(self.input, self.output)
@@ -0,0 +1,48 @@
+import os
+import tempfile
+
+import streamlines as sl
+
+from .synthetic import SCALES
+from .synthetic import random_file
+from .synthetic import random_streamlines
+
+
+class IO(object):
+    """Benchmarks loading and saving streamlines"""
+
+    params = SCALES
+    param_names = ['nb_streamlines']
+    timeout = 3600
+
+    def setup_cache(self):
+
+        # The input files are generated once and shared by all the
+        # benchmarks of the class.
+        directory = tempfile.mkdtemp()
+        for nb_streamlines in SCALES:
+            filename = os.path.join(directory, f'{nb_streamlines}.trk')
+            random_file(filename, nb_streamlines)
+
+        return directory
+
+    def setup(self, directory, nb_streamlines):
+        self.input = os.path.join(directory, f'{nb_streamlines}.trk')
+        self.output = os.path.join(directory, f'{nb_streamlines}-out.trk')
+        self.streamlines = random_streamlines(nb_streamlines)
+
+    def teardown(self, directory, nb_streamlines):
+        if os.path.exists(self.output):
+            os.remove(self.output)
+
+    def time_load(self, directory, nb_streamlines):
+        sl.io.load(self.input)
+
+    def time_save(self, directory, nb_streamlines):
+        sl.io.save(self.streamlines, self.output)
+
+    def peakmem_load(self, directory, nb_streamlines):
+        sl.io.load(self.input)
+
+    def peakmem_save(self, directory, nb_streamlines):
+        sl.io.save(self.streamlines, self.output)
@@ -0,0 +1,73 @@
+import streamlines as sl
+
+from .synthetic import SCALES
+from .synthetic import random_arrays
+from .synthetic import random_streamlines
+
+
+class Streamlines(object):
+    """Benchmarks the operations of the Streamlines container"""
+
+    params = SCALES
+    param_names = ['nb_streamlines']
+    timeout = 3600
+
+    # Most operations modify the streamlines in place, so each measurement
+    # must start from a freshly generated tractogram.
+    number = 1
+    warmup_time = 0
+
+    def setup(self, nb_streamlines):
+        self.streamlines = random_streamlines(nb_streamlines)
+
+    def time_init(self, nb_streamlines):
+        sl.Streamlines(self.streamlines)
+
+    def time_lengths(self, nb_streamlines):
+        self.streamlines.lengths
+
+    def time_filter(self, nb_streamlines):
+        self.streamlines.filter(min_length=50)
+
+    def time_reorient(self, nb_streamlines):
+        self.streamlines.reorient()
+
+    def time_resample(self, nb_streamlines):
+        self.streamlines.resample(20)
+
+    def time_reverse(self, nb_streamlines):
+        self.streamlines.reverse()
+
+    def time_smooth(self, nb_streamlines):
+        self.streamlines.smooth()
+
+    def peakmem_init(self, nb_streamlines):
+        sl.Streamlines(self.streamlines)
+
+    def peakmem_filter(self, nb_streamlines):
+        self.streamlines.filter(min_length=50)
+
+    def peakmem_resample(self, nb_streamlines):
+        self.streamlines.resample(20)
+
+    def peakmem_smooth(self, nb_streamlines):
+        self.streamlines.smooth()
+
+
+class Merge(object):
+    """Benchmarks the concatenation of Streamlines instances"""
+
+    params = SCALES
+    param_names = ['nb_streamlines']
+    timeout = 3600
+    number = 1
+    warmup_time = 0
+
+    def setup(self, nb_streamlines):
+        arrays = random_arrays(nb_streamlines)
+        half = nb_streamlines // 2
+        self.left = sl.Streamlines(arrays[:half])
+        self.right = sl.Streamlines(arrays[half:])
+
+    def time_iadd(self, nb_streamlines):
+        self.left += self.right
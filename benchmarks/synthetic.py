@@ -0,0 +1,92 @@
+import numpy as np
+
+import streamlines as sl
+
+
+# The scales at which container and I/O operations are benchmarked. They go
+# from a single bundle to a whole brain tractogram.
+SCALES = [1000, 100000, 1000000]
+
+# Tractography output typically uses steps between 0.2mm and 1mm. The number
+# of points of the synthetic streamlines varies uniformly in this range.
+STEP_SIZE = 0.5
+MIN_NB_POINTS = 20
+MAX_NB_POINTS = 200
+
+
+def random_points(nb_points, seed=0):
+    """Generates the points of a single smooth random streamline
+
+    The streamline is a random walk with a fixed step size whose direction
+    changes slowly, which mimics the output of a tractography algorithm.
+
+    Args:
+        nb_points: The number of points of the streamline.
+        seed: The seed of the random number generator.
+
+    """
+
+    rng = np.random.RandomState(seed)
+    return _random_walks(np.array([nb_points]), rng)[0]
+
+
+def random_arrays(nb_streamlines, seed=0):
+    """Generates the points of a synthetic tractogram
+
+    The number of points of each streamline is drawn uniformly between
+    MIN_NB_POINTS and MAX_NB_POINTS. All the points are generated in a single
+    vectorized pass and then split into individual streamlines.
+
+    Args:
+        nb_streamlines: The number of streamlines to generate.
+        seed: The seed of the random number generator.
+
+    Returns:
+        A list of (N, 3) arrays of float.
+
+    """
+
+    rng = np.random.RandomState(seed)
+    nb_points = rng.randint(
+        MIN_NB_POINTS, MAX_NB_POINTS + 1, size=nb_streamlines)
+    return _random_walks(nb_points, rng)
+
+
+def random_streamlines(nb_streamlines, seed=0):
+    """Generates a synthetic tractogram
+
+    Args:
+        nb_streamlines: The number of streamlines to generate.
+        seed: The seed of the random number generator.
+
+    Returns:
+        A streamlines.Streamlines instance in native RAS.
+
+    """
+
+    return sl.Streamlines(random_arrays(nb_streamlines, seed))
+
+
+def random_file(filename, nb_streamlines, seed=0):
+    """Saves a synthetic tractogram to a file"""
+    sl.io.save(random_streamlines(nb_streamlines, seed), filename)
+
+
+def _random_walks(nb_points, rng):
+    """Generates random walks with the requested number of points"""
+
+    total = int(np.sum(nb_points))
+
+    # The direction of each step is the normalized running sum of random
+    # perturbations, so it changes slowly along the streamline.
+    directions = np.cumsum(rng.randn(total, 3) * 0.1, axis=0) + [1, 0, 0]
+    directions /= np.linalg.norm(directions, axis=1, keepdims=True)
+    steps = directions * STEP_SIZE
+
+    # Each streamline starts at a random position in a 100mm cube.
+    points = np.cumsum(steps, axis=0)
+    offsets = np.concatenate(([0], np.cumsum(nb_points)[:-1]))
+    starts = rng.uniform(-50, 50, size=(len(nb_points), 3))
+    points -= np.repeat(points[offsets] - starts, nb_points, axis=0)
+
+    return np.split(points, offsets[1:])
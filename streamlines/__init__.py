@@ -1,5 +1,8 @@
+from collections.abc import MutableMapping
 from typing import Iterable
 from typing import Optional
+import sys
+import weakref
 
 import numpy as np
 from nicoord import AffineTransform
@@ -9,7 +12,17 @@ from nicoord import CoordinateSystemSpace
 from nicoord import CoordinateSystemAxes
 
 from .asarray import distance, hash, length, reorient, resample, smooth
-from .asarray import transform
+from .asarray import resampled_distance, transform
+from .cache import FeatureCache, new_token
+from .cache import default as _default_cache
+from .criteria import Features, Length, NbPoints, all_of
+from .ordering import spatial_order
+from .packed import Arena, curvatures, pack, simplify, torsions
+from .packed import turning_angles
+from .profiles import BundleProfile
+from .profiling import timed
+from .serialization import from_buffers, to_buffers
+from .voxels import sample, to_voxels, voxel_affine
 import streamlines.io
 
 
@@ -18,6 +31,75 @@ _ras_mm = CoordinateSystem(
     CoordinateSystemSpace.NATIVE, CoordinateSystemAxes.RAS)
 
 
+class _OrientedData(MutableMapping):
+    """The data of a streamline in the orientation of its points
+
+    The data per point is stored in the orientation of the stored points of
+    the streamline and is viewed reversed when the streamline is reversed.
+    Apart from the orientation, it behaves like the dict of the streamline.
+
+    """
+
+    def __init__(self, streamline):
+        self._streamline = streamline
+
+    def _orient(self, value):
+        if self._streamline._reversed and np.ndim(value) == 2:
+            return value[:, ::-1]
+        return value
+
+    def __getitem__(self, key):
+        return self._orient(self._streamline._data[key])
+
+    def __setitem__(self, key, value):
+        self._streamline._data[key] = self._orient(value)
+
+    def __delitem__(self, key):
+        del self._streamline._data[key]
+
+    def __iter__(self):
+        return iter(self._streamline._data)
+
+    def __len__(self):
+        return len(self._streamline._data)
+
+    def __repr__(self):
+        return repr(self.copy())
+
+    def copy(self):
+        """Returns a shallow copy as a dict, in the current orientation"""
+        return dict(self.items())
+
+
+def _as_points(points, convert=np.asarray):
+    """Converts points to a (N, 3) array of float
+
+    Raises:
+        TypeError: If the points cannot be converted to a numpy array of
+            floats.
+        ValueError: If the array does not have a shape of (N, 3).
+
+    """
+
+    try:
+        points = convert(points, dtype=float)
+    except:
+        raise TypeError(
+            'points must be convertible to a numpy array of floats.')
+
+    if points.ndim != 2:
+        raise ValueError(
+            'points must be a two dimensional array, not {} dimensional.'
+            .format(points.ndim))
+
+    if points.shape[1] != 3:
+        raise ValueError(
+            'points must have a shape of (N, 3), not {}.'
+            .format(points.shape))
+
+    return points
+
+
 class Streamline(object):
     """A diffusion MRI streamline"""
 
@@ -66,40 +148,105 @@ class Streamline(object):
         if points is None:
             points = np.empty((0, 3))
         else:
-            try:
-                points = np.array(points, dtype=float)
-            except:
-                raise TypeError(
-                    'points must be convertible to a numpy array of floats.')
-
-        if points.ndim != 2:
-            raise ValueError(
-                'points must be a two dimensional array, not {} dimensional.'
-                .format(points.ndim))
-
-        if points.shape[1] != 3:
-            raise ValueError(
-                'points must have a shape of (N, 3), not {}.'
-                .format(points.shape))
+            points = _as_points(points, np.array)
 
         if data is None:
             data = {}
 
+        # Derived features (e.g. the length) are cached. They are
+        # invalidated every time the points are assigned.
+        self._cache = _default_cache
         self._data = data
+        self._reversed = False
         self._points = points
 
+    @property
+    def _points(self):
+        """The points in the orientation of the streamline
+
+        The points are stored in _array. Reversing a streamline only flips
+        the _reversed flag and the points are a reversed view of the stored
+        array.
+
+        """
+        return self._array[::-1] if self._reversed else self._array
+
+    @_points.setter
+    def _points(self, points):
+
+        # The stored data per point follows the new points, which are in
+        # the orientation of the streamline.
+        if self._reversed:
+            self._data = dict(self.data)
+            self._reversed = False
+
+        # The features of the old points can never be used again.
+        if '_token' in self.__dict__:
+            self._invalidate()
+
+        self._array = points
+        self._token = new_token()
+
+    def _feature(self, name, compute):
+        """Gets a derived feature from the cache"""
+
+        # The cache of the streamlines that are not part of a Streamlines
+        # instance is shared by the process. Their features are removed when
+        # they are collected instead of staying in the budget until evicted.
+        if (self._cache is _default_cache and
+                '_finalizer' not in self.__dict__):
+            self._finalizer = weakref.finalize(
+                self, self._cache.invalidate, self._token)
+
+        return self._cache.get(self._token, name, compute)
+
+    def _invalidate(self):
+        """Removes the cached features of the current points"""
+        self._cache.invalidate(self._token)
+        finalizer = self.__dict__.pop('_finalizer', None)
+        if finalizer is not None:
+            finalizer.detach()
+
+    def _set_cache(self, cache):
+        """Moves the features of the streamline to another cache"""
+        if cache is not self._cache:
+            self._invalidate()
+            self._cache = cache
+
+    def _resampled(self, nb_points):
+        """Returns the cached resampled points of the streamline"""
+
+        # Resampling a reversed streamline is the same as reversing a
+        # resampled streamline, so the cache is shared by both orientations.
+        resampled = self._feature(
+            ('resampled', nb_points),
+            lambda: resample(self._array, nb_points))
+        return resampled[::-1] if self._reversed else resampled
+
     def __contains__(self, point):
         """Verifies if a point is part of a streamline"""
         return next((True for p in self._points if np.all(p == point)), False)
 
     def __eq__(self, other):
-        return hash(self._points) == hash(other._points)
+        return self.__hash__() == other.__hash__()
 
     def __getitem__(self, key):
         return self._points[key]
 
+    def __getstate__(self):
+
+        # The cache is shared with other streamlines and is not pickled. The
+        # data view and the finalizer refer to this streamline and are
+        # created again when needed.
+        state = self.__dict__.copy()
+        del state['_cache']
+        state.pop('_data_view', None)
+        state.pop('_finalizer', None)
+        return state
+
     def __hash__(self):
-        return hash(self._points)
+        return self._feature(
+            ('hash', self._reversed), lambda: hash(self._points))
 
     def __iter__(self):
         return iter(self._points)
@@ -110,35 +257,119 @@ class Streamline(object):
     def __reversed__(self):
         return reversed(self._points)
 
+    def __setstate__(self, state):
+
+        # Tokens are only unique within a process, a new one is drawn.
+        self.__dict__.update(state)
+        self._cache = _default_cache
+        self._token = new_token()
+
     def __str__(self):
         return 'streamline: {} points'.format(len(self))
 
     @property
     def data(self):
-        return self._data
+        """The data of the streamline, in the orientation of its points
+
+        The data is a mutable mapping which behaves like a dict, and the
+        same mapping is returned while it is referenced. Values per point are
+        viewed reversed when the streamline is reversed, and copy returns
+        a dict of the values in the current orientation.
+
+        """
+
+        # The view is created lazily as streamlines are also created
+        # without __init__ (e.g. views of packed points). It is referenced
+        # weakly, a reference cycle would keep the streamline alive until
+        # the next garbage collection.
+        ref = self.__dict__.get('_data_view')
+        view = None if ref is None else ref()
+        if view is None:
+            view = _OrientedData(self)
+            self._data_view = weakref.ref(view)
+        return view
 
     @property
     def points(self):
         return self._points.copy()
 
+    @property
+    def bounding_box(self):
+        """The (2, 3) minimum and maximum coordinates of the streamline"""
+        return self._feature('bounding_box', lambda: np.array(
+            [self._points.min(0), self._points.max(0)]))
+
     @property
     def length(self):
-        return length(self._points)
+        return self._feature('length', lambda: length(self._points))
+
+    def compress(self, tolerance=0.1):
+        """Removes points while staying within a tolerance of the original
+
+        The data associated with each point is kept for the remaining points.
+        See streamlines.packed.simplify.
+
+        Args:
+            tolerance (optional): The maximum distance between the removed
+                points and the compressed streamline.
+
+        """
+        points, offsets = pack([self._points])
+        self._select_points(simplify(points, offsets, tolerance))
+        return self
+
+    def _own(self):
+        """Copies the points and data that are views into shared buffers
+
+        The points of streamlines in a Streamlines instance are views into
+        blocks shared by many streamlines. A streamline that outlives its
+        sequence owns its memory so that the blocks can be freed.
+
+        """
+
+        if self._array.base is not None:
+            self._array = self._array.copy()
+        for key, value in self._data.items():
+            if isinstance(value, np.ndarray) and value.base is not None:
+                self._data[key] = value.copy()
+
+    def _select_points(self, mask):
+        """Keeps only the points, and their data, selected by a mask"""
+        data = self.data
+        for key, value in data.items():
+            if value.ndim == 2:
+                data[key] = value[:, mask]
+        self._points = self._points[mask]
 
     def distance(left, right, nb_points=20):
-        return distance(left._points, right._points, nb_points)
+        return resampled_distance(
+            left._resampled(nb_points), right._resampled(nb_points))
 
     def reorient(self, template):
         """Reorients a streamline using a template streamline"""
-        self._points = reorient(self._points, template._points)
+
+        # Only the orientation flag is flipped, the points are not copied.
+        resampled = self._resampled(20)
+        template_resampled = template._resampled(20)
+        if (resampled_distance(resampled, template_resampled) >
+                resampled_distance(resampled[::-1], template_resampled)):
+            self.reverse()
+
         return self
 
     def resample(self, nb_points):
-        self._points = resample(self._points, nb_points)
+        self._points = self._resampled(nb_points).copy()
 
     def reverse(self):
-        """Reverses the order of the points of the streamline"""
-        self._points = self._points[::-1]
+        """Reverses the order of the points of the streamline
+
+        The points and data are not copied, only the orientation of the
+        streamline is flipped. The reversal becomes physical when the points
+        are copied, e.g. with the points property or when saving.
+
+        """
+        self._reversed = not self._reversed
+        return self
 
     def smooth(self, knot_distance=10):
         """Smooths a streamline in place"""
@@ -146,6 +377,27 @@ class Streamline(object):
         return self
 
 
+def _refcounts(items):
+    """Returns the reference counts of the items of a list"""
+    return [sys.getrefcount(item) for item in items]
+
+
+# The reference count of an item only referenced by a list, as seen by
+# _refcounts. Counting references is much cheaper than weak references.
+_unreferenced = _refcounts([object()])[0]
+
+
+def _view_streamline(points, cache):
+    """Creates a streamline whose points are an existing (N, 3) array"""
+    streamline = Streamline.__new__(Streamline)
+    streamline._cache = cache
+    streamline._data = {}
+    streamline._reversed = False
+    streamline._array = points
+    streamline._token = new_token()
+    return streamline
+
+
 class Streamlines(AffineTransformable):
     """A sequence of diffusion MRI streamlines"""
 
@@ -179,10 +431,18 @@ class Streamlines(AffineTransformable):
             coordinate_system = _ras_mm
         super().__init__(coordinate_system, transforms)
 
+        # The derived features of the streamlines are cached within the
+        # memory budget of the cache. See streamlines.cache.FeatureCache.
+        self.cache = FeatureCache()
+
+        # The points copied into the streamlines are stored in growable
+        # blocks instead of one allocation per streamline.
+        self._arena = Arena()
+
         # Convert each item of the iterable to a Streamline object.
         self._items = []
         if iterable is not None:
-            self._items = [Streamline(i) for i in iterable]
+            self._extend_points(iterable)
 
     @property
     def _transformable_points(self) -> Iterable[np.ndarray]:
@@ -193,13 +453,31 @@ class Streamlines(AffineTransformable):
         for streamline, new_points in zip(self, points):
             streamline._points = new_points
 
+    @timed('transform')
+    def transform_to(self, *args, **kwargs):
+        """Transforms the streamlines to another coordinate system"""
+        return super().transform_to(*args, **kwargs)
+
     def __iadd__(self, other: 'Streamlines'):
+        for streamline in other._items:
+            streamline._set_cache(self.cache)
         self._items += other._items
         return self
 
     def __contains__(self, streamline):
         return streamline in self._items
 
+    def __del__(self):
+
+        # The points of the streamlines are views into blocks shared by the
+        # whole sequence (see append and from_buffers). The streamlines that
+        # are still referenced elsewhere, e.g. a sample, copy their points
+        # so that the blocks are freed with the sequence.
+        items = self.__dict__.pop('_items', [])
+        for streamline, count in zip(items, _refcounts(items)):
+            if count > _unreferenced:
+                streamline._own()
+
     def __getitem__(self, key):
         """Get a single streamline or a subset of streamlines"""
 
@@ -233,6 +511,18 @@ class Streamlines(AffineTransformable):
     def __len__(self):
         return len(self._items)
 
+    def __reduce__(self):
+        """Pickles the streamlines as a few contiguous buffers
+
+        The points, offsets and data columns are pickled as arrays instead of
+        pickling each streamline. With pickle protocol 5, the arrays support
+        out-of-band buffers. See streamlines.serialization.
+
+        """
+        arrays, data = to_buffers(self)
+        return from_buffers, (
+            self.coordinate_system, self.transforms, arrays, data)
+
     def __reversed__(self):
         return reversed(self._items)
 
@@ -244,35 +534,399 @@ class Streamlines(AffineTransformable):
         """Returns the length of all streamlines"""
         return [s.length for s in self._items]
 
+    @property
+    def orientations(self):
+        """A (N,) array of bool that is True for the reversed streamlines
+
+        Reversing or reorienting streamlines only flips their orientation,
+        their points are reversed views of the stored points.
+
+        """
+        return np.array([s._reversed for s in self._items], dtype=bool)
+
     def append(self, streamline):
-        """Append a streamline to the sequence"""
+        """Append a streamline to the sequence
+
+        Args:
+            streamline: A Streamline instance, which is appended as is, or
+                points convertible to a (N, 3) array of float. Points are
+                copied into growable buffers whose capacity grows
+                geometrically, so appending many small streamlines is cheap.
+
+        """
+
+        if not isinstance(streamline, Streamline):
+            points = _as_points(streamline)
+            view = self._arena.allocate(len(points))
+            view[...] = points
+            self._items.append(_view_streamline(view, self.cache))
+            return
+
+        streamline._set_cache(self.cache)
         self._items.append(streamline)
 
-    def filter(self, min_length=None):
+    @classmethod
+    def concatenate(cls, streamlines_list):
+        """Concatenates sequences of streamlines into a new sequence
+
+        The points of all the streamlines are copied once into a single
+        contiguous array allocated at its final size. The data of the
+        streamlines is shared with the inputs.
+
+        Args:
+            streamlines_list: An iterable of Streamlines instances in the same
+                coordinate system. The transforms of the first one are used.
+
+        Returns:
+            A new Streamlines instance.
+
+        Raises:
+            ValueError: If the coordinate systems of the inputs differ.
+
+        """
+
+        streamlines_list = list(streamlines_list)
+        if len(streamlines_list) == 0:
+            return cls()
+
+        first = streamlines_list[0]
+        for other in streamlines_list[1:]:
+            if other.coordinate_system != first.coordinate_system:
+                raise ValueError(
+                    'All the streamlines must be in the same coordinate '
+                    'system to be concatenated.')
 
-        if min_length is not None:
-            self._items = [i for i in self._items if i.length >= min_length]
+        items = [s for other in streamlines_list for s in other._items]
+        concatenated = cls(None, first.coordinate_system, first.transforms)
+
+        # A single block is allocated for all the points.
+        concatenated._arena = Arena(sum(len(s._array) for s in items))
+        new_items = concatenated._extend_points(
+            [s._points for s in items], validate=False)
+        for new, streamline in zip(new_items, items):
+            if streamline._reversed:
+                new._data = dict(streamline.data)
+            elif len(streamline._data) > 0:
+                new._data = dict(streamline._data)
+
+        return concatenated
+
+    def extend(self, iterable):
+        """Appends several streamlines to the sequence
+
+        Streamline instances are appended as is. The points of the other
+        items are copied together into growable buffers with a single copy
+        per batch of consecutive items. See append.
+
+        Args:
+            iterable: An iterable of Streamline instances or of points
+                convertible to (N, 3) arrays of float.
+
+        """
+
+        batch = []
+        for item in iterable:
+            if isinstance(item, Streamline):
+                self._extend_points(batch)
+                batch = []
+                self.append(item)
+            else:
+                batch.append(item)
+        self._extend_points(batch)
+
+        return self
+
+    def _extend_points(self, arrays, validate=True):
+        """Appends streamlines whose points are copied into the arena"""
+
+        if validate:
+            arrays = [_as_points(a) for a in arrays]
+        if len(arrays) == 0:
+            return []
+
+        nb_points = np.fromiter(map(len, arrays), np.intp, len(arrays))
+        stops = np.cumsum(nb_points)
+        points = self._arena.allocate(int(stops[-1]))
+        np.concatenate(arrays, out=points)
+
+        new_items = [_view_streamline(points[start:stop], self.cache)
+                     for start, stop in zip((stops - nb_points).tolist(),
+                                            stops.tolist())]
+        self._items.extend(new_items)
+
+        return new_items
+
+    @timed('compress')
+    def compress(self, tolerance=0.1):
+        """Removes points while staying within a tolerance of the original
+
+        All the streamlines are compressed together in a vectorized way. The
+        data associated with each point is kept for the remaining points.
+
+        Args:
+            tolerance (optional): The maximum distance between the removed
+                points and the compressed streamlines.
+
+        """
+
+        points, offsets = pack([s._points for s in self._items])
+        keep = simplify(points, offsets, tolerance)
+        for streamline, start, end in zip(
+                self._items, offsets[:-1], offsets[1:]):
+            streamline._select_points(keep[start:end])
+
+        return self
+
+    @timed('filter')
+    def filter(self, min_length=None, max_length=None, min_points=None,
+               max_points=None, criterion=None):
+        """Removes the streamlines that do not satisfy criteria
+
+        The features needed by the criteria (e.g. lengths) are computed once
+        for all streamlines in a vectorized way. The streamlines that do not
+        satisfy all the criteria are then removed in a single pass.
+
+        Args:
+            min_length (optional): The minimum length of the streamlines.
+            max_length (optional): The maximum length of the streamlines.
+            min_points (optional): The minimum number of points of the
+                streamlines.
+            max_points (optional): The maximum number of points of the
+                streamlines.
+            criterion (optional): A streamlines.criteria.Criterion that the
+                streamlines must also satisfy. Criteria can be combined
+                with &, | and ~.
+
+        Examples:
+            >>> import numpy as np
+            >>> import streamlines as sl
+            >>> from streamlines.criteria import EndpointRegion, Length
+
+            >>> streamlines = sl.Streamlines(np.random.randn(10, 100, 3))
+            >>> region = EndpointRegion([-1, -1, -1], [1, 1, 1], 'both')
+            >>> streamlines.filter(criterion=Length(50, 200) | region)
+
+        """
+
+        length_range = None
+        if min_length is not None or max_length is not None:
+            length_range = Length(min_length, max_length)
+
+        points_range = None
+        if min_points is not None or max_points is not None:
+            points_range = NbPoints(min_points, max_points)
+
+        criterion = all_of(length_range, points_range, criterion)
+        if criterion is None:
+            return self
+
+        mask = criterion(Features(self))
+        self._items = [s for s, keep in zip(self._items, mask) if keep]
+
+        return self
+
+    @timed('geometry')
+    def geometry(self):
+        """Computes the curvature, torsion and turning angle at each point
+
+        The values are computed by finite differences over the packed points
+        of all the streamlines at once and attached to the streamlines as
+        data per point with a shape of (1, N): 'curvature' and 'torsion' in
+        1 / mm and 'turning_angle' in degrees. They are 0 where they are
+        not defined, e.g. at the endpoints.
+
+        Examples:
+            >>> import streamlines as sl
+
+            >>> streamlines = sl.io.load('test.trk')
+            >>> streamlines.geometry()
+            >>> streamlines[0].data['curvature']
+
+        """
+
+        points, offsets = pack([s._points for s in self._items])
+        values = {'curvature': curvatures(points, offsets),
+                  'torsion': torsions(points, offsets),
+                  'turning_angle': turning_angles(points, offsets)}
+
+        for name, value in values.items():
+            for streamline, start, end in zip(
+                    self._items, offsets[:-1], offsets[1:]):
+                streamline.data[name] = value[None, start:end]
 
         return self
 
+    def permute(self, order):
+        """Reorders the streamlines in place
+
+        Args:
+            order: A (N,) array with the index of the streamline at each
+                position in the new order, e.g. the permutation returned by
+                reorder. The original order is restored with
+                np.argsort(order).
+
+        """
+
+        order = np.asarray(order)
+        if len(order) != len(self) or not np.array_equal(
+                np.sort(order), np.arange(len(self))):
+            raise ValueError(
+                'The order must be a permutation of the indices of the '
+                'streamlines.')
+
+        self._items = [self._items[i] for i in order]
+
+        return self
+
+    @timed('profile')
+    def profile(self, nb_points=20, template=None, percentiles=(5, 50, 95),
+                keys=None, chunk_size=None):
+        """Computes the centroid and along-tract profiles of the streamlines
+
+        The streamlines are resampled and oriented together, then the
+        centroid and the statistics of the data per point at each node are
+        computed as reductions. See streamlines.profiles.BundleProfile.
+
+        Args:
+            nb_points (optional): The number of nodes of the profiles.
+            template (optional): A Streamline used to orient the
+                streamlines. The default is the first streamline.
+            percentiles (optional): The percentiles computed at each node.
+            keys (optional): The data per point keys to profile. The default
+                is all the data per point.
+            chunk_size (optional): If provided, the streamlines are resampled
+                chunk_size at a time to bound memory.
+
+        Returns:
+            A streamlines.profiles.BundleProfile.
+
+        """
+
+        bundle_profile = BundleProfile(nb_points, template, percentiles, keys)
+
+        chunk_size = chunk_size or max(len(self._items), 1)
+        for start in range(0, len(self._items), chunk_size):
+            bundle_profile.add(self._items[start:start + chunk_size])
+
+        return bundle_profile
+
+    @timed('reorder')
+    def reorder(self, curve='hilbert', anchor='midpoint', bits=16):
+        """Sorts the streamlines in place along a space-filling curve
+
+        Neighboring streamlines are placed next to each other, which improves
+        the locality of spatial queries and the compression of files. The
+        keys of all the streamlines are computed at once from their packed
+        points. See streamlines.ordering.spatial_order.
+
+        Args:
+            curve (optional): 'hilbert' or 'morton'.
+            anchor (optional): 'midpoint' to sort the streamlines by their
+                middle point or 'endpoints' to sort them by both endpoints.
+            bits (optional): The number of bits per axis of the grid on
+                which the anchors are quantized.
+
+        Returns:
+            The (N,) permutation applied to the streamlines: the index in
+            the original order of the streamline at each position. The
+            original order is restored with permute(np.argsort(order)).
+
+        Examples:
+            >>> import numpy as np
+            >>> import streamlines as sl
+
+            >>> streamlines = sl.io.load('test.trk')
+            >>> order = streamlines.reorder()
+            >>> streamlines.permute(np.argsort(order))
+
+        """
+
+        order = spatial_order(
+            *pack([s._points for s in self._items]), curve, anchor, bits)
+        self.permute(order)
+
+        return order
+
+    @timed('reorient')
     def reorient(self, template=None):
+        """Reorients the streamlines like a template streamline
+
+        Args:
+            template (optional): The streamlines.Streamline whose orientation
+                is followed. The default is the first streamline.
+
+        """
 
         if template is None:
+            if len(self._items) == 0:
+                return self
             template = self._items[0]
 
         for streamline in self:
             streamline.reorient(template)
 
+        return self
+
+    @timed('resample')
     def resample(self, nb_points=20):
         """Resamples all the streamlines to the sample number of points"""
         for streamline in self:
             streamline.resample(nb_points)
 
+    @timed('reverse')
     def reverse(self):
         """Reverses the order of points of the streamlines"""
         for streamline in self:
             streamline.reverse()
 
+        return self
+
+    @timed('sample')
+    def sample(self, volumes, affine=None, interpolation='trilinear'):
+        """Samples volumes at the points of the streamlines
+
+        The points of all the streamlines are mapped to voxel space with a
+        single affine transform and each volume is interpolated at all the
+        points at once. The values are attached to the streamlines as data
+        per point with a shape of (K, N), where K is the number of values
+        per voxel (1 for scalar maps) and N the number of points. Points
+        outside a volume have a value of 0.
+
+        Args:
+            volumes: A dict of (X, Y, Z) or (X, Y, Z, K) arrays on the same
+                voxel grid. The keys are the names of the data.
+            affine (optional): The (4, 4) affine from the coordinate system
+                of the streamlines to the voxel grid of the volumes. The
+                default is the transform to voxel space attached to the
+                streamlines.
+            interpolation (optional): 'nearest' or 'trilinear'.
+
+        Examples:
+            >>> import nibabel as nib
+            >>> import streamlines as sl
+
+            >>> streamlines = sl.io.load('test.trk')
+            >>> fa = nib.load('fa.nii.gz').get_fdata()
+            >>> streamlines.sample({'fa': fa})
+
+        """
+
+        if affine is None:
+            affine = voxel_affine(self)
+
+        points, offsets = pack([s._points for s in self._items])
+        coordinates = to_voxels(points, affine)
+
+        for name, volume in volumes.items():
+            values = sample(np.asarray(volume), coordinates, interpolation)
+            values = values.reshape((len(points), -1)).T
+            for streamline, start, end in zip(
+                    self._items, offsets[:-1], offsets[1:]):
+                streamline.data[name] = values[:, start:end]
+
+        return self
+
+    @timed('smooth')
     def smooth(self, knot_distance=10):
         """Smooth streamlines in place"""
 
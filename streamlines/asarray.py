@@ -40,13 +40,32 @@ def distance(left, right, nb_points=20):
     left_resampled = resample(left, nb_points)
     right_resampled = resample(right, nb_points)
 
-    # The distance between the streamlines is the distance between each
-    # point.
-    distance = 0.0
-    for left_point, right_point in zip(left_resampled, right_resampled):
-        distance += np.sqrt(np.sum((left_point - right_point) ** 2))
+    return resampled_distance(left_resampled, right_resampled)
 
-    return distance / nb_points
+
+def resampled_distance(left, right):
+    """Measures the distance between two resampled streamlines
+
+    The streamlines must have the same number of points. Their distance is
+    the mean distance between corresponding points. Stacks of streamlines
+    with shapes (..., N, 3) are also accepted and broadcast.
+
+    """
+    return np.mean(np.sqrt(np.sum((left - right) ** 2, -1)), -1)
+
+
+def mdf(left, right):
+    """Measures the orientation invariant distance of resampled streamlines
+
+    The distance is the smallest of the distances between the left
+    streamline and the right streamline or the reversed right streamline,
+    i.e. the minimum average direct-flip distance. Stacks of streamlines with
+    shapes (..., N, 3) are also accepted and broadcast.
+
+    """
+    return np.minimum(
+        resampled_distance(left, right),
+        resampled_distance(left, right[..., ::-1, :]))
 
 
 def reorient(streamline, template):
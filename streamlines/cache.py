@@ -0,0 +1,131 @@
+import itertools
+from collections import OrderedDict
+
+import numpy as np
+
+
+# The default memory budget of a cache in bytes.
+DEFAULT_MAX_BYTES = 256 * 2 ** 20
+
+# Tokens identify a version of the points of a streamline. A new token is
+# drawn every time the points change so cached features of the old points
+# can never be returned. Tokens are never reused.
+_tokens = itertools.count()
+
+
+def new_token():
+    """Returns a token that was never returned before"""
+    return next(_tokens)
+
+
+class FeatureCache(object):
+    """A memory bounded cache of derived streamline features
+
+    Features (e.g. the length or the resampled points of a streamline) are
+    stored by token and name. When the memory used by the cached features
+    exceeds the budget, the least recently used features are evicted.
+
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        """Memory bounded cache of derived streamline features
+
+        Args:
+            max_bytes (optional): The memory budget of the cache in bytes.
+                If None, the cache is unbounded. If 0, nothing is cached.
+
+        """
+
+        self._max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._names = {}
+        self.nbytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def max_bytes(self):
+        return self._max_bytes
+
+    @max_bytes.setter
+    def max_bytes(self, max_bytes):
+        self._max_bytes = max_bytes
+        self._evict()
+
+    def get(self, token, name, compute):
+        """Gets a feature, computing it if it is not cached
+
+        Args:
+            token: The token of the points of the streamline.
+            name: The name of the feature. Can be any hashable value.
+            compute: A function without arguments that computes the feature.
+
+        Returns:
+            The cached or computed feature. Arrays are returned read only
+            because they are shared by all callers.
+
+        """
+
+        key = (token, name)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            return entry[0]
+
+        value = compute()
+        if isinstance(value, np.ndarray):
+            value.flags.writeable = False
+
+        nbytes = _nbytes(value)
+        if self._max_bytes is not None and nbytes > self._max_bytes:
+            return value
+
+        self._entries[key] = (value, nbytes)
+        self._names.setdefault(token, set()).add(name)
+        self.nbytes += nbytes
+        self._evict()
+
+        return value
+
+    def invalidate(self, token):
+        """Removes all the features of a token"""
+        for name in self._names.pop(token, ()):
+            _, nbytes = self._entries.pop((token, name))
+            self.nbytes -= nbytes
+
+    def clear(self):
+        """Removes all the features"""
+        self._entries.clear()
+        self._names.clear()
+        self.nbytes = 0
+
+    def _evict(self):
+        """Removes the least recently used features until within budget"""
+
+        if self._max_bytes is None:
+            return
+
+        while self.nbytes > self._max_bytes and self._entries:
+            (token, name), (_, nbytes) = self._entries.popitem(last=False)
+            self.nbytes -= nbytes
+            names = self._names[token]
+            names.discard(name)
+            if len(names) == 0:
+                del self._names[token]
+
+
+def _nbytes(value):
+    """Estimates the memory used by a cached value"""
+
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    elif isinstance(value, tuple):
+        return sum(_nbytes(v) for v in value)
+
+    # Scalars such as lengths and hashes.
+    return 8
+
+
+# The cache used by streamlines that are not part of a Streamlines instance.
+default = FeatureCache()
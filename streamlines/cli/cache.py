@@ -0,0 +1,204 @@
+"""A persistent cache of the output files of CLI commands
+
+The output of a command is stored under a key computed from the digest of
+the contents of its input files, the name of the command, its parameters and
+the version of the package. Running the same command with the same inputs
+copies the cached output instead of recomputing it.
+
+Entries are written to a temporary file and atomically renamed so concurrent
+processes never see partial entries. The least recently used entries are
+removed when the size of the cache exceeds its budget.
+
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from importlib import metadata
+
+
+DEFAULT_MAX_BYTES = 10 * 2 ** 30
+
+# The size of the blocks used to compute the digest of files.
+_BLOCK_SIZE = 2 ** 20
+
+
+class ResultCache(object):
+    """A persistent cache of the output files of CLI commands"""
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES, link=False):
+        """A persistent cache of the output files of CLI commands
+
+        Args:
+            directory: The directory of the cache. It is created if it does
+                not exist and can be shared by concurrent processes.
+            max_bytes (optional): The maximum total size of the entries.
+            link (optional): If True, outputs are hard links to the entries
+                when possible instead of copies. Outputs must then never be
+                modified in place, which would also modify the entries.
+
+        """
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.link = link
+        os.makedirs(directory, exist_ok=True)
+
+    def run(self, name, function, parameters):
+        """Runs a command or copies its output from the cache
+
+        The command must write a single file, output_filename. All the other
+        parameters that end with _filename are input files, and those that
+        end with _filenames lists of input files, whose contents are part of
+        the key.
+
+        Args:
+            name: The name of the command.
+            function: The function of the command.
+            parameters: The keyword arguments of function.
+
+        Returns:
+            True if the output was copied from the cache, False if the
+            command was run.
+
+        """
+
+        output_filename = parameters['output_filename']
+        entry = self._entry(self.key(name, parameters), output_filename)
+
+        if self._copy(entry, output_filename):
+            return True
+
+        function(**parameters)
+        self._store(output_filename, entry)
+        self.evict()
+
+        return False
+
+    def key(self, name, parameters):
+        """Computes the key of the output of a command"""
+
+        inputs = {k: _digest(v) for k, v in parameters.items()
+                  if k.endswith('_filename') and k != 'output_filename'}
+        inputs.update({k: [_digest(f) for f in v or []]
+                       for k, v in parameters.items()
+                       if k.endswith('_filenames')})
+        others = {k: v for k, v in parameters.items()
+                  if not k.endswith(('_filename', '_filenames'))}
+
+        description = json.dumps({
+            'command': name,
+            'inputs': inputs,
+            'parameters': others,
+            'version': _version()}, sort_keys=True, default=repr)
+
+        return hashlib.sha256(description.encode()).hexdigest()
+
+    def evict(self):
+        """Removes the least recently used entries that exceed the budget"""
+
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.startswith('.'):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def _entry(self, key, output_filename):
+        """The path of the entry of a key, with the extension of the output"""
+        extension = os.path.basename(output_filename).split('.', 1)[-1]
+        return os.path.join(self.directory, f'{key}.{extension}')
+
+    def _copy(self, entry, output_filename):
+        """Copies or links an entry to the output, if the entry exists"""
+
+        try:
+
+            _touch(entry)
+
+            # The output is replaced atomically by a link or a copy.
+            temporary = _temporary(output_filename)
+            if not (self.link and _link(entry, temporary)):
+                shutil.copyfile(entry, temporary)
+            os.replace(temporary, output_filename)
+
+        except FileNotFoundError:
+
+            # The entry does not exist or was evicted by another process.
+            return False
+
+        return True
+
+    def _store(self, output_filename, entry):
+        """Atomically adds the output of a command to the cache"""
+        temporary = _temporary(entry)
+        shutil.copyfile(output_filename, temporary)
+        _touch(temporary)
+        os.replace(temporary, entry)
+
+
+def _digest(filename):
+    """Computes the digest of the contents of a file"""
+
+    if filename is None:
+        return None
+
+    digest = hashlib.blake2b()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(_BLOCK_SIZE), b''):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+def _link(source, destination):
+    """Creates a hard link, returns False if it is not supported"""
+    try:
+        os.link(source, destination)
+    except FileNotFoundError:
+        raise
+    except OSError:
+        return False
+    return True
+
+
+def _temporary(filename):
+    """Returns an unused hidden file name in the directory of a file"""
+    directory, name = os.path.split(os.path.abspath(filename))
+    handle, path = tempfile.mkstemp(prefix=f'.{name}.', dir=directory)
+    os.close(handle)
+    os.remove(path)
+    return path
+
+
+def _touch(filename):
+    """Marks a file as recently used"""
+
+    # The clock is used explicitly because file system timestamps can be too
+    # coarse to order entries used in quick succession.
+    now = time.time_ns()
+    os.utime(filename, ns=(now, now))
+
+
+def _version():
+    """The version of the package"""
+    try:
+        return metadata.version('streamlines')
+    except metadata.PackageNotFoundError:
+        return 'unknown'
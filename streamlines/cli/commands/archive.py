@@ -0,0 +1,63 @@
+import argparse
+
+from streamlines.io import archive as archive_io
+from streamlines.io import load
+from streamlines.io import load_chunks
+
+
+def add_parser(subparsers):
+
+    # The archive subparser.
+    archive_subparser = subparsers.add_parser(
+        'archive',
+        description='Saves streamlines to a compressed archive file (.slz). '
+                    'The points are quantized to a fixed precision and delta '
+                    'encoded, and the data is stored without loss. Archive '
+                    'files can be read by all the commands.',
+        help='Saves streamlines to a compressed archive file.',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    archive_subparser.add_argument(
+        'input_filename', metavar='input_file', type=str,
+        help='STR The file that contains the streamlines to archive. Can be '
+             'of any file format supported by nibabel.')
+    archive_subparser.add_argument(
+        'output_filename', metavar='output_file', type=str,
+        help='STR The .slz file where the streamlines will be saved.')
+    archive_subparser.add_argument(
+        '--precision', metavar='FLOAT', type=float, default=0.01,
+        help='The quantization step of the coordinates in mm.')
+    archive_subparser.add_argument(
+        '--codec', type=str, default='zlib', choices=tuple(archive_io.codecs),
+        help='The compression of the blocks of streamlines.')
+    archive_subparser.add_argument(
+        '--block-size', metavar='INT', type=int, default=1000,
+        help='The number of streamlines per independently compressed block.')
+    archive_subparser.add_argument(
+        '--chunk-size', metavar='INT', type=int,
+        help='Process the file in chunks of INT streamlines instead of '
+             'loading it in memory.')
+    archive_subparser.set_defaults(func=archive, cacheable=True)
+
+
+def archive(input_filename, output_filename, precision=0.01, codec='zlib',
+            block_size=1000, chunk_size=None):
+    """Saves streamlines to a compressed archive file
+
+    Args:
+        input_filename: The file that contains the streamlines to archive.
+        output_filename: The .slz file where the streamlines will be saved.
+        precision (optional): The quantization step of the coordinates.
+        codec (optional): The compression of the blocks of streamlines.
+        block_size (optional): The number of streamlines per block.
+        chunk_size (optional): If provided, the file is processed in chunks
+            of chunk_size streamlines.
+
+    """
+
+    if chunk_size is not None:
+        chunks = load_chunks(input_filename, chunk_size)
+    else:
+        chunks = [load(input_filename)]
+
+    archive_io.save_chunks(
+        chunks, output_filename, precision, codec, block_size)
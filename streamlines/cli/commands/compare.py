@@ -0,0 +1,110 @@
+import argparse
+import os
+import sys
+
+import nibabel as nib
+import numpy as np
+
+from streamlines.compare import compare as compare_bundles
+from streamlines.io import load_chunks
+
+
+def add_parser(subparsers):
+
+    # The compare subparser.
+    compare_subparser = subparsers.add_parser(
+        'compare',
+        description='Compares a candidate bundle to a reference bundle. '
+                    'Prints the Dice coefficient, overlap and overreach of '
+                    'the voxels crossed by the bundles, their bundle '
+                    'adjacency and the distances between their streamlines. '
+                    'The larger file is read in chunks.',
+        help='Compares a bundle to a reference bundle.',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    compare_subparser.add_argument(
+        'candidate_filename', metavar='candidate_file', type=str,
+        help='STR The file that contains the candidate bundle. Can be of any '
+             'file format supported by nibabel.')
+    compare_subparser.add_argument(
+        'reference_filename', metavar='reference_file', type=str,
+        help='STR The file that contains the reference bundle. Can be of any '
+             'file format supported by nibabel.')
+    compare_subparser.add_argument(
+        '--threshold', metavar='FLOAT', type=float, default=5.0,
+        help='The distance under which streamlines are adjacent.')
+    compare_subparser.add_argument(
+        '--nb-points', metavar='INT', type=int, default=20,
+        help='The number of points used to resample the streamlines.')
+    compare_subparser.add_argument(
+        '--step', metavar='FLOAT', type=float,
+        help='Supersample the streamlines so consecutive points are at most '
+             'FLOAT voxels apart before computing the voxel masks.')
+    compare_subparser.add_argument(
+        '--reference', metavar='FILE', type=str,
+        help='STR A NIfTI image that defines the voxel grid of the masks.')
+    compare_subparser.add_argument(
+        '--chunk-size', metavar='INT', type=int, default=100000,
+        help='The number of streamlines of the larger file read at once.')
+    compare_subparser.set_defaults(func=compare)
+
+
+def compare(candidate_filename, reference_filename, threshold=5.0,
+            nb_points=20, step=None, reference=None, chunk_size=100000):
+    """Compares a candidate bundle to a reference bundle
+
+    The larger file is streamed in chunks while the other one is loaded in
+    memory. See streamlines.compare.compare for the metrics.
+
+    Args:
+        candidate_filename: The file that contains the candidate bundle.
+        reference_filename: The file that contains the reference bundle.
+        threshold (optional): The distance under which streamlines are
+            adjacent.
+        nb_points (optional): The number of points used to resample the
+            streamlines.
+        step (optional): The maximum distance between points, in voxels,
+            used to supersample the streamlines.
+        reference (optional): A NIfTI image that defines the voxel grid of
+            the masks. If not provided, the voxel space of the file loaded in
+            memory is used.
+        chunk_size (optional): The number of streamlines of the larger file
+            read at once.
+
+    """
+
+    shape = affine = None
+    if reference is not None:
+        reference_image = nib.load(reference)
+        shape = reference_image.shape[:3]
+        affine = np.linalg.inv(reference_image.affine)
+
+    # Both files are read with load_chunks so their streamlines are in the
+    # same space. The smaller file is read in a single chunk.
+    candidate_size = os.path.getsize(candidate_filename)
+    reference_size = os.path.getsize(reference_filename)
+    if candidate_size >= reference_size:
+        stream = 'candidate'
+        candidate = load_chunks(candidate_filename, chunk_size)
+        reference_bundle = _load(reference_filename)
+    else:
+        stream = 'reference'
+        candidate = _load(candidate_filename)
+        reference_bundle = load_chunks(reference_filename, chunk_size)
+
+    metrics = compare_bundles(
+        candidate, reference_bundle, shape, affine, threshold, nb_points,
+        step, stream)
+
+    out = ''
+    for key, value in metrics.items():
+        if isinstance(value, float):
+            out += '\n{}: {:.4f}'.format(key, value)
+        else:
+            out += '\n{}: {}'.format(key, value)
+
+    print(out)
+
+
+def _load(filename):
+    """Loads all the streamlines of a file as a single chunk"""
+    return list(load_chunks(filename, sys.maxsize))
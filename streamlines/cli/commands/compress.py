@@ -0,0 +1,63 @@
+import argparse
+
+from streamlines.io import load
+from streamlines.io import load_chunks
+from streamlines.io import save
+from streamlines.io import save_chunks
+
+
+def add_parser(subparsers):
+
+    # The compress subparser.
+    compress_subparser = subparsers.add_parser(
+        'compress',
+        description='Removes points from streamlines while keeping the '
+                    'compressed streamlines within a tolerance of the '
+                    'original ones. The data of the remaining points is '
+                    'kept.',
+        help='Reduces the number of points of streamlines.',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    compress_subparser.add_argument(
+        'input_filename', metavar='input_file', type=str,
+        help='STR The file that contains the streamlines to compress. Can be '
+             'of any file format supported by nibabel.')
+    compress_subparser.add_argument(
+        'output_filename', metavar='output_file', type=str,
+        help='STR The file where the compressed streamlines will be saved. '
+             'Can be of any file format supported by nibabel.')
+    compress_subparser.add_argument(
+        '--tolerance', metavar='FLOAT', type=float, default=0.1,
+        help='The maximum distance between the removed points and the '
+             'compressed streamlines.')
+    compress_subparser.add_argument(
+        '--chunk-size', metavar='INT', type=int,
+        help='Process the file in chunks of INT streamlines instead of '
+             'loading it in memory.')
+    compress_subparser.set_defaults(func=compress, cacheable=True)
+
+
+def compress(input_filename, output_filename, tolerance=0.1,
+             chunk_size=None):
+    """Reduces the number of points of the streamlines in a file
+
+    Args:
+        input_filename: The file that contains the streamlines to compress.
+        output_filename: The file where the compressed streamlines will be
+            saved.
+        tolerance (optional): The maximum distance between the removed points
+            and the compressed streamlines.
+        chunk_size (optional): If provided, the file is processed in chunks
+            of chunk_size streamlines.
+
+    """
+
+    if chunk_size is not None:
+        chunks = load_chunks(input_filename, chunk_size)
+        save_chunks(
+            (c.compress(tolerance) for c in chunks), output_filename)
+        return
+
+    streamlines = load(input_filename)
+    streamlines.compress(tolerance)
+
+    save(streamlines, output_filename)
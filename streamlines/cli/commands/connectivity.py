@@ -0,0 +1,101 @@
+import nibabel as nib
+import numpy as np
+
+from streamlines.connectivity import Connectome
+from streamlines.io import load
+from streamlines.io import load_chunks
+
+
+def add_parser(subparsers):
+
+    # The connectivity subparser.
+    connectivity_subparser = subparsers.add_parser(
+        'connectivity',
+        description='Computes the number of streamlines that connect each '
+                    'pair of regions of a parcellation. The rows and columns '
+                    'of the output matrices are the non-zero labels of the '
+                    'parcellation in increasing order.',
+        help='Computes a connectivity matrix from a parcellation.')
+    connectivity_subparser.add_argument(
+        'input_filename', metavar='input_file', type=str,
+        help='STR The file that contains the streamlines. Can be of any file '
+             'format supported by nibabel.')
+    connectivity_subparser.add_argument(
+        'labels_filename', metavar='labels_file', type=str,
+        help='STR The NIfTI file of the parcellation. The label 0 is the '
+             'background.')
+    connectivity_subparser.add_argument(
+        'output_filename', metavar='output_file', type=str,
+        help='STR The text file where the matrix of streamline counts will '
+             'be saved.')
+    connectivity_subparser.add_argument(
+        '--radius', metavar='FLOAT', type=float, default=0,
+        help='Assign endpoints in the background to the nearest label within '
+             'FLOAT voxels.')
+    connectivity_subparser.add_argument(
+        '--mean-lengths', metavar='FILE', type=str,
+        help='STR The text file where the matrix of the mean length of '
+             'streamlines will be saved.')
+    connectivity_subparser.add_argument(
+        '--mean-data', metavar=('KEY', 'FILE'), nargs=2, action='append',
+        help='STR STR Save the matrix of the mean of the streamline data KEY '
+             'to FILE. Can be repeated.')
+    connectivity_subparser.add_argument(
+        '--assignments', metavar='FILE', type=str,
+        help='STR The text file where the labels of the endpoints of each '
+             'streamline will be saved.')
+    connectivity_subparser.add_argument(
+        '--chunk-size', metavar='INT', type=int,
+        help='Process the file in chunks of INT streamlines instead of '
+             'loading it in memory.')
+    connectivity_subparser.set_defaults(func=connectivity)
+
+
+def connectivity(input_filename, labels_filename, output_filename, radius=0,
+                 mean_lengths=None, mean_data=None, assignments=None,
+                 chunk_size=None):
+    """Computes connectivity matrices from a parcellation
+
+    Args:
+        input_filename: The file that contains the streamlines.
+        labels_filename: The NIfTI file of the parcellation.
+        output_filename: The text file where the matrix of streamline counts
+            will be saved.
+        radius (optional): Endpoints in the background are assigned the
+            nearest label within radius voxels.
+        mean_lengths (optional): The text file where the matrix of the mean
+            length of streamlines will be saved.
+        mean_data (optional): A list of (key, filename) pairs. The matrix of
+            the mean of the data key is saved to filename.
+        assignments (optional): The text file where the labels of the
+            endpoints of each streamline will be saved.
+        chunk_size (optional): If provided, the file is processed in chunks
+            of chunk_size streamlines.
+
+    """
+
+    mean_data = mean_data or []
+
+    image = nib.load(labels_filename)
+    connectome = Connectome(
+        np.asanyarray(image.dataobj), radius, image_affine=image.affine,
+        data_keys=[key for key, _ in mean_data])
+
+    if chunk_size is None:
+        chunks = [load(input_filename)]
+    else:
+        chunks = load_chunks(input_filename, chunk_size)
+
+    all_assignments = [np.zeros((0, 2), dtype=np.intp)]
+    for chunk in chunks:
+        all_assignments.append(connectome.add(chunk))
+
+    np.savetxt(output_filename, connectome.to_dense(connectome.counts),
+               fmt='%d')
+    if mean_lengths is not None:
+        np.savetxt(mean_lengths,
+                   connectome.to_dense(connectome.mean_lengths))
+    for key, filename in mean_data:
+        np.savetxt(filename, connectome.to_dense(connectome.mean_data(key)))
+    if assignments is not None:
+        np.savetxt(assignments, np.concatenate(all_assignments), fmt='%d')
@@ -0,0 +1,104 @@
+import argparse
+
+import nibabel as nib
+import numpy as np
+
+from streamlines.density import endpoint_density
+from streamlines.density import track_density
+from streamlines.io import load
+from streamlines.io import load_chunks
+from streamlines.voxels import voxel_affine
+from streamlines.voxels import voxel_shape
+
+
+def add_parser(subparsers):
+
+    # The density subparser.
+    density_subparser = subparsers.add_parser(
+        'density',
+        description='Computes a track density image (the number of '
+                    'streamlines that pass through each voxel) or an '
+                    'endpoint density image. The image is in the voxel space '
+                    'of the streamlines file unless a reference image is '
+                    'provided.',
+        help='Computes track or endpoint density images.',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    density_subparser.add_argument(
+        'input_filename', metavar='input_file', type=str,
+        help='STR The file that contains the streamlines. Can be of any file '
+             'format supported by nibabel.')
+    density_subparser.add_argument(
+        'output_filename', metavar='output_file', type=str,
+        help='STR The NIfTI file where the density image will be saved.')
+    density_subparser.add_argument(
+        '--endpoints', action='store_true',
+        help='Count the endpoints of the streamlines instead of the '
+             'streamlines.')
+    density_subparser.add_argument(
+        '--reference', metavar='FILE', type=str,
+        help='STR A NIfTI image that defines the voxel space of the output.')
+    density_subparser.add_argument(
+        '--step', metavar='FLOAT', type=float,
+        help='Supersample the streamlines so consecutive points are at most '
+             'FLOAT voxels apart.')
+    density_subparser.add_argument(
+        '--chunk-size', metavar='INT', type=int,
+        help='Process the file in chunks of INT streamlines instead of '
+             'loading it in memory.')
+    density_subparser.set_defaults(func=density)
+
+
+def density(input_filename, output_filename, endpoints=False, reference=None,
+            step=None, chunk_size=None):
+    """Computes a track or endpoint density image
+
+    Args:
+        input_filename: The file that contains the streamlines.
+        output_filename: The NIfTI file where the image will be saved.
+        endpoints (optional): If True, the endpoints are counted instead of
+            the streamlines.
+        reference (optional): A NIfTI image that defines the voxel space of
+            the output. If not provided, the voxel space of the streamlines
+            file is used.
+        step (optional): The maximum distance between points, in voxels,
+            used to supersample the streamlines.
+        chunk_size (optional): If provided, the file is processed in chunks
+            of chunk_size streamlines.
+
+    """
+
+    if chunk_size is None:
+        chunks = [load(input_filename)]
+    else:
+        chunks = load_chunks(input_filename, chunk_size)
+
+    out = affine = shape = image_affine = None
+    if reference is not None:
+        reference_image = nib.load(reference)
+        shape = reference_image.shape[:3]
+        image_affine = reference_image.affine
+        affine = np.linalg.inv(image_affine)
+
+    for chunk in chunks:
+
+        # The voxel space of the output is taken from the first chunk.
+        if affine is None:
+            affine = voxel_affine(chunk)
+            image_affine = np.linalg.inv(affine)
+            shape = voxel_shape(chunk)
+
+        if endpoints:
+            out = endpoint_density(chunk, shape, affine, out=out)
+        else:
+            out = track_density(chunk, shape, affine, step, out=out)
+
+    # Without streamlines, the voxel space is only known from a reference.
+    if out is None:
+        if shape is None:
+            raise ValueError(
+                f'No streamlines in {input_filename} to compute the voxel '
+                f'space of the output. Use a reference image.')
+        out = np.zeros(shape)
+
+    nib.save(nib.Nifti1Image(out.astype(np.int32), image_affine),
+             output_filename)
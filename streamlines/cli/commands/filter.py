@@ -1,4 +1,20 @@
+import numpy as np
+
+from streamlines import packed
+from streamlines.confidence import confidence_scores
+from streamlines.criteria import BoundingBox
+from streamlines.criteria import ClusterConfidence
+from streamlines.criteria import Curvature
+from streamlines.criteria import Data
+from streamlines.criteria import EndpointRegion
+from streamlines.criteria import Selection
+from streamlines.criteria import Torsion
+from streamlines.criteria import Tortuosity
+from streamlines.criteria import TurningAngle
+from streamlines.criteria import all_of
 from streamlines.io import load
+from streamlines.io import load_chunks
+from streamlines.io import map_chunks
 from streamlines.io import save
 
 
@@ -9,23 +25,98 @@ def add_parser(subparsers):
         'filter',
         description='Removes streamlines from a file based on their features. '
                     'For example, remove all streamlines with a length below '
-                    '50mm using --min-length 50.',
+                    '50mm using --min-length 50. When several criteria are '
+                    'given, streamlines must satisfy all of them.',
         help='Filters streamlines based on their features.')
     filter_subparser.add_argument(
-        'input', metavar='input_file', type=str,
+        'input_filename', metavar='input_file', type=str,
         help='STR The file that contains the streamlines to filter. Can be of '
              'any file format supported by nibabel.')
     filter_subparser.add_argument(
-        'output', metavar='output_file', type=str,
+        'output_filename', metavar='output_file', type=str,
         help='STR The file where the filtered streamlines will be saved. Can '
              'be of any file format supported by nibabel.')
     filter_subparser.add_argument(
         '--min-length', metavar='FLOAT', type=float,
         help='The minimum length of streamlines included in the output.')
-    filter_subparser.set_defaults(func=filter)
+    filter_subparser.add_argument(
+        '--max-length', metavar='FLOAT', type=float,
+        help='The maximum length of streamlines included in the output.')
+    filter_subparser.add_argument(
+        '--min-points', metavar='INT', type=int,
+        help='The minimum number of points of streamlines included in the '
+             'output.')
+    filter_subparser.add_argument(
+        '--max-points', metavar='INT', type=int,
+        help='The maximum number of points of streamlines included in the '
+             'output.')
+    filter_subparser.add_argument(
+        '--bounding-box', metavar='FLOAT', type=float, nargs=6,
+        help='XMIN YMIN ZMIN XMAX YMAX ZMAX Keep only the streamlines whose '
+             'points are all inside the box.')
+    filter_subparser.add_argument(
+        '--endpoint-region', metavar='FLOAT', type=float, nargs=6,
+        help='XMIN YMIN ZMIN XMAX YMAX ZMAX Keep only the streamlines whose '
+             'endpoints are inside the box. See --endpoint-mode.')
+    filter_subparser.add_argument(
+        '--endpoint-mode', type=str, default='any',
+        choices=EndpointRegion.modes,
+        help='Which endpoints must be inside the --endpoint-region.')
+    filter_subparser.add_argument(
+        '--max-curvature', metavar='FLOAT', type=float,
+        help='The maximum curvature in 1/mm at any point of the streamlines '
+             'included in the output.')
+    filter_subparser.add_argument(
+        '--max-mean-curvature', metavar='FLOAT', type=float,
+        help='The maximum mean curvature in 1/mm of the streamlines included '
+             'in the output.')
+    filter_subparser.add_argument(
+        '--max-torsion', metavar='FLOAT', type=float,
+        help='The maximum absolute torsion in 1/mm at any point of the '
+             'streamlines included in the output.')
+    filter_subparser.add_argument(
+        '--max-angle', metavar='FLOAT', type=float,
+        help='The maximum angle in degrees between consecutive segments of '
+             'the streamlines included in the output.')
+    filter_subparser.add_argument(
+        '--max-tortuosity', metavar='FLOAT', type=float,
+        help='The maximum ratio of the length to the distance between the '
+             'endpoints of the streamlines included in the output.')
+    filter_subparser.add_argument(
+        '--data-min', metavar=('KEY', 'FLOAT'), nargs=2, action='append',
+        help='Keep only the streamlines whose data KEY is at least FLOAT. '
+             'Can be repeated.')
+    filter_subparser.add_argument(
+        '--data-max', metavar=('KEY', 'FLOAT'), nargs=2, action='append',
+        help='Keep only the streamlines whose data KEY is at most FLOAT. '
+             'Can be repeated.')
+    filter_subparser.add_argument(
+        '--min-cci', metavar='FLOAT', type=float,
+        help='Keep only the streamlines whose cluster confidence index is at '
+             'least FLOAT, i.e. remove the outliers that have few similar '
+             'streamlines. The index is computed over all the streamlines of '
+             'the file.')
+    filter_subparser.add_argument(
+        '--cci-distance', metavar='FLOAT', type=float, default=5.0,
+        help='The MDF distance in mm under which streamlines support each '
+             'other in the cluster confidence index.')
+    filter_subparser.add_argument(
+        '--processes', metavar='INT', type=int, default=1,
+        help='The number of processes used to compute the cluster confidence '
+             'index.')
+    filter_subparser.add_argument(
+        '--chunk-size', metavar='INT', type=int,
+        help='Process the file in chunks of INT streamlines instead of '
+             'loading it in memory. Chunks are read, filtered and written '
+             'concurrently.')
+    filter_subparser.set_defaults(func=filter, cacheable=True)
 
 
-def filter(input_filename, output_filename, **kwargs):
+def filter(input_filename, output_filename, bounding_box=None,
+           endpoint_region=None, endpoint_mode='any', max_curvature=None,
+           max_mean_curvature=None, max_torsion=None, max_angle=None,
+           max_tortuosity=None, data_min=None, data_max=None, min_cci=None,
+           cci_distance=5.0, processes=1, chunk_size=None, **kwargs):
     """Removes streamlines from a file based on features
 
     Removes streamlines from a file based on their features. For example,
@@ -35,12 +126,105 @@ def filter(input_filename, output_filename, **kwargs):
         input_filename: The file that contains the streamlines to filter.
         output_filename: The file where the remaining streamlines will be
             saved.
+        bounding_box (optional): The minimum and maximum corners of a box
+            that must contain all the points of the streamlines.
+        endpoint_region (optional): The minimum and maximum corners of a box
+            that must contain the endpoints of the streamlines.
+        endpoint_mode (optional): Which endpoints must be in the endpoint
+            region. See streamlines.criteria.EndpointRegion.
+        max_curvature (optional): The maximum curvature at any point of the
+            streamlines.
+        max_mean_curvature (optional): The maximum mean curvature of the
+            streamlines.
+        max_torsion (optional): The maximum absolute torsion at any point of
+            the streamlines.
+        max_angle (optional): The maximum angle in degrees between
+            consecutive segments of the streamlines.
+        max_tortuosity (optional): The maximum tortuosity of the
+            streamlines.
+        data_min (optional): A list of (key, value) pairs. The data of the
+            streamlines for key must be at least value.
+        data_max (optional): A list of (key, value) pairs. The data of the
+            streamlines for key must be at most value.
+        min_cci (optional): The minimum cluster confidence index of the
+            streamlines. See streamlines.confidence.
+        cci_distance (optional): The MDF distance under which streamlines
+            support each other in the cluster confidence index.
+        processes (optional): The number of processes used to compute the
+            cluster confidence index.
+        chunk_size (optional): If provided, the file is processed in chunks
+            of chunk_size streamlines. With min_cci, the file is read twice:
+            once to compute the cluster confidence index of all the
+            streamlines and once to filter them.
 
     """
 
+    criteria = []
+    if bounding_box is not None:
+        criteria.append(BoundingBox(bounding_box[:3], bounding_box[3:]))
+    if endpoint_region is not None:
+        criteria.append(EndpointRegion(
+            endpoint_region[:3], endpoint_region[3:], endpoint_mode))
+    if max_curvature is not None:
+        criteria.append(Curvature(maximum=max_curvature))
+    if max_mean_curvature is not None:
+        criteria.append(Curvature(maximum=max_mean_curvature,
+                                  reduction='mean'))
+    if max_torsion is not None:
+        criteria.append(Torsion(maximum=max_torsion))
+    if max_angle is not None:
+        criteria.append(TurningAngle(maximum=max_angle))
+    if max_tortuosity is not None:
+        criteria.append(Tortuosity(maximum=max_tortuosity))
+    for key, value in data_min or []:
+        criteria.append(Data(key, minimum=float(value)))
+    for key, value in data_max or []:
+        criteria.append(Data(key, maximum=float(value)))
+
+    if chunk_size is not None:
+        if min_cci is not None:
+            keep = _confidence_mask(
+                input_filename, chunk_size, min_cci, cci_distance, processes)
+        start = 0
+
+        def apply(chunk):
+            nonlocal start
+            chunk_criteria = criteria
+            if min_cci is not None:
+                selection = Selection(keep[start:start + len(chunk)])
+                chunk_criteria = criteria + [selection]
+            start += len(chunk)
+            return chunk.filter(criterion=all_of(*chunk_criteria), **kwargs)
+
+        map_chunks(apply, input_filename, output_filename, chunk_size)
+        return
+
+    if min_cci is not None:
+        criteria.append(ClusterConfidence(
+            min_cci, cci_distance, processes=processes))
+    criterion = all_of(*criteria)
+
     # Load the input_streamlines using the requested parameters.
     streamlines = load(input_filename)
-    streamlines.filter(**kwargs)
+    streamlines.filter(criterion=criterion, **kwargs)
 
     # Save the streamlines to the output file.
     save(streamlines, output_filename)
+
+
+def _confidence_mask(filename, chunk_size, min_cci, max_distance, processes,
+                     nb_points=12):
+    """Computes which streamlines of a file have a high enough CCI
+
+    Only the resampled streamlines of each chunk are kept in memory.
+
+    """
+
+    resampled = [np.zeros((0, nb_points, 3))]
+    for chunk in load_chunks(filename, chunk_size):
+        resampled.append(packed.resample(
+            *packed.pack([s._points for s in chunk]), nb_points))
+
+    scores = confidence_scores(
+        np.concatenate(resampled), max_distance, processes=processes)
+    return scores >= min_cci
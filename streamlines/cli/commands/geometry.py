@@ -0,0 +1,50 @@
+import argparse
+
+from streamlines.io import load
+from streamlines.io import map_chunks
+from streamlines.io import save
+
+
+def add_parser(subparsers):
+
+    # The geometry subparser.
+    geometry_subparser = subparsers.add_parser(
+        'geometry',
+        description='Computes the curvature, torsion and turning angle at '
+                    'every point of the streamlines and saves them as data '
+                    'per point named curvature, torsion and turning_angle.',
+        help='Computes the curvature and torsion of streamlines.',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    geometry_subparser.add_argument(
+        'input_filename', metavar='input_file', type=str,
+        help='STR The file that contains the streamlines. Can be of any file '
+             'format supported by nibabel.')
+    geometry_subparser.add_argument(
+        'output_filename', metavar='output_file', type=str,
+        help='STR The file where the streamlines and their geometry will be '
+             'saved. Can be of any file format supported by nibabel.')
+    geometry_subparser.add_argument(
+        '--chunk-size', metavar='INT', type=int,
+        help='Process the file in chunks of INT streamlines instead of '
+             'loading it in memory.')
+    geometry_subparser.set_defaults(func=geometry, cacheable=True)
+
+
+def geometry(input_filename, output_filename, chunk_size=None):
+    """Computes the geometry of the streamlines of a file
+
+    Args:
+        input_filename: The file that contains the streamlines.
+        output_filename: The file where the streamlines and their geometry
+            will be saved.
+        chunk_size (optional): If provided, the file is processed in chunks
+            of chunk_size streamlines.
+
+    """
+
+    if chunk_size is not None:
+        map_chunks(lambda c: c.geometry(), input_filename, output_filename,
+                   chunk_size)
+        return
+
+    save(load(input_filename).geometry(), output_filename)
@@ -1,6 +1,4 @@
-from functools import reduce
-from operator import iadd
-
+from streamlines import Streamlines
 from streamlines.io import load
 from streamlines.io import save
 
@@ -27,8 +25,7 @@ def add_parser(subparsers):
 def merge(inputs, output):
 
     # Load all the input streamlines and merge them.
-    streamlines_list = [load(i) for i in inputs]
-    streamlines = reduce(iadd, streamlines_list)
+    streamlines = Streamlines.concatenate(load(i) for i in inputs)
 
     # Save the streamlines to the output file.
     save(streamlines, output)
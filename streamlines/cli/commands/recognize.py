@@ -0,0 +1,89 @@
+import argparse
+import os
+
+import numpy as np
+
+from streamlines import Streamlines
+from streamlines.io import load
+from streamlines.io import save
+from streamlines.recognition import CentroidIndex
+
+
+def add_parser(subparsers):
+
+    # The recognize subparser.
+    recognize_subparser = subparsers.add_parser(
+        'recognize',
+        description='Assigns each streamline to the bundle of the nearest '
+                    'centroid of an atlas. The atlas is a set of files, one '
+                    'per bundle, that contain the centroids of the bundle. '
+                    'The name of a bundle is the name of its file without '
+                    'extension. The distance between streamlines is the '
+                    'minimum average direct-flip distance.',
+        help='Assigns streamlines to the bundles of an atlas.',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    recognize_subparser.add_argument(
+        'input_filename', metavar='input_file', type=str,
+        help='STR The file that contains the streamlines to recognize. Can '
+             'be of any file format supported by nibabel.')
+    recognize_subparser.add_argument(
+        'atlas_filenames', metavar='atlas_file', type=str, nargs='+',
+        help='STR The files that contain the centroids of each bundle.')
+    recognize_subparser.add_argument(
+        'output_directory', metavar='output_directory', type=str,
+        help='STR The directory where the streamlines of each bundle will be '
+             'saved, in the file format of the input file.')
+    recognize_subparser.add_argument(
+        '--threshold', metavar='FLOAT', type=float, default=10.0,
+        help='The maximum distance between a streamline and the nearest '
+             'centroid of its bundle.')
+    recognize_subparser.add_argument(
+        '--nb-points', metavar='INT', type=int, default=20,
+        help='The number of points used to compare streamlines.')
+    recognize_subparser.add_argument(
+        '--labels', metavar='FILE', type=str,
+        help='STR The text file where the bundle of each streamline will be '
+             'saved, or "none" for streamlines that are not recognized.')
+    recognize_subparser.set_defaults(func=recognize)
+
+
+def recognize(input_filename, atlas_filenames, output_directory,
+              threshold=10.0, nb_points=20, labels=None):
+    """Assigns the streamlines of a file to the bundles of an atlas
+
+    Args:
+        input_filename: The file that contains the streamlines to recognize.
+        atlas_filenames: The files that contain the centroids of each bundle.
+        output_directory: The directory where the streamlines of each bundle
+            will be saved.
+        threshold (optional): The maximum distance between a streamline and
+            the nearest centroid of its bundle.
+        nb_points (optional): The number of points used to compare
+            streamlines.
+        labels (optional): The text file where the bundle of each streamline
+            will be saved.
+
+    """
+
+    bundles = {}
+    for filename in atlas_filenames:
+        name = os.path.basename(filename).split('.')[0]
+        bundles[name] = load(filename)
+    index = CentroidIndex.from_bundles(bundles, nb_points=nb_points)
+
+    streamlines = load(input_filename)
+    bundle_ids = index.recognize(streamlines, threshold)
+
+    extension = os.path.basename(input_filename).split('.', 1)[-1]
+    os.makedirs(output_directory, exist_ok=True)
+    for i, name in enumerate(index.bundles):
+
+        # The Streamline instances are appended as is to keep their data.
+        bundle = Streamlines(
+            None, streamlines.coordinate_system, streamlines.transforms)
+        bundle.extend(s for s, b in zip(streamlines, bundle_ids) if b == i)
+        save(bundle, os.path.join(output_directory, f'{name}.{extension}'))
+
+    if labels is not None:
+        names = np.array(index.bundles + ['none'])
+        np.savetxt(labels, names[bundle_ids], fmt='%s')
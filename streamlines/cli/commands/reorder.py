@@ -0,0 +1,82 @@
+import argparse
+
+import numpy as np
+
+from streamlines.io import load
+from streamlines.io import save
+from streamlines.ordering import anchors
+from streamlines.ordering import curves
+
+
+def add_parser(subparsers):
+
+    # The reorder subparser.
+    reorder_subparser = subparsers.add_parser(
+        'reorder',
+        description='Sorts the streamlines along a space-filling curve so '
+                    'that neighboring streamlines are next to each other in '
+                    'the output file. This improves the compression of the '
+                    'file and the locality of chunked processing. The data '
+                    'of the streamlines is reordered with them.',
+        help='Sorts streamlines spatially along a space-filling curve.',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    reorder_subparser.add_argument(
+        'input_filename', metavar='input_file', type=str,
+        help='STR The file that contains the streamlines to reorder. Can be '
+             'of any file format supported by nibabel.')
+    reorder_subparser.add_argument(
+        'output_filename', metavar='output_file', type=str,
+        help='STR The file where the reordered streamlines will be saved. '
+             'Can be of any file format supported by nibabel.')
+    reorder_subparser.add_argument(
+        '--curve', type=str, default='hilbert', choices=tuple(curves),
+        help='The space-filling curve.')
+    reorder_subparser.add_argument(
+        '--anchor', type=str, default='midpoint', choices=anchors,
+        help='The points of the streamlines that are sorted along the curve.')
+    reorder_subparser.add_argument(
+        '--bits', metavar='INT', type=int, default=16,
+        help='The number of bits per axis of the grid of the curve.')
+    reorder_subparser.add_argument(
+        '--permutation', metavar='FILE', type=str,
+        help='STR A .npy file where the permutation is saved. The streamline '
+             'at position i of the output is the streamline at position '
+             'permutation[i] of the input.')
+    reorder_subparser.add_argument(
+        '--restore', action='store_true',
+        help='Restore the original order of streamlines reordered with the '
+             '--permutation file instead of sorting them.')
+    reorder_subparser.set_defaults(func=reorder)
+
+
+def reorder(input_filename, output_filename, curve='hilbert',
+            anchor='midpoint', bits=16, permutation=None, restore=False):
+    """Sorts the streamlines of a file along a space-filling curve
+
+    Args:
+        input_filename: The file that contains the streamlines to reorder.
+        output_filename: The file where the reordered streamlines will be
+            saved.
+        curve (optional): 'hilbert' or 'morton'.
+        anchor (optional): 'midpoint' or 'endpoints'.
+        bits (optional): The number of bits per axis of the grid of the
+            curve.
+        permutation (optional): A .npy file where the permutation is saved.
+        restore (optional): If True, the streamlines are put back in their
+            original order using the permutation file.
+
+    """
+
+    streamlines = load(input_filename)
+
+    if restore:
+        if permutation is None:
+            raise ValueError('A permutation file is required to restore the '
+                             'original order.')
+        streamlines.permute(np.argsort(np.load(permutation)))
+    else:
+        order = streamlines.reorder(curve, anchor, bits)
+        if permutation is not None:
+            np.save(permutation, order)
+
+    save(streamlines, output_filename)
@@ -1,6 +1,7 @@
 import argparse
 
 from streamlines.io import load
+from streamlines.io import map_chunks
 from streamlines.io import save
 
 
@@ -15,16 +16,22 @@ def add_parser(subparsers):
         help='Reorients streamlines of a bundle.',
         formatter_class=argparse.ArgumentDefaultsHelpFormatter)
     reorient_subparser.add_argument(
-        'input', metavar='input_file', type=str,
+        'input_filename', metavar='input_file', type=str,
         help='STR The file that contains the streamlines to reorient. Can be '
              'of any file format supported by nibabel.')
     reorient_subparser.add_argument(
-        'output', metavar='output_file', type=str,
+        'output_filename', metavar='output_file', type=str,
         help='STR The file where the reoriented streamlines will be saved. '
              'Can be of any file format supported by nibabel.')
+    reorient_subparser.add_argument(
+        '--chunk-size', metavar='INT', type=int,
+        help='Process the file in chunks of INT streamlines instead of '
+             'loading it in memory. Chunks are read, reoriented and written '
+             'concurrently.')
+    reorient_subparser.set_defaults(func=reorient, cacheable=True)
 
 
-def reorient(input_filename, output_filename, **kwargs):
+def reorient(input_filename, output_filename, chunk_size=None):
     """Reorients streamlines in a file
 
     Reorients the streamlines so they all have the same orientation (similar
@@ -34,12 +41,27 @@ def reorient(input_filename, output_filename, **kwargs):
     Args:
         input_filename: The file that contains the streamlines to smooth.
         output_filename: The file where the smoothed streamlines will be saved.
+        chunk_size (optional): If provided, the file is processed in chunks
+            of chunk_size streamlines. All chunks are reoriented using the
+            first streamline of the file.
 
     """
 
+    if chunk_size is not None:
+        template = []
+
+        def reorient_chunk(chunk):
+            if len(template) == 0 and len(chunk) > 0:
+                template.append(chunk[0])
+            return chunk.reorient(*template)
+
+        map_chunks(reorient_chunk, input_filename, output_filename,
+                   chunk_size)
+        return
+
     # Load the input streamlines using the requested parameters.
     streamlines = load(input_filename)
-    streamlines.reorient(**kwargs)
+    streamlines.reorient()
 
     # Save the streamlines to the output file.
     save(streamlines, output_filename)
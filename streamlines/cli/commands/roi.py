@@ -0,0 +1,73 @@
+import nibabel as nib
+import numpy as np
+
+from streamlines.criteria import Roi
+from streamlines.io import load
+from streamlines.io import load_chunks
+from streamlines.io import save
+from streamlines.io import save_chunks
+
+
+def add_parser(subparsers):
+
+    # The roi subparser.
+    roi_subparser = subparsers.add_parser(
+        'roi',
+        description='Selects the streamlines that intersect a region of '
+                    'interest defined by a mask. The streamlines are mapped '
+                    'to the voxel space of the file if it is available, '
+                    'otherwise the affine of the mask is used.',
+        help='Selects streamlines using a region of interest.')
+    roi_subparser.add_argument(
+        'input_filename', metavar='input_file', type=str,
+        help='STR The file that contains the streamlines to select. Can be of '
+             'any file format supported by nibabel.')
+    roi_subparser.add_argument(
+        'mask_filename', metavar='mask_file', type=str,
+        help='STR The NIfTI file of the region of interest. Non-zero voxels '
+             'are part of the region.')
+    roi_subparser.add_argument(
+        'output_filename', metavar='output_file', type=str,
+        help='STR The file where the selected streamlines will be saved. Can '
+             'be of any file format supported by nibabel.')
+    roi_subparser.add_argument(
+        '--mode', type=str, default='include', choices=Roi.modes,
+        help='include keeps streamlines that pass through the region, exclude '
+             'those that do not, endpoints those that start or end in the '
+             'region and both-endpoints those that start and end in it.')
+    roi_subparser.add_argument(
+        '--chunk-size', metavar='INT', type=int,
+        help='Process the file in chunks of INT streamlines instead of '
+             'loading it in memory.')
+    roi_subparser.set_defaults(func=roi, cacheable=True)
+
+
+def roi(input_filename, mask_filename, output_filename, mode='include',
+        chunk_size=None):
+    """Selects streamlines using a region of interest
+
+    Args:
+        input_filename: The file that contains the streamlines to select.
+        mask_filename: The NIfTI file of the region of interest.
+        output_filename: The file where the selected streamlines will be
+            saved.
+        mode (optional): How the streamlines must intersect the region. See
+            streamlines.criteria.Roi.
+        chunk_size (optional): If provided, the file is processed in chunks
+            of chunk_size streamlines.
+
+    """
+
+    image = nib.load(mask_filename)
+    criterion = Roi(np.asanyarray(image.dataobj), mode, image.affine)
+
+    if chunk_size is not None:
+        chunks = load_chunks(input_filename, chunk_size)
+        save_chunks(
+            (c.filter(criterion=criterion) for c in chunks), output_filename)
+        return
+
+    streamlines = load(input_filename)
+    streamlines.filter(criterion=criterion)
+
+    save(streamlines, output_filename)
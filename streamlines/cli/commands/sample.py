@@ -0,0 +1,98 @@
+import argparse
+import os
+
+import nibabel as nib
+import numpy as np
+
+from streamlines.io import load
+from streamlines.io import map_chunks
+from streamlines.io import save
+from streamlines.voxels import interpolations
+from streamlines.voxels import voxel_affine
+
+
+def add_parser(subparsers):
+
+    # The sample subparser.
+    sample_subparser = subparsers.add_parser(
+        'sample',
+        description='Samples scalar maps at every point of the streamlines '
+                    'and saves the values as data per point. All the maps '
+                    'are sampled in the same pass over the file. The '
+                    'streamlines are mapped to the voxel space of the file '
+                    'if it is available, otherwise the affine of the maps is '
+                    'used.',
+        help='Samples scalar maps along streamlines.',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    sample_subparser.add_argument(
+        'input_filename', metavar='input_file', type=str,
+        help='STR The file that contains the streamlines. Can be of any file '
+             'format supported by nibabel.')
+    sample_subparser.add_argument(
+        'output_filename', metavar='output_file', type=str,
+        help='STR The file where the streamlines and the sampled values will '
+             'be saved. Can be of any file format supported by nibabel.')
+    sample_subparser.add_argument(
+        'map_filenames', metavar='map_file', type=str, nargs='+',
+        help='STR The NIfTI files of the maps to sample. All the maps must '
+             'have the same voxel grid.')
+    sample_subparser.add_argument(
+        '--names', metavar='STR', type=str, nargs='+',
+        help='The names of the data of each map. The default is the name of '
+             'the map files without extension.')
+    sample_subparser.add_argument(
+        '--interpolation', type=str, default='trilinear',
+        choices=tuple(interpolations),
+        help='The interpolation of the maps.')
+    sample_subparser.add_argument(
+        '--chunk-size', metavar='INT', type=int,
+        help='Process the file in chunks of INT streamlines instead of '
+             'loading it in memory.')
+    sample_subparser.set_defaults(func=sample, cacheable=True)
+
+
+def sample(input_filename, output_filename, map_filenames, names=None,
+           interpolation='trilinear', chunk_size=None):
+    """Samples scalar maps along streamlines
+
+    Args:
+        input_filename: The file that contains the streamlines.
+        output_filename: The file where the streamlines and the sampled
+            values will be saved.
+        map_filenames: The NIfTI files of the maps to sample.
+        names (optional): The names of the data of each map. The default is
+            the name of the map files without extension.
+        interpolation (optional): 'nearest' or 'trilinear'.
+        chunk_size (optional): If provided, the file is processed in chunks
+            of chunk_size streamlines.
+
+    """
+
+    if names is None:
+        names = [os.path.basename(f).split('.', 1)[0] for f in map_filenames]
+    if len(names) != len(map_filenames):
+        raise ValueError(
+            f'There must be one name per map ({len(names)} != '
+            f'{len(map_filenames)}).')
+
+    images = [nib.load(f) for f in map_filenames]
+    for image, filename in zip(images[1:], map_filenames[1:]):
+        if (image.shape[:3] != images[0].shape[:3] or
+                not np.allclose(image.affine, images[0].affine)):
+            raise ValueError(
+                f'The map {filename} is not on the same voxel grid as '
+                f'{map_filenames[0]}.')
+
+    volumes = {name: image.get_fdata(dtype=np.float32)
+               for name, image in zip(names, images)}
+    image_affine = images[0].affine
+
+    def apply(streamlines):
+        affine = voxel_affine(streamlines, image_affine)
+        return streamlines.sample(volumes, affine, interpolation)
+
+    if chunk_size is not None:
+        map_chunks(apply, input_filename, output_filename, chunk_size)
+        return
+
+    save(apply(load(input_filename)), output_filename)
@@ -0,0 +1,52 @@
+import argparse
+
+from streamlines.sharding import balance_modes
+from streamlines.sharding import shard as shard_file
+
+
+def add_parser(subparsers):
+
+    # The shard subparser.
+    shard_subparser = subparsers.add_parser(
+        'shard',
+        description='Splits a file into shards that contain consecutive '
+                    'streamlines so they can be processed in parallel. The '
+                    'shards are named shard-INDEX-of-COUNT and keep the '
+                    'coordinate system of the file. Concatenating the shards '
+                    'in order gives back the original streamlines.',
+        help='Splits a file into balanced shards.',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    shard_subparser.add_argument(
+        'input_filename', metavar='input_file', type=str,
+        help='STR The file that contains the streamlines to split. Can be of '
+             'any file format supported by nibabel.')
+    shard_subparser.add_argument(
+        'output_directory', metavar='output_directory', type=str,
+        help='STR The directory where the shards will be saved.')
+    shard_subparser.add_argument(
+        'nb_shards', metavar='nb_shards', type=int,
+        help='INT The number of shards.')
+    shard_subparser.add_argument(
+        '--balance', type=str, default='streamlines', choices=balance_modes,
+        help='Give each shard the same number of streamlines or of points.')
+    shard_subparser.add_argument(
+        '--chunk-size', metavar='INT', type=int, default=100000,
+        help='The number of streamlines read at once.')
+    shard_subparser.set_defaults(func=shard)
+
+
+def shard(input_filename, output_directory, nb_shards,
+          balance='streamlines', chunk_size=100000):
+    """Splits a file into balanced shards
+
+    Args:
+        input_filename: The file that contains the streamlines to split.
+        output_directory: The directory where the shards will be saved.
+        nb_shards: The number of shards.
+        balance (optional): 'streamlines' or 'points'. See
+            streamlines.sharding.shard.
+        chunk_size (optional): The number of streamlines read at once.
+
+    """
+    shard_file(input_filename, output_directory, nb_shards, balance,
+               chunk_size)
@@ -1,6 +1,7 @@
 import argparse
 
 from streamlines.io import load
+from streamlines.io import map_chunks
 from streamlines.io import save
 
 
@@ -15,21 +16,26 @@ def add_parser(subparsers):
         help='Smooths streamlines using a least square b-spline.',
         formatter_class=argparse.ArgumentDefaultsHelpFormatter)
     smooth_subparser.add_argument(
-        'input', metavar='input_file', type=str,
+        'input_filename', metavar='input_file', type=str,
         help='STR The file that contains the streamlines to smooth. Can be of '
              'any file format supported by nibabel.')
     smooth_subparser.add_argument(
-        'output', metavar='output_file', type=str,
+        'output_filename', metavar='output_file', type=str,
         help='STR The file where the smoothed streamlines will be saved. Can '
              'be of any file format supported by nibabel.')
     smooth_subparser.add_argument(
         '--knot-distance', metavar='FLOAT', type=float, default=10.0,
         help='The distance between knots. Larger distance yield smoother '
              'streamlines.')
-    smooth_subparser.set_defaults(func=smooth)
+    smooth_subparser.add_argument(
+        '--chunk-size', metavar='INT', type=int,
+        help='Process the file in chunks of INT streamlines instead of '
+             'loading it in memory. Chunks are read, smoothed and written '
+             'concurrently.')
+    smooth_subparser.set_defaults(func=smooth, cacheable=True)
 
 
-def smooth(input_filename, output_filename, **kwargs):
+def smooth(input_filename, output_filename, chunk_size=None, **kwargs):
     """Smooths streamlines in a file
 
     Smooths streamlines using a least square b-spline. The distance between
@@ -39,9 +45,16 @@ def smooth(input_filename, output_filename, **kwargs):
     Args:
         input_filename: The file that contains the streamlines to smooth.
         output_filename: The file where the smoothed streamlines will be saved.
+        chunk_size (optional): If provided, the file is processed in chunks
+            of chunk_size streamlines.
 
     """
 
+    if chunk_size is not None:
+        map_chunks(lambda c: c.smooth(**kwargs), input_filename,
+                   output_filename, chunk_size)
+        return
+
     # Load the input streamlines using the requested parameters.
     streamlines = load(input_filename)
     streamlines.smooth(**kwargs)
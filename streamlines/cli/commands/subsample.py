@@ -0,0 +1,68 @@
+import argparse
+
+from streamlines.io import load_chunks
+from streamlines.io import save
+from streamlines.sampling import subsample as subsample_chunks
+
+
+def add_parser(subparsers):
+
+    # The subsample subparser.
+    subsample_subparser = subparsers.add_parser(
+        'subsample',
+        description='Draws a uniformly random subset of the streamlines of a '
+                    'file. The file is read once, in chunks, so only the '
+                    'sample is kept in memory.',
+        help='Draws a random subset of streamlines.',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    subsample_subparser.add_argument(
+        'input_filename', metavar='input_file', type=str,
+        help='STR The file that contains the streamlines to subsample. Can '
+             'be of any file format supported by nibabel.')
+    subsample_subparser.add_argument(
+        'output_filename', metavar='output_file', type=str,
+        help='STR The file where the sampled streamlines will be saved. Can '
+             'be of any file format supported by nibabel.')
+    size_group = subsample_subparser.add_mutually_exclusive_group(
+        required=True)
+    size_group.add_argument(
+        '--count', metavar='INT', type=int,
+        help='The number of streamlines to sample, or the number of '
+             'streamlines to sample in each length bin.')
+    size_group.add_argument(
+        '--fraction', metavar='FLOAT', type=float,
+        help='The fraction of the streamlines to sample.')
+    subsample_subparser.add_argument(
+        '--length-bins', metavar='FLOAT', type=float, nargs='+',
+        help='The increasing edges of length bins used to stratify the '
+             'sample. Streamlines outside the bins are not sampled.')
+    subsample_subparser.add_argument(
+        '--seed', metavar='INT', type=int,
+        help='The seed of the random number generator.')
+    subsample_subparser.add_argument(
+        '--chunk-size', metavar='INT', type=int, default=100000,
+        help='The number of streamlines read at once.')
+    subsample_subparser.set_defaults(func=subsample)
+
+
+def subsample(input_filename, output_filename, count=None, fraction=None,
+              length_bins=None, seed=None, chunk_size=100000):
+    """Draws a uniformly random subset of the streamlines of a file
+
+    Args:
+        input_filename: The file that contains the streamlines to subsample.
+        output_filename: The file where the sampled streamlines will be
+            saved.
+        count (optional): The number of streamlines to sample, per length
+            bin if length_bins is provided.
+        fraction (optional): The fraction of the streamlines to sample.
+        length_bins (optional): The edges of the length bins used to
+            stratify the sample.
+        seed (optional): The seed of the random number generator.
+        chunk_size (optional): The number of streamlines read at once.
+
+    """
+
+    chunks = load_chunks(input_filename, chunk_size)
+    save(subsample_chunks(chunks, count, fraction, length_bins, seed),
+         output_filename)
@@ -0,0 +1,103 @@
+import argparse
+
+import nibabel as nib
+import numpy as np
+from nicoord import AffineTransform
+from nicoord import CoordinateSystem
+from nicoord import CoordinateSystemSpace
+from nicoord import CoordinateSystemAxes
+from nicoord import coord
+
+from streamlines.io import load
+from streamlines.io import map_chunks
+from streamlines.io import save
+from streamlines.warp import warp as warp_streamlines
+
+
+# The native RAS coordinate system of the streamlines loaded from files.
+_ras_mm = CoordinateSystem(
+    CoordinateSystemSpace.NATIVE, CoordinateSystemAxes.RAS)
+
+
+def add_parser(subparsers):
+
+    # The warp subparser.
+    warp_subparser = subparsers.add_parser(
+        'warp',
+        description='Warps streamlines with a displacement field. Each point '
+                    'is moved by the displacement trilinearly interpolated '
+                    'at that point. The field must be defined in the space '
+                    'of the streamlines and map them to the target space, '
+                    'i.e. it is usually the inverse of the warp used to '
+                    'resample images to the target space.',
+        help='Warps streamlines with a displacement field.',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    warp_subparser.add_argument(
+        'input_filename', metavar='input_file', type=str,
+        help='STR The file that contains the streamlines to warp. Can be of '
+             'any file format supported by nibabel.')
+    warp_subparser.add_argument(
+        'field_filename', metavar='field_file', type=str,
+        help='STR The NIfTI file of the displacement field, in mm, with a '
+             'shape of (X, Y, Z, 3) or (X, Y, Z, 1, 3).')
+    warp_subparser.add_argument(
+        'output_filename', metavar='output_file', type=str,
+        help='STR The file where the warped streamlines will be saved. Can '
+             'be of any file format supported by nibabel.')
+    warp_subparser.add_argument(
+        '--reference', metavar='FILE', type=str, dest='reference_filename',
+        help='STR A NIfTI image that defines the voxel space of the target '
+             'space, e.g. a template.')
+    warp_subparser.add_argument(
+        '--lps', action='store_true',
+        help='The displacements are in LPS coordinates, as written by ITK '
+             'and ANTs, instead of RAS.')
+    warp_subparser.add_argument(
+        '--chunk-size', metavar='INT', type=int,
+        help='Process the file in chunks of INT streamlines instead of '
+             'loading it in memory.')
+    warp_subparser.set_defaults(func=warp, cacheable=True)
+
+
+def warp(input_filename, field_filename, output_filename,
+         reference_filename=None, lps=False, chunk_size=None):
+    """Warps streamlines with a displacement field
+
+    Args:
+        input_filename: The file that contains the streamlines to warp.
+        field_filename: The NIfTI file of the displacement field.
+        output_filename: The file where the warped streamlines will be saved.
+        reference_filename (optional): A NIfTI image that defines the voxel
+            space of the target space. If not provided, the warped
+            streamlines have no voxel space.
+        lps (optional): If True, the displacements are in LPS coordinates.
+        chunk_size (optional): If provided, the file is processed in chunks
+            of chunk_size streamlines.
+
+    """
+
+    field_image = nib.load(field_filename)
+    field = field_image.get_fdata(dtype=np.float32)
+    if field.ndim == 5 and field.shape[3] == 1:
+        field = field[:, :, :, 0]
+    if lps:
+        field[..., :2] *= -1
+    affine = np.linalg.inv(field_image.affine)
+
+    transforms = None
+    if reference_filename is not None:
+        reference_image = nib.load(reference_filename)
+        target = coord('voxel', 'ras', reference_image.header.get_zooms()[:3],
+                       reference_image.shape[:3])
+        transforms = [AffineTransform(
+            _ras_mm, target, np.linalg.inv(reference_image.affine))]
+
+    def apply(streamlines):
+        return warp_streamlines(
+            streamlines, field, affine, _ras_mm, transforms)
+
+    if chunk_size is not None:
+        map_chunks(apply, input_filename, output_filename, chunk_size)
+        return
+
+    save(apply(load(input_filename)), output_filename)
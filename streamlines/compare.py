@@ -0,0 +1,186 @@
+import numpy as np
+
+import streamlines as sl
+from . import packed
+from .density import track_density
+from .recognition import nearest
+from .voxels import voxel_affine, voxel_shape
+
+
+streamed_modes = ('candidate', 'reference')
+
+
+def compare(candidate, reference, shape=None, affine=None, threshold=5.0,
+            nb_points=20, step=None, stream='candidate'):
+    """Compares a candidate bundle to a reference bundle
+
+    Computes voxel and streamline metrics together. Each tractogram is
+    voxelized once, to a mask of the voxels crossed by its streamlines, and
+    resampled once. The nearest streamline distances are computed between
+    the resampled streamlines in vectorized blocks. One tractogram is
+    streamed, one chunk at a time, while only the resampled streamlines and
+    the mask of the other one are kept in memory.
+
+    The metrics are:
+        dice: The Dice coefficient of the voxel masks.
+        overlap: The fraction of the reference voxels that are in the
+            candidate mask.
+        overreach: The number of candidate voxels outside the reference mask
+            divided by the number of reference voxels.
+        bundle_adjacency: The mean of the fraction of candidate streamlines
+            within threshold of a reference streamline and of the fraction of
+            reference streamlines within threshold of a candidate streamline.
+        candidate_distance: The mean distance of the candidate streamlines to
+            the nearest reference streamline.
+        reference_distance: The mean distance of the reference streamlines to
+            the nearest candidate streamline.
+        bundle_distance: The bundle minimum distance, i.e. the square of the
+            mean of candidate_distance and reference_distance.
+
+    Distances are MDF distances (see streamlines.asarray.mdf) between
+    streamlines resampled to nb_points. Metrics that are undefined, e.g. for
+    empty bundles, are NaN.
+
+    Args:
+        candidate: A streamlines.Streamlines instance or an iterable of
+            chunks of streamlines, e.g. from streamlines.io.load_chunks.
+        reference: A streamlines.Streamlines instance or an iterable of
+            chunks of streamlines.
+        shape (optional): The shape of the voxel grid. The default is the
+            shape of the voxel space of the tractogram that is not streamed.
+        affine (optional): The (4, 4) affine from the coordinate system of
+            the streamlines to the voxel grid. The default is the transform
+            to voxel space of the tractogram that is not streamed.
+        threshold (optional): The distance under which streamlines are
+            adjacent.
+        nb_points (optional): The number of points used to resample the
+            streamlines.
+        step (optional): The maximum distance between points, in voxels,
+            used to supersample the streamlines before voxelization.
+        stream (optional): Which tractogram is streamed, 'candidate' or
+            'reference'. This should be the larger one.
+
+    Returns:
+        A dict of the metrics with the number of streamlines and voxels of
+        both tractograms.
+
+    """
+
+    if stream not in streamed_modes:
+        raise ValueError(
+            f'The streamed tractogram must be one of {streamed_modes}, not '
+            f'{stream}.')
+
+    if stream == 'candidate':
+        streamed, kept = candidate, reference
+    else:
+        streamed, kept = reference, candidate
+
+    # Voxelize and resample the tractogram that is kept in memory.
+    kept_mask = None
+    kept_resampled = [np.zeros((0, nb_points, 3))]
+    for chunk in _chunks(kept):
+        if affine is None:
+            affine = voxel_affine(chunk)
+        if shape is None:
+            shape = voxel_shape(chunk)
+        kept_mask = track_density(chunk, shape, affine, step, out=kept_mask)
+        kept_resampled.append(_resample(chunk, nb_points))
+    kept_resampled = np.concatenate(kept_resampled)
+    kept_means = kept_resampled.mean(1)
+
+    # Stream the other tractogram, updating the nearest distances in both
+    # directions.
+    streamed_mask = None
+    streamed_distances = [np.zeros((0,))]
+    kept_distances = np.full((len(kept_resampled),), np.inf)
+    for chunk in _chunks(streamed):
+        if affine is None or shape is None:
+            raise ValueError(
+                'The voxel grid must be provided when the tractogram that '
+                'is not streamed is empty.')
+
+        streamed_mask = track_density(
+            chunk, shape, affine, step, out=streamed_mask)
+        resampled = _resample(chunk, nb_points)
+
+        distances, _ = nearest(resampled, kept_resampled, 1, kept_means)
+        streamed_distances.append(distances[:, 0])
+        distances, _ = nearest(kept_resampled, resampled, 1)
+        kept_distances = np.minimum(kept_distances, distances[:, 0])
+    streamed_distances = np.concatenate(streamed_distances)
+
+    if stream == 'candidate':
+        candidate_mask, reference_mask = streamed_mask, kept_mask
+        candidate_distances, reference_distances = (
+            streamed_distances, kept_distances)
+    else:
+        candidate_mask, reference_mask = kept_mask, streamed_mask
+        candidate_distances, reference_distances = (
+            kept_distances, streamed_distances)
+
+    return _metrics(candidate_mask, reference_mask, candidate_distances,
+                    reference_distances, threshold)
+
+
+def _chunks(streamlines):
+    """Iterates over the chunks of a tractogram"""
+    if isinstance(streamlines, sl.Streamlines):
+        return [streamlines]
+    return streamlines
+
+
+def _resample(streamlines, nb_points):
+    """Resamples a chunk of streamlines"""
+    return packed.resample(
+        *packed.pack([s._points for s in streamlines]), nb_points)
+
+
+def _metrics(candidate_mask, reference_mask, candidate_distances,
+             reference_distances, threshold):
+    """Computes the metrics from the masks and the nearest distances"""
+
+    candidate_mask = _mask(candidate_mask, reference_mask)
+    reference_mask = _mask(reference_mask, candidate_mask)
+
+    nb_candidate = int(np.count_nonzero(candidate_mask))
+    nb_reference = int(np.count_nonzero(reference_mask))
+    nb_common = int(np.count_nonzero(candidate_mask & reference_mask))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dice = np.float64(2 * nb_common) / (nb_candidate + nb_reference)
+        overlap = np.float64(nb_common) / nb_reference
+        overreach = np.float64(nb_candidate - nb_common) / nb_reference
+
+    candidate_distance = _mean(candidate_distances)
+    reference_distance = _mean(reference_distances)
+    bundle_adjacency = 0.5 * (
+        _mean(candidate_distances <= threshold) +
+        _mean(reference_distances <= threshold))
+
+    return {
+        'dice': float(dice),
+        'overlap': float(overlap),
+        'overreach': float(overreach),
+        'bundle_adjacency': float(bundle_adjacency),
+        'candidate_distance': candidate_distance,
+        'reference_distance': reference_distance,
+        'bundle_distance': 0.25 * (
+            candidate_distance + reference_distance) ** 2,
+        'candidate_streamlines': len(candidate_distances),
+        'reference_streamlines': len(reference_distances),
+        'candidate_voxels': nb_candidate,
+        'reference_voxels': nb_reference,
+    }
+
+
+def _mask(counts, other):
+    """Converts counts to a mask, empty if there are no counts"""
+    if counts is None:
+        return np.zeros(np.shape(other), dtype=bool)
+    return counts > 0
+
+
+def _mean(values):
+    """The mean of values, NaN if there are none"""
+    return float(np.mean(values)) if len(values) > 0 else float('nan')
@@ -0,0 +1,170 @@
+"""Cluster confidence index of streamlines
+
+The cluster confidence index (CCI) of a streamline measures how much it is
+supported by similar streamlines. It is the sum of 1 / d ** power over all
+the other streamlines at an MDF distance d (see streamlines.asarray.mdf)
+below a maximum distance. Streamlines with a low CCI have few neighbors and
+are likely spurious.
+
+All pairs of streamlines must be considered, so the distances are computed
+in tiles of pairs of blocks of streamlines resampled once. Streamlines are
+sorted by the x coordinate of their mean point so that the tiles of blocks
+that are far apart, where no pair can be within the maximum distance, are
+skipped. In the remaining tiles, the distance between mean points, which
+is a lower bound of the MDF distance, prunes the pairs before exact
+distances are computed. Tiles can be distributed over a process pool.
+
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy.spatial.distance import cdist
+
+from . import packed
+from .asarray import mdf
+
+
+# The data of the tiles in the processes of the pool.
+_worker_state = None
+
+
+def cluster_confidence(streamlines, max_distance=5.0, nb_points=12, power=1,
+                       min_score=None, max_pairs=100000, processes=1):
+    """Computes the cluster confidence index of streamlines
+
+    Args:
+        streamlines (streamlines.Streamlines): The streamlines, usually of a
+            single bundle.
+        max_distance (optional): The MDF distance under which streamlines
+            support each other.
+        nb_points (optional): The number of points used to resample the
+            streamlines.
+        power (optional): The power of the inverse distance.
+        min_score (optional): The minimum score of the streamlines kept by
+            the mask.
+        max_pairs (optional): The maximum number of pairs of streamlines in
+            a tile, which bounds memory to about max_pairs * nb_points * 48
+            bytes per process.
+        processes (optional): The number of processes. With 1, the tiles are
+            computed in the current process. With None, the number of CPUs
+            is used.
+
+    Returns:
+        scores: A (N,) array with the CCI of each streamline.
+        mask: A (N,) array of bool that is True for the streamlines whose
+            score is at least min_score, or all True if min_score is None.
+
+    """
+
+    resampled = packed.resample(
+        *packed.pack([s._points for s in streamlines]), nb_points)
+    scores = confidence_scores(
+        resampled, max_distance, power, max_pairs, processes)
+
+    if min_score is None:
+        return scores, np.ones((len(scores),), dtype=bool)
+
+    return scores, scores >= min_score
+
+
+def confidence_scores(resampled, max_distance=5.0, power=1,
+                      max_pairs=100000, processes=1):
+    """Computes the cluster confidence index of resampled streamlines
+
+    Identical streamlines, at a distance of 0, do not support each other.
+
+    Args:
+        resampled: A (N, nb_points, 3) array of resampled streamlines.
+        max_distance (optional): The MDF distance under which streamlines
+            support each other.
+        power (optional): The power of the inverse distance.
+        max_pairs (optional): The maximum number of pairs of streamlines in
+            a tile.
+        processes (optional): The number of processes. See
+            cluster_confidence.
+
+    Returns:
+        A (N,) array with the CCI of each streamline.
+
+    """
+
+    means = resampled.mean(1)
+    order = np.argsort(means[:, 0], kind='stable')
+    block_size = max(1, int(np.sqrt(max_pairs)))
+    state = (resampled[order], means[order], max_distance, power, block_size)
+
+    starts = range(0, len(resampled), block_size)
+    sorted_scores = np.zeros((len(resampled),))
+    if processes == 1:
+        for start in starts:
+            indices, values = _row_scores(start, state)
+            sorted_scores[indices] += values
+    else:
+        with ProcessPoolExecutor(
+                processes, initializer=_initialize, initargs=(state,)) as pool:
+            for indices, values in pool.map(_row_scores, starts):
+                sorted_scores[indices] += values
+
+    scores = np.empty((len(resampled),))
+    scores[order] = sorted_scores
+
+    return scores
+
+
+def _initialize(state):
+    """Keeps the data of the tiles in a process of the pool"""
+    global _worker_state
+    _worker_state = state
+
+
+def _row_scores(start, state=None):
+    """Computes the scores of the tiles of a block of rows
+
+    Only the tiles on or above the diagonal are computed and each pair adds
+    to the scores of both of its streamlines.
+
+    Returns:
+        indices: The sorted indices of the streamlines with a score.
+        values: The score of these streamlines.
+
+    """
+
+    resampled, means, max_distance, power, block_size = (
+        state or _worker_state)
+    row_means = means[start:start + block_size]
+    row_minimum, row_maximum = row_means.min(0), row_means.max(0)
+
+    indices, values = [np.zeros((0,), dtype=np.intp)], [np.zeros((0,))]
+    for column in range(start, len(means), block_size):
+
+        # The blocks are sorted by x, so no block after one that is too far
+        # along x can have pairs within the maximum distance.
+        column_means = means[column:column + block_size]
+        if column_means[0, 0] - row_maximum[0] >= max_distance:
+            break
+
+        gap = np.maximum(0, np.maximum(column_means.min(0) - row_maximum,
+                                       row_minimum - column_means.max(0)))
+        if np.linalg.norm(gap) >= max_distance:
+            continue
+
+        # The distance between mean points is a lower bound of the MDF
+        # distance.
+        rows, columns = np.nonzero(
+            cdist(row_means, column_means) < max_distance)
+        rows += start
+        columns += column
+        if column == start:
+            upper = rows < columns
+            rows, columns = rows[upper], columns[upper]
+
+        distances = mdf(resampled[rows], resampled[columns])
+        close = (distances < max_distance) & (distances > 0)
+        weights = distances[close] ** -power
+        indices += [rows[close], columns[close]]
+        values += [weights, weights]
+
+    unique, inverse = np.unique(np.concatenate(indices), return_inverse=True)
+    return unique, np.bincount(
+        inverse, np.concatenate(values), minlength=len(unique))
@@ -0,0 +1,190 @@
+import numpy as np
+import scipy.sparse
+
+from . import packed
+from .voxels import lookup, to_voxels, voxel_affine, voxel_indices
+
+
+class Connectome(object):
+    """Connectivity matrices between the regions of a parcellation
+
+    A Connectome accumulates the number of streamlines between each pair of
+    labels of a parcellation, as well as their mean length and the mean of
+    their data. Streamlines can be added in chunks so that whole brain
+    tractograms can be processed with bounded memory.
+
+    The matrices are indexed by label value, are symmetric and include the
+    label 0 which is the background.
+
+    """
+
+    def __init__(self, labels, radius=0, affine=None, image_affine=None,
+                 data_keys=()):
+        """Connectivity matrices between the regions of a parcellation
+
+        Args:
+            labels: The (X, Y, Z) volume of int labels. The label 0 is the
+                background.
+            radius (optional): Endpoints that are in the background are
+                assigned the label of the nearest labeled voxel within
+                radius voxels.
+            affine (optional): The (4, 4) affine from the coordinate system
+                of the streamlines to voxel space. The default is the
+                transform to voxel space attached to the streamlines.
+            image_affine (optional): The voxel to native RAS affine of the
+                labels. It is only used if the streamlines have no transform
+                to voxel space. See streamlines.voxels.voxel_affine.
+            data_keys (optional): The keys of the streamline data whose mean
+                is computed for each pair of labels. The data of each
+                streamline is averaged to a single value.
+
+        """
+
+        self.labels = np.asarray(labels).astype(np.intp)
+        self.radius = radius
+        self.affine = affine
+        self.image_affine = image_affine
+        self.data_keys = tuple(data_keys)
+
+        self.nb_labels = int(self.labels.max()) + 1 if self.labels.size else 1
+        shape = (self.nb_labels, self.nb_labels)
+        self._counts = scipy.sparse.csr_matrix(shape)
+        self._lengths = scipy.sparse.csr_matrix(shape)
+        self._data = {k: scipy.sparse.csr_matrix(shape)
+                      for k in self.data_keys}
+
+    def add(self, streamlines):
+        """Adds streamlines to the matrices
+
+        Args:
+            streamlines (streamlines.Streamlines): The streamlines to add.
+
+        Returns:
+            A (N, 2) array of int with the labels of the first and last point
+            of each streamline.
+
+        """
+
+        affine = self.affine
+        if affine is None:
+            affine = voxel_affine(streamlines, self.image_affine)
+
+        points, offsets = packed.pack([s._points for s in streamlines])
+        starts, ends = packed.endpoints(points, offsets)
+        assignments = np.stack((
+            self._label(to_voxels(starts, affine)),
+            self._label(to_voxels(ends, affine))), axis=1)
+
+        # The matrices are symmetric, only the pairs with the smallest label
+        # first are accumulated.
+        rows = assignments.min(1)
+        columns = assignments.max(1)
+
+        self._counts = self._counts + self._accumulate(
+            np.ones((len(rows),)), rows, columns)
+        self._lengths = self._lengths + self._accumulate(
+            packed.lengths(points, offsets), rows, columns)
+        for key in self.data_keys:
+            values = np.array([np.mean(s.data[key]) for s in streamlines])
+            self._data[key] = self._data[key] + self._accumulate(
+                values, rows, columns)
+
+        return assignments
+
+    @property
+    def counts(self):
+        """The sparse matrix of the number of streamlines between labels"""
+        return _symmetric(self._counts)
+
+    @property
+    def mean_lengths(self):
+        """The sparse matrix of the mean length of streamlines"""
+        return _symmetric(self._mean(self._lengths))
+
+    def mean_data(self, key):
+        """The sparse matrix of the mean of the data of streamlines"""
+        return _symmetric(self._mean(self._data[key]))
+
+    def region_labels(self):
+        """Returns the sorted non-zero labels of the parcellation"""
+        labels = np.unique(self.labels)
+        return labels[labels != 0]
+
+    def to_dense(self, matrix):
+        """Converts a matrix to a dense array between non-zero labels
+
+        The rows and columns of the dense array correspond to the labels
+        returned by region_labels.
+
+        """
+        labels = self.region_labels()
+        return matrix.tocsr()[labels][:, labels].toarray()
+
+    def _accumulate(self, values, rows, columns):
+        """Sums values by pair of labels in a sparse matrix"""
+        return scipy.sparse.coo_matrix(
+            (values, (rows, columns)),
+            shape=(self.nb_labels, self.nb_labels)).tocsr()
+
+    def _mean(self, sums):
+        """Divides sums by the counts where there are streamlines"""
+        mean = sums.tocoo()
+        counts = np.asarray(self._counts[mean.row, mean.col]).ravel()
+        return scipy.sparse.coo_matrix(
+            (mean.data / counts, (mean.row, mean.col)),
+            shape=mean.shape).tocsr()
+
+    def _label(self, coordinates):
+        """Gets the label of points, searching nearby if unlabeled"""
+
+        labels = lookup(self.labels, coordinates, 0)
+        if self.radius <= 0:
+            return labels
+
+        # Search the neighborhood of unlabeled points from the closest to the
+        # farthest voxel, keeping the first label found.
+        r = int(np.ceil(self.radius))
+        grid = np.mgrid[-r:r + 1, -r:r + 1, -r:r + 1].reshape((3, -1)).T
+        distances = np.sqrt(np.sum(grid ** 2, 1))
+        order = np.argsort(distances, kind='stable')
+        neighbors = grid[order][distances[order] <= self.radius][1:]
+
+        unlabeled = np.flatnonzero(labels == 0)
+        indices, inside = voxel_indices(
+            coordinates[unlabeled], self.labels.shape)
+        unlabeled, indices = unlabeled[inside], indices[inside]
+
+        for neighbor in neighbors:
+            if len(unlabeled) == 0:
+                break
+            found = lookup(self.labels, indices + neighbor, 0)
+            labels[unlabeled] = found
+            unlabeled, indices = unlabeled[found == 0], indices[found == 0]
+
+        return labels
+
+
+def connectivity(streamlines, labels, **kwargs):
+    """Computes the connectivity matrices of streamlines
+
+    Args:
+        streamlines (streamlines.Streamlines): The streamlines.
+        labels: The (X, Y, Z) volume of int labels.
+        **kwargs: The other arguments of Connectome.
+
+    Returns:
+        connectome: The Connectome of the streamlines.
+        assignments: A (N, 2) array of int with the labels of the endpoints
+            of each streamline.
+
+    """
+
+    connectome = Connectome(labels, **kwargs)
+    assignments = connectome.add(streamlines)
+
+    return connectome, assignments
+
+
+def _symmetric(matrix):
+    """Fills the lower triangle of an upper triangular matrix"""
+    return (matrix + matrix.T - scipy.sparse.diags(matrix.diagonal())).tocsr()
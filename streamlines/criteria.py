@@ -0,0 +1,465 @@
+import numpy as np
+
+from . import packed
+from .confidence import confidence_scores
+from .voxels import lookup, to_voxels, voxel_affine
+
+
+class Features(object):
+    """Feature arrays of a group of streamlines
+
+    Features are computed on first access from the packed points of the
+    streamlines and reused by all the criteria evaluated on the same
+    instance.
+
+    """
+
+    def __init__(self, streamlines):
+        self._streamlines = streamlines
+        self._features = {}
+
+    def _get(self, name, compute):
+        if name not in self._features:
+            self._features[name] = compute()
+        return self._features[name]
+
+    def __len__(self):
+        return len(self._streamlines)
+
+    @property
+    def streamlines(self):
+        return self._streamlines
+
+    @property
+    def packed(self):
+        """The packed points and offsets of the streamlines"""
+        return self._get('packed', lambda: packed.pack(
+            [s._points for s in self._streamlines]))
+
+    @property
+    def lengths(self):
+        return self._get('lengths', lambda: packed.lengths(*self.packed))
+
+    @property
+    def nb_points(self):
+        return self._get('nb_points', lambda: packed.nb_points(
+            self.packed[1]))
+
+    @property
+    def bounding_boxes(self):
+        return self._get('bounding_boxes', lambda: packed.bounding_boxes(
+            *self.packed))
+
+    @property
+    def endpoints(self):
+        return self._get('endpoints', lambda: packed.endpoints(*self.packed))
+
+    @property
+    def curvatures(self):
+        """The curvature of the streamlines at each packed point"""
+        return self._get('curvatures', lambda: packed.curvatures(
+            *self.packed))
+
+    @property
+    def torsions(self):
+        """The torsion of the streamlines at each packed point"""
+        return self._get('torsions', lambda: packed.torsions(*self.packed))
+
+    @property
+    def turning_angles(self):
+        """The turning angle of the streamlines at each packed point"""
+        return self._get('turning_angles', lambda: packed.turning_angles(
+            *self.packed))
+
+    @property
+    def max_curvatures(self):
+        return self._get('max_curvatures', lambda: packed.reduce_max(
+            self.curvatures, self.packed[1]))
+
+    @property
+    def mean_curvatures(self):
+        """The mean curvature of the points where it is defined"""
+        return self._get('mean_curvatures', lambda: packed.reduce_mean(
+            self.curvatures, self.packed[1], packed.interior(self.packed[1])))
+
+    @property
+    def max_torsions(self):
+        """The maximum absolute torsion of each streamline"""
+        return self._get('max_torsions', lambda: packed.reduce_max(
+            np.abs(self.torsions), self.packed[1]))
+
+    @property
+    def max_turning_angles(self):
+        return self._get('max_turning_angles', lambda: packed.reduce_max(
+            self.turning_angles, self.packed[1]))
+
+    @property
+    def tortuosities(self):
+        return self._get('tortuosities', lambda: packed.tortuosities(
+            *self.packed))
+
+    def resampled(self, nb_points):
+        """Returns the streamlines resampled to nb_points"""
+        return self._get(('resampled', nb_points), lambda: packed.resample(
+            *self.packed, nb_points))
+
+    def data(self, key):
+        """Returns the scalar data of each streamline for a key"""
+
+        def compute():
+            values = [np.ravel(s.data[key]) for s in self._streamlines]
+            if any(len(v) != 1 for v in values):
+                raise ValueError(
+                    f'The data {key} must be a single value per streamline.')
+            return np.array([v[0] for v in values], dtype=float)
+
+        return self._get(('data', key), compute)
+
+
+class Criterion(object):
+    """A condition that streamlines must satisfy
+
+    Criteria can be combined with the &, | and ~ operators. Calling a
+    criterion with a Features instance returns a boolean array that is True
+    for the streamlines that satisfy it.
+
+    """
+
+    def __call__(self, features):
+        raise NotImplementedError()
+
+    def __and__(self, other):
+        return And(self, other)
+
+    def __or__(self, other):
+        return Or(self, other)
+
+    def __invert__(self):
+        return Not(self)
+
+
+class And(Criterion):
+    """Satisfied when all of its criteria are satisfied"""
+
+    def __init__(self, *criteria):
+        self.criteria = criteria
+
+    def __call__(self, features):
+        mask = np.ones((len(features),), dtype=bool)
+        for criterion in self.criteria:
+            mask &= criterion(features)
+        return mask
+
+
+class Or(Criterion):
+    """Satisfied when at least one of its criteria is satisfied"""
+
+    def __init__(self, *criteria):
+        self.criteria = criteria
+
+    def __call__(self, features):
+        mask = np.zeros((len(features),), dtype=bool)
+        for criterion in self.criteria:
+            mask |= criterion(features)
+        return mask
+
+
+class Not(Criterion):
+    """Satisfied when its criterion is not"""
+
+    def __init__(self, criterion):
+        self.criterion = criterion
+
+    def __call__(self, features):
+        return ~self.criterion(features)
+
+
+class _Range(Criterion):
+    """Satisfied when a feature is within an inclusive range"""
+
+    def __init__(self, minimum=None, maximum=None):
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def _values(self, features):
+        raise NotImplementedError()
+
+    def __call__(self, features):
+
+        values = self._values(features)
+        mask = np.ones((len(features),), dtype=bool)
+        if self.minimum is not None:
+            mask &= values >= self.minimum
+        if self.maximum is not None:
+            mask &= values <= self.maximum
+
+        return mask
+
+
+class Length(_Range):
+    """Satisfied when the length of a streamline is within a range"""
+
+    def _values(self, features):
+        return features.lengths
+
+
+class NbPoints(_Range):
+    """Satisfied when the number of points of a streamline is within a range"""
+
+    def _values(self, features):
+        return features.nb_points
+
+
+class Data(_Range):
+    """Satisfied when the data of a streamline is within a range
+
+    Args:
+        key: The key of the data. The data must have a single value per
+            streamline.
+        minimum (optional): The minimum value of the data.
+        maximum (optional): The maximum value of the data.
+
+    """
+
+    def __init__(self, key, minimum=None, maximum=None):
+        super().__init__(minimum, maximum)
+        self.key = key
+
+    def _values(self, features):
+        return features.data(self.key)
+
+
+class Curvature(_Range):
+    """Satisfied when the curvature of a streamline is within a range
+
+    Args:
+        minimum (optional): The minimum curvature in 1 / mm.
+        maximum (optional): The maximum curvature in 1 / mm.
+        reduction (optional): 'max' to use the maximum curvature of the
+            points of the streamline or 'mean' to use their mean curvature.
+
+    """
+
+    reductions = ('max', 'mean')
+
+    def __init__(self, minimum=None, maximum=None, reduction='max'):
+        if reduction not in self.reductions:
+            raise ValueError(
+                f'The reduction must be one of {self.reductions}, not '
+                f'{reduction}.')
+        super().__init__(minimum, maximum)
+        self.reduction = reduction
+
+    def _values(self, features):
+        if self.reduction == 'max':
+            return features.max_curvatures
+        return features.mean_curvatures
+
+
+class Torsion(_Range):
+    """Satisfied when the maximum absolute torsion is within a range"""
+
+    def _values(self, features):
+        return features.max_torsions
+
+
+class TurningAngle(_Range):
+    """Satisfied when the maximum turning angle is within a range
+
+    The turning angle is the angle in degrees between consecutive segments.
+
+    """
+
+    def _values(self, features):
+        return features.max_turning_angles
+
+
+class Tortuosity(_Range):
+    """Satisfied when the tortuosity of a streamline is within a range
+
+    The tortuosity is the length of a streamline divided by the distance
+    between its endpoints.
+
+    """
+
+    def _values(self, features):
+        return features.tortuosities
+
+
+class BoundingBox(Criterion):
+    """Satisfied when all the points of a streamline are inside a box
+
+    Args:
+        minimum: The (3,) minimum corner of the box.
+        maximum: The (3,) maximum corner of the box.
+
+    """
+
+    def __init__(self, minimum, maximum):
+        self.minimum = np.asarray(minimum, dtype=float)
+        self.maximum = np.asarray(maximum, dtype=float)
+
+    def __call__(self, features):
+        minimums, maximums = features.bounding_boxes
+        return (np.all(minimums >= self.minimum, axis=1) &
+                np.all(maximums <= self.maximum, axis=1))
+
+
+class EndpointRegion(Criterion):
+    """Satisfied when the endpoints of a streamline are inside a box
+
+    Args:
+        minimum: The (3,) minimum corner of the box.
+        maximum: The (3,) maximum corner of the box.
+        mode (optional): 'any' if at least one endpoint must be in the box,
+            'both' if both endpoints must be in the box, 'start' or 'end' if
+            only the first or last point is considered.
+
+    """
+
+    modes = ('any', 'both', 'start', 'end')
+
+    def __init__(self, minimum, maximum, mode='any'):
+
+        if mode not in self.modes:
+            raise ValueError(
+                f'mode must be one of {self.modes}, not {mode}.')
+
+        self.minimum = np.asarray(minimum, dtype=float)
+        self.maximum = np.asarray(maximum, dtype=float)
+        self.mode = mode
+
+    def _inside(self, points):
+        return (np.all(points >= self.minimum, axis=1) &
+                np.all(points <= self.maximum, axis=1))
+
+    def __call__(self, features):
+
+        starts, ends = features.endpoints
+        if self.mode == 'start':
+            return self._inside(starts)
+        elif self.mode == 'end':
+            return self._inside(ends)
+        elif self.mode == 'both':
+            return self._inside(starts) & self._inside(ends)
+
+        return self._inside(starts) | self._inside(ends)
+
+
+class Roi(Criterion):
+    """Satisfied when a streamline intersects a region of interest
+
+    The points of all streamlines are transformed to voxel space at once
+    and the mask is looked up at the nearest voxel of each point.
+
+    Args:
+        mask: The (X, Y, Z) volume of the region of interest. Non-zero voxels
+            are part of the region.
+        mode (optional): 'include' if at least one point of the streamline
+            must be in the region, 'exclude' if no point may be in the region,
+            'endpoints' if at least one endpoint must be in the region and
+            'both-endpoints' if both endpoints must be in the region.
+        image_affine (optional): The voxel to native RAS affine of the mask.
+            It is only used if the streamlines have no transform to voxel
+            space. See streamlines.voxels.voxel_affine.
+
+    """
+
+    modes = ('include', 'exclude', 'endpoints', 'both-endpoints')
+
+    def __init__(self, mask, mode='include', image_affine=None):
+
+        if mode not in self.modes:
+            raise ValueError(
+                f'mode must be one of {self.modes}, not {mode}.')
+
+        self.mask = np.asarray(mask) != 0
+        self.mode = mode
+        self.image_affine = image_affine
+
+    def __call__(self, features):
+
+        affine = voxel_affine(features.streamlines, self.image_affine)
+
+        if self.mode in ('include', 'exclude'):
+            points, offsets = features.packed
+            inside = lookup(self.mask, to_voxels(points, affine), False)
+            intersects = packed.reduce_any(inside, offsets)
+            return intersects if self.mode == 'include' else ~intersects
+
+        starts, ends = features.endpoints
+        starts_inside = lookup(self.mask, to_voxels(starts, affine), False)
+        ends_inside = lookup(self.mask, to_voxels(ends, affine), False)
+        if self.mode == 'both-endpoints':
+            return starts_inside & ends_inside
+
+        return starts_inside | ends_inside
+
+
+class ClusterConfidence(Criterion):
+    """Satisfied when the cluster confidence index is high enough
+
+    The cluster confidence index of a streamline depends on all the other
+    streamlines evaluated with it. See streamlines.confidence.
+
+    Args:
+        min_score: The minimum cluster confidence index.
+        max_distance (optional): The MDF distance under which streamlines
+            support each other.
+        nb_points (optional): The number of points used to resample the
+            streamlines.
+        power (optional): The power of the inverse distance.
+        processes (optional): The number of processes used to compute the
+            index.
+
+    """
+
+    def __init__(self, min_score, max_distance=5.0, nb_points=12, power=1,
+                 processes=1):
+        self.min_score = min_score
+        self.max_distance = max_distance
+        self.nb_points = nb_points
+        self.power = power
+        self.processes = processes
+
+    def __call__(self, features):
+        scores = confidence_scores(
+            features.resampled(self.nb_points), self.max_distance,
+            self.power, processes=self.processes)
+        return scores >= self.min_score
+
+
+class Selection(Criterion):
+    """Satisfied by the streamlines of a precomputed selection
+
+    Args:
+        mask: A (N,) array of bool with one value per streamline.
+
+    """
+
+    def __init__(self, mask):
+        self.mask = np.asarray(mask, dtype=bool)
+
+    def __call__(self, features):
+        if len(self.mask) != len(features):
+            raise ValueError(
+                f'The selection must have one value per streamline '
+                f'({len(self.mask)} != {len(features)}).')
+        return self.mask.copy()
+
+
+def all_of(*criteria):
+    """Combines criteria with a logical and, ignoring None
+
+    Returns:
+        The combined criterion or None if all criteria are None.
+
+    """
+
+    criteria = [c for c in criteria if c is not None]
+    if len(criteria) == 0:
+        return None
+    elif len(criteria) == 1:
+        return criteria[0]
+
+    return And(*criteria)
@@ -0,0 +1,106 @@
+import numpy as np
+
+from . import packed
+from .voxels import to_voxels, voxel_affine, voxel_indices, voxel_shape
+
+
+def track_density(streamlines, shape=None, affine=None, step=None,
+                  out=None):
+    """Computes a track density image
+
+    Counts the number of streamlines that pass through each voxel. Each
+    streamline is counted at most once per voxel.
+
+    Args:
+        streamlines (streamlines.Streamlines): The streamlines to count.
+        shape (optional): The shape of the image. The default is the shape of
+            the voxel space of the streamlines.
+        affine (optional): The (4, 4) affine from the coordinate system of
+            the streamlines to voxel space. The default is the transform to
+            voxel space attached to the streamlines.
+        step (optional): If provided, the segments of the streamlines are
+            supersampled so that consecutive points are at most step voxels
+            apart. Without supersampling, voxels crossed by a segment but
+            that contain none of its points are not counted.
+        out (optional): An array of int with the shape of the image to
+            which the counts are added. This allows the accumulation of counts
+            over chunks of streamlines.
+
+    Returns:
+        The array of counts.
+
+    """
+
+    points, offsets, shape, out = _prepare(streamlines, shape, affine, out)
+    if step is not None:
+        points, offsets = packed.supersample(points, offsets, step)
+
+    indices, inside = voxel_indices(points, shape)
+    voxels = np.ravel_multi_index(indices.T, shape)[inside]
+    ids = packed.streamline_ids(offsets)[inside]
+
+    # Consecutive points of a streamline are often in the same voxel. They
+    # are removed before looking for unique (streamline, voxel) pairs.
+    keep = np.ones((len(voxels),), dtype=bool)
+    keep[1:] = (voxels[1:] != voxels[:-1]) | (ids[1:] != ids[:-1])
+    nb_voxels = int(np.prod(shape))
+    pairs = np.unique(ids[keep].astype(np.int64) * nb_voxels + voxels[keep])
+
+    out += np.bincount(
+        pairs % nb_voxels, minlength=nb_voxels).reshape(shape)
+
+    return out
+
+
+def endpoint_density(streamlines, shape=None, affine=None, out=None):
+    """Computes an endpoint density image
+
+    Counts the number of streamline endpoints in each voxel.
+
+    Args:
+        streamlines (streamlines.Streamlines): The streamlines to count.
+        shape (optional): The shape of the image. The default is the shape of
+            the voxel space of the streamlines.
+        affine (optional): The (4, 4) affine from the coordinate system of
+            the streamlines to voxel space. The default is the transform to
+            voxel space attached to the streamlines.
+        out (optional): An array of int with the shape of the image to
+            which the counts are added.
+
+    Returns:
+        The array of counts.
+
+    """
+
+    points, offsets, shape, out = _prepare(streamlines, shape, affine, out)
+
+    starts, ends = packed.endpoints(points, offsets)
+    indices, inside = voxel_indices(np.concatenate((starts, ends)), shape)
+    voxels = np.ravel_multi_index(indices[inside].T, shape)
+
+    nb_voxels = int(np.prod(shape))
+    out += np.bincount(voxels, minlength=nb_voxels).reshape(shape)
+
+    return out
+
+
+def _prepare(streamlines, shape, affine, out):
+    """Gets the packed voxel coordinates and output of a density image"""
+
+    if affine is None:
+        affine = voxel_affine(streamlines)
+
+    if shape is None:
+        shape = voxel_shape(streamlines)
+        if shape is None:
+            raise ValueError(
+                'The shape of the image must be provided when the '
+                'streamlines have no voxel space.')
+    shape = tuple(int(s) for s in shape[:3])
+
+    if out is None:
+        out = np.zeros(shape, dtype=np.int64)
+
+    points, offsets = packed.pack([s._points for s in streamlines])
+
+    return to_voxels(points, affine), offsets, shape, out
@@ -1,5 +1,10 @@
+import queue
+import threading
+from itertools import chain
+
 import nibabel as nib
 import numpy as np
+from nibabel.streamlines.tractogram import TractogramItem
 
 from nicoord import AffineTransform
 from nicoord import CoordinateSystem
@@ -10,6 +15,10 @@ from nicoord import coord
 from nicoord import inverse
 
 import streamlines as sl
+from streamlines.io import archive
+from streamlines.io import tck
+from streamlines.profiling import timed
+from streamlines.profiling import timer
 
 
 # Streamlines in .trk format are always saved in native RAS space.
@@ -17,23 +26,106 @@ _ras_mm = CoordinateSystem(
     CoordinateSystemSpace.NATIVE, CoordinateSystemAxes.RAS)
 
 
+@timed('load')
 def load(filename: str):
     """Loads the streamlines contained in a file
 
-    Loads the streamlines contained in a .trk file. The streamlines are
-    always loaded in a native RAS coordinate system. If the voxel_to_rasmm
-    affine transform is present in the header, it is also loaded with
-    the streamlines. This allows the transformation to voxel space using the
-    transform_to method.
+    Loads the streamlines contained in a .trk, .tck or .slz file. The
+    streamlines are always loaded in a native RAS coordinate system. If the
+    voxel_to_rasmm affine transform is present in the header, it is also
+    loaded with the streamlines. This allows the transformation to voxel
+    space using the transform_to method.
 
     Args:
-        filename: The file name from which to load the streamlines. Only .trk
-            files are supported.
+        filename: The file name from which to load the streamlines. Only
+            .trk, .tck and .slz files are supported.
     """
 
+    if _is_tck(filename):
+        return tck.load(filename)
+    if _is_archive(filename):
+        return archive.load(filename)
+
     # Load the input streamlines.
-    tractogram_file = nib.streamlines.load(filename)
-    header = tractogram_file.header
+    with timer('load.decode'):
+        tractogram_file = nib.streamlines.load(filename)
+    transforms = _transforms(tractogram_file.header)
+
+    tractogram = tractogram_file.tractogram
+    with timer('load.convert'):
+        streamlines = sl.Streamlines(
+            tractogram.streamlines, _ras_mm, transforms)
+
+        # Add the streamline and point data to each streamline.
+        for key, values in tractogram.data_per_point.items():
+            for streamline, value in zip(streamlines, values):
+                streamline.data[key] = value.T
+
+        for key, values in tractogram.data_per_streamline.items():
+            for streamline, value in zip(streamlines, values):
+                streamline.data[key] = value
+
+    return streamlines
+
+
+def load_chunks(filename: str, chunk_size: int = 100000):
+    """Iterates over the streamlines of a file in chunks
+
+    The file is read incrementally so only one chunk of streamlines is in
+    memory at any time. This allows the processing of files that do not fit
+    in memory.
+
+    Args:
+        filename: The file name from which to load the streamlines. Only
+            .trk, .tck and .slz files are supported.
+        chunk_size (optional): The maximum number of streamlines per chunk.
+
+    Yields:
+        streamlines.Streamlines instances with at most chunk_size streamlines
+        in the same coordinate system and with the same transforms as if the
+        file was loaded using load.
+
+    """
+
+    if _is_tck(filename):
+        yield from tck.load_chunks(filename, chunk_size)
+        return
+    if _is_archive(filename):
+        yield from archive.load_chunks(filename, chunk_size)
+        return
+
+    tractogram_file = nib.streamlines.load(filename, lazy_load=True)
+    transforms = _transforms(tractogram_file.header)
+
+    items = []
+    for item in tractogram_file.tractogram:
+        items.append(item)
+        if len(items) == chunk_size:
+            yield _from_items(items, transforms)
+            items = []
+
+    if len(items) > 0:
+        yield _from_items(items, transforms)
+
+
+def _from_items(items, transforms):
+    """Converts nibabel tractogram items to streamlines"""
+
+    streamlines = sl.Streamlines(
+        [i.streamline for i in items], _ras_mm, transforms)
+
+    for streamline, item in zip(streamlines, items):
+        for key, value in item.data_for_points.items():
+            streamline.data[key] = value.T
+        for key, value in item.data_for_streamline.items():
+            streamline.data[key] = value
+
+    return streamlines
+
+
+def _transforms(header):
+    """Gets the transforms to voxel space from a .trk header"""
+
     affine_to_rasmm = header['voxel_to_rasmm']
     voxel_sizes = header['voxel_sizes']
     shape = header['dimensions']
@@ -43,26 +135,20 @@ def load(filename: str):
     if not np.allclose(affine_to_rasmm, np.eye(4)):
         affine_to_voxel = np.linalg.inv(affine_to_rasmm)
         target = coord('voxel', 'ras', voxel_sizes, shape)
-        transforms = [AffineTransform(_ras_mm, target, affine_to_voxel)]
+        return [AffineTransform(_ras_mm, target, affine_to_voxel)]
 
-    else:
-        transforms = None
-
-    tractogram = tractogram_file.tractogram
-    streamlines = sl.Streamlines(tractogram.streamlines, _ras_mm, transforms)
-
-    # Add the streamline point data to each streamline.
-    for key, values in tractogram.data_per_point.items():
-        for streamline, value in zip(streamlines, values):
-            streamline.data[key] = value.T
-
-    return streamlines
+    return None
 
 
+@timed('save')
 def save(streamlines, filename):
-    """Saves streamlines to a trk file
+    """Saves streamlines to a trk, tck or slz file
 
-    Saves the streamlines and their metadata to a trk file.
+    Saves the streamlines and their metadata to a trk file. If the file name
+    ends with .tck, the streamlines are saved in MRtrix format without their
+    data (see streamlines.io.tck). If it ends with .slz, the streamlines are
+    saved in a quantized and compressed archive file with the default
+    precision of 0.01 mm (see streamlines.io.archive).
 
     Args:
         streamlines (streamlines.Streamlines): The streamlines to save.
@@ -78,6 +164,192 @@ def save(streamlines, filename):
 
     """
 
+    if _is_tck(filename):
+        tck.save(streamlines, filename)
+        return
+    if _is_archive(filename):
+        archive.save(streamlines, filename)
+        return
+
+    data_per_point, data_per_streamline = _data(streamlines)
+    affine_to_rasmm, hdr_dict = _header(streamlines)
+
+    new_tractogram = nib.streamlines.Tractogram(
+        [s.points for s in streamlines],
+        affine_to_rasmm=affine_to_rasmm,
+        data_per_point=data_per_point,
+        data_per_streamline=data_per_streamline)
+
+    trk_file = nib.streamlines.TrkFile(new_tractogram, hdr_dict)
+    with timer('save.encode'):
+        trk_file.save(filename)
+
+
+def save_chunks(chunks, filename):
+    """Saves chunks of streamlines to a trk, tck or slz file
+
+    Saves an iterable of streamlines.Streamlines instances to a single .trk,
+    .tck or .slz file. The chunks are written as they are produced so only
+    one chunk is in memory at any time. The header is taken from the first
+    chunk, all chunks must therefore be in the same coordinate system with
+    the same metadata.
+
+    Args:
+        chunks: An iterable of streamlines.Streamlines instances, for example
+            the output of load_chunks.
+        filename (str): The filename of the output file. If the file
+            exists, it will be overwritten.
+
+    Examples:
+        >>> import streamlines as sl
+
+        >>> chunks = sl.io.load_chunks('test.trk', 1000)
+        >>> filtered = (c.filter(min_length=50) for c in chunks)
+        >>> sl.io.save_chunks(filtered, 'filtered.trk')
+
+    """
+
+    if _is_tck(filename):
+        tck.save_chunks(chunks, filename)
+        return
+    if _is_archive(filename):
+        archive.save_chunks(chunks, filename)
+        return
+
+    chunks = iter(chunks)
+    first_chunk = next(chunks, None)
+    if first_chunk is None:
+        save(sl.Streamlines(), filename)
+        return
+
+    affine_to_rasmm, hdr_dict = _header(first_chunk)
+
+    items = (
+        TractogramItem(
+            s.points,
+            {k: v for k, v in s.data.items() if v.ndim != 2},
+            {k: v.T for k, v in s.data.items() if v.ndim == 2})
+        for chunk in chain([first_chunk], chunks) for s in chunk)
+
+    # Nibabel peeks at the first item before iterating over all of them.
+    # The first item is kept aside so it is not consumed from the chunks.
+    first_item = next(items, None)
+    if first_item is None:
+        save(first_chunk, filename)
+        return
+
+    new_tractogram = nib.streamlines.LazyTractogram.from_data_func(
+        lambda: chain([first_item], items))
+    new_tractogram.affine_to_rasmm = affine_to_rasmm
+
+    trk_file = nib.streamlines.TrkFile(new_tractogram, hdr_dict)
+    trk_file.save(filename)
+
+
+def prefetch(iterable, size=2):
+    """Iterates over an iterable on a background thread
+
+    The items are produced by a background thread while the caller processes
+    the previous items, e.g. to decode the next chunk of a file while the
+    current chunk is processed. At most size items are waiting in a queue so
+    the producer cannot run ahead of the consumer. Exceptions raised by the
+    iterable are raised by the consumer.
+
+    Args:
+        iterable: The iterable to iterate over.
+        size (optional): The maximum number of items produced in advance.
+
+    Yields:
+        The items of iterable in the same order.
+
+    """
+
+    items = queue.Queue(maxsize=size)
+    stopped = threading.Event()
+    done = object()
+
+    def put(item):
+        """Puts an item in the queue unless the consumer stopped"""
+        while not stopped.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+        except BaseException as error:
+            put((done, error))
+            return
+        put((done, None))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            item, error = items.get()
+            if error is not None:
+                raise error
+            if item is done:
+                break
+            yield item
+    finally:
+
+        # Unblock the producer if the consumer stops early.
+        stopped.set()
+        thread.join()
+
+
+def map_chunks(function, input_filename, output_filename,
+               chunk_size=100000, size=2):
+    """Applies a function to the chunks of a file and saves the results
+
+    Reading, processing and writing run concurrently: while chunk k is
+    processed, chunk k + 1 is read and decoded on a background thread and
+    chunk k - 1 is written. Bounded queues between the stages limit the
+    number of chunks in memory, so the wall time is close to the slowest
+    stage instead of the sum of all stages.
+
+    Args:
+        function: A function that takes a streamlines.Streamlines chunk and
+            returns the streamlines.Streamlines to save.
+        input_filename: The file that contains the streamlines.
+        output_filename: The file where the results are saved.
+        chunk_size (optional): The maximum number of streamlines per chunk.
+        size (optional): The maximum number of chunks waiting between two
+            stages.
+
+    Examples:
+        >>> import streamlines as sl
+
+        >>> sl.io.map_chunks(lambda c: c.smooth(), 'test.trk', 'smooth.trk')
+
+    """
+
+    chunks = prefetch(load_chunks(input_filename, chunk_size), size)
+    results = prefetch((function(c) for c in chunks), size)
+    save_chunks(results, output_filename)
+
+
+def _is_tck(filename):
+    """Checks if a file name has the .tck extension of MRtrix files"""
+    return str(filename).lower().endswith('.tck')
+
+
+def _is_archive(filename):
+    """Checks if a file name has the .slz extension of archive files"""
+    return str(filename).lower().endswith('.slz')
+
+
+def _data(streamlines):
+    """Gets the streamline and point data in nibabel format"""
+
     # Concatenate all metadata into 2 dicts, one for streamline data and
     # the other for point data.
     data_per_point = {}
@@ -91,6 +363,12 @@ def save(streamlines, filename):
             else:
                 data_per_streamline[key] = [s.data[key] for s in streamlines]
 
+    return data_per_point, data_per_streamline
+
+
+def _header(streamlines):
+    """Gets the affine to RAS and .trk header of streamlines"""
+
     transforms = streamlines.transforms
     if streamlines.coordinate_system != _ras_mm:
 
@@ -140,15 +418,9 @@ def save(streamlines, filename):
         shape = (1, 1, 1)
         voxel_sizes = (1, 1, 1)
 
-    new_tractogram = nib.streamlines.Tractogram(
-        [s.points for s in streamlines],
-        affine_to_rasmm=affine_to_rasmm,
-        data_per_point=data_per_point,
-        data_per_streamline=data_per_streamline)
-
     hdr_dict = {'dimensions': shape,
                 'voxel_sizes': voxel_sizes,
                 'voxel_to_rasmm': affine,
                 'voxel_order': "".join(nib.aff2axcodes(affine))}
-    trk_file = nib.streamlines.TrkFile(new_tractogram, hdr_dict)
-    trk_file.save(filename)
+
+    return affine_to_rasmm, hdr_dict
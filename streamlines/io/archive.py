@@ -0,0 +1,383 @@
+"""Quantized and compressed archive files of streamlines
+
+Archive files (.slz) trade a bounded loss of precision for a much smaller
+size than .trk files. The points are converted to native RAS, quantized to a
+fixed precision (e.g. 0.01 mm) and delta encoded along the packed points, so
+consecutive points of a streamline differ by small integers that are stored
+as int16. The rare deltas that do not fit, e.g. between the last point of a
+streamline and the first point of the next, are stored separately as int64.
+The bytes of the deltas are split in planes of low and high bytes, which
+compress better.
+
+The streamlines are stored in blocks that are compressed independently with
+a stdlib codec (zlib, lzma or bz2). A block index at the end of the file
+gives the position and size of every block, so any range of streamlines can
+be read without decoding the blocks before it and the blocks of a range are
+decoded in parallel. Data per point and per streamline are stored without
+loss in their original types.
+
+The file starts with a magic number and a JSON header with the precision,
+the codec, the voxel space of the streamlines (as in .trk files) and the
+layout of the data. The index is a (B, 5) array of int64 with the offset,
+compressed size, number of streamlines, number of points and number of
+large deltas of each block, followed by the number of blocks.
+
+"""
+
+import bz2
+import json
+import lzma
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from nicoord import CoordinateSystem
+from nicoord import CoordinateSystemSpace
+from nicoord import CoordinateSystemAxes
+
+import streamlines as sl
+from streamlines.serialization import from_buffers
+from streamlines.serialization import to_buffers
+
+
+# Streamlines are archived in native RAS space.
+_ras_mm = CoordinateSystem(
+    CoordinateSystemSpace.NATIVE, CoordinateSystemAxes.RAS)
+
+_MAGIC = b'SLZ\x00\x01\x00\x00\x00'
+
+# The compression and decompression functions of the supported codecs.
+codecs = {
+    'zlib': (lambda b: zlib.compress(b, 6), zlib.decompress),
+    'lzma': (lzma.compress, lzma.decompress),
+    'bz2': (bz2.compress, bz2.decompress),
+}
+
+# The int16 value that marks the deltas stored as int64.
+_ESCAPE = np.iinfo(np.int16).min
+
+
+def load(filename, start=0, stop=None, threads=None):
+    """Loads the streamlines of an archive file
+
+    Only the blocks that contain the requested streamlines are read and they
+    are decoded in parallel.
+
+    Args:
+        filename: The name of the .slz file.
+        start (optional): The index of the first streamline to load.
+        stop (optional): The index after the last streamline to load. The
+            default is the number of streamlines in the file.
+        threads (optional): The number of threads that decode blocks. The
+            default is the default of concurrent.futures.ThreadPoolExecutor.
+
+    Returns:
+        A streamlines.Streamlines instance in native RAS.
+
+    """
+
+    with open(filename, 'rb') as f, ThreadPoolExecutor(threads) as pool:
+        header = _read_header(f)
+        if stop is None:
+            stop = header['count']
+        return _load_range(f, header, start, stop, pool, {})
+
+
+def load_chunks(filename, chunk_size=100000, threads=None):
+    """Iterates over the streamlines of an archive file in chunks
+
+    Args:
+        filename: The name of the .slz file.
+        chunk_size (optional): The maximum number of streamlines per chunk.
+        threads (optional): The number of threads that decode blocks.
+
+    Yields:
+        streamlines.Streamlines instances in native RAS with at most
+        chunk_size streamlines.
+
+    """
+
+    with open(filename, 'rb') as f, ThreadPoolExecutor(threads) as pool:
+        header = _read_header(f)
+        decoded = {}
+        for start in range(0, header['count'], chunk_size):
+            stop = min(start + chunk_size, header['count'])
+            yield _load_range(f, header, start, stop, pool, decoded)
+
+
+def save(streamlines, filename, precision=0.01, codec='zlib',
+         block_size=1000):
+    """Saves streamlines to an archive file
+
+    Args:
+        streamlines (streamlines.Streamlines): The streamlines to save.
+        filename: The name of the .slz file. If the file exists, it will be
+            overwritten.
+        precision (optional): The quantization step of the coordinates in
+            mm. The points are within precision / 2 of the original points
+            along each axis.
+        codec (optional): The compression of the blocks, one of codecs.
+        block_size (optional): The number of streamlines per block.
+
+    """
+    save_chunks([streamlines], filename, precision, codec, block_size)
+
+
+def save_chunks(chunks, filename, precision=0.01, codec='zlib',
+                block_size=1000):
+    """Saves chunks of streamlines to an archive file
+
+    The header is taken from the first chunk, all chunks must therefore be
+    in the same coordinate system with the same data keys.
+
+    Args:
+        chunks: An iterable of streamlines.Streamlines instances.
+        filename: The name of the .slz file. If the file exists, it will be
+            overwritten.
+        precision (optional): The quantization step of the coordinates.
+        codec (optional): The compression of the blocks, one of codecs.
+        block_size (optional): The number of streamlines per block.
+
+    """
+
+    if precision <= 0:
+        raise ValueError(f'The precision must be positive, not {precision}.')
+    if codec not in codecs:
+        raise ValueError(
+            f'The codec must be one of {tuple(codecs)}, not {codec}.')
+
+    # The header is taken from the first chunk with streamlines, which has
+    # all the data keys.
+    chunks = iter(chunks)
+    first_chunk = sl.Streamlines()
+    for first_chunk in chunks:
+        if len(first_chunk) > 0:
+            break
+
+    affine_to_rasmm, hdr_dict = sl.io._header(first_chunk)
+    first_arrays = _arrays(first_chunk, affine_to_rasmm)
+    header = {
+        'precision': precision,
+        'codec': codec,
+        'voxel_to_rasmm': np.asarray(hdr_dict['voxel_to_rasmm']).tolist(),
+        'voxel_sizes': np.asarray(hdr_dict['voxel_sizes']).tolist(),
+        'dimensions': np.asarray(hdr_dict['dimensions']).tolist(),
+        'columns': _layout(first_arrays),
+    }
+
+    with open(filename, 'wb') as f:
+        encoded = json.dumps(header).encode()
+        f.write(_MAGIC + struct.pack('<Q', len(encoded)) + encoded)
+
+        index = []
+        for chunk in _chain_arrays(first_arrays, chunks, affine_to_rasmm):
+            if len(chunk['counts']) == 0:
+                continue
+            if _layout(chunk) != header['columns']:
+                raise ValueError(
+                    'All the chunks must have the same data keys and shapes '
+                    'as the first chunk.')
+            for start in range(0, len(chunk['counts']), block_size):
+                block = _slice(chunk, start, start + block_size)
+                payload, nb_escapes = _encode(block, precision)
+                payload = codecs[codec][0](payload)
+                index.append((f.tell(), len(payload), len(block['counts']),
+                              len(block['points']), nb_escapes))
+                f.write(payload)
+
+        index = np.array(index, dtype='<i8').reshape((-1, 5))
+        f.write(index.tobytes() + struct.pack('<Q', len(index)))
+
+
+def _chain_arrays(first_arrays, chunks, affine_to_rasmm):
+    """Iterates over the arrays of the first chunk and the next ones"""
+    yield first_arrays
+    for chunk in chunks:
+        yield _arrays(chunk, affine_to_rasmm)
+
+
+def _arrays(streamlines, affine_to_rasmm):
+    """Gets the buffers of streamlines with their points in native RAS
+
+    The offsets of the buffers are replaced by the number of points of each
+    streamline, which can be concatenated.
+
+    """
+
+    arrays, data = to_buffers(streamlines)
+    if data is not None:
+        raise ValueError(
+            'The streamlines must all have the same data keys and shapes to '
+            'be archived.')
+
+    points = arrays['points']
+    arrays['points'] = (np.dot(points, affine_to_rasmm[:3, :3].T) +
+                        affine_to_rasmm[:3, 3])
+    arrays['counts'] = np.diff(arrays.pop('offsets'))
+
+    return arrays
+
+
+def _layout(arrays):
+    """Gets the name, type and shape of the data columns of buffers"""
+    return [[name, column.dtype.str, list(column.shape[1:])]
+            for name, column in arrays.items() if '/' in name]
+
+
+def _slice(arrays, start, stop):
+    """Selects the streamlines from start to stop in buffers"""
+
+    offsets = np.zeros((len(arrays['counts']) + 1,), dtype=np.intp)
+    np.cumsum(arrays['counts'], out=offsets[1:])
+    first, last = offsets[start], offsets[min(stop, len(offsets) - 1)]
+
+    sliced = {}
+    for name, array in arrays.items():
+        if name == 'points' or name.startswith('point/'):
+            sliced[name] = array[first:last]
+        else:
+            sliced[name] = array[start:stop]
+
+    return sliced
+
+
+def _encode(arrays, precision):
+    """Encodes the buffers of a block into bytes
+
+    Returns:
+        payload: The uncompressed bytes of the block.
+        nb_escapes: The number of deltas stored as int64.
+
+    """
+
+    quantized = np.round(arrays['points'] / precision).astype(np.int64)
+    deltas = np.diff(quantized, axis=0, prepend=np.zeros((1, 3), np.int64))
+    deltas = deltas.ravel()
+
+    escaped = (deltas <= _ESCAPE) | (deltas > np.iinfo(np.int16).max)
+    small = np.where(escaped, _ESCAPE, deltas).astype('<i2')
+    planes = small.view(np.uint8).reshape((-1, 2)).T
+
+    parts = [arrays['counts'].astype('<u4'), planes,
+             deltas[escaped].astype('<i8')]
+    parts += [arrays[name] for name, *_ in _layout(arrays)]
+    payload = b''.join(np.ascontiguousarray(p).tobytes() for p in parts)
+
+    return payload, int(np.count_nonzero(escaped))
+
+
+def _decode(payload, header, nb_streamlines, nb_points, nb_escapes):
+    """Decodes the bytes of a block into buffers"""
+
+    payload = codecs[header['codec']][1](payload)
+    position = 0
+
+    def read(dtype, shape):
+        nonlocal position
+        dtype = np.dtype(dtype)
+        count = int(np.prod(shape))
+        array = np.frombuffer(payload, dtype, count, position)
+        position += count * dtype.itemsize
+        return array.reshape(shape)
+
+    arrays = {'counts': read('<u4', (nb_streamlines,)).astype(np.intp)}
+
+    # Interleave the planes of low and high bytes.
+    planes = read(np.uint8, (2, 3 * nb_points))
+    small = np.empty((3 * nb_points,), dtype='<i2')
+    small.view(np.uint8)[0::2] = planes[0]
+    small.view(np.uint8)[1::2] = planes[1]
+    deltas = small.astype(np.int64)
+    deltas[deltas == _ESCAPE] = read('<i8', (nb_escapes,))
+
+    quantized = np.cumsum(deltas.reshape((nb_points, 3)), axis=0)
+    arrays['points'] = quantized * header['precision']
+
+    for name, dtype, shape in header['columns']:
+        length = nb_points if name.startswith('point/') else nb_streamlines
+        arrays[name] = read(dtype, [length] + shape)
+
+    return arrays
+
+
+def _read_header(f):
+    """Reads the header and the block index of an archive file"""
+
+    magic = f.read(len(_MAGIC))
+    if magic != _MAGIC:
+        raise ValueError(f'{f.name} is not a streamlines archive file.')
+
+    length, = struct.unpack('<Q', f.read(8))
+    header = json.loads(f.read(length).decode())
+
+    f.seek(-8, 2)
+    nb_blocks, = struct.unpack('<Q', f.read(8))
+    f.seek(-8 - nb_blocks * 40, 2)
+    index = np.frombuffer(f.read(nb_blocks * 40), '<i8').reshape((-1, 5))
+
+    # The index of the first streamline of each block.
+    header['index'] = index
+    header['starts'] = np.concatenate(([0], np.cumsum(index[:, 2])))
+    header['count'] = int(header['starts'][-1])
+
+    return header
+
+
+def _load_range(f, header, start, stop, pool, decoded):
+    """Loads the streamlines from start to stop of an archive file
+
+    The decoded dict keeps the last decoded block so that the blocks shared
+    by consecutive ranges are decoded once.
+
+    """
+
+    start, stop = max(start, 0), min(stop, header['count'])
+    starts = header['starts']
+    first = np.searchsorted(starts, start, side='right') - 1
+    last = np.searchsorted(starts, stop, side='left')
+    blocks = range(first, last) if stop > start else range(0)
+
+    # Read the missing blocks with a single read and decode them in
+    # parallel.
+    index = header['index']
+    missing = [b for b in blocks if b not in decoded]
+    if len(missing) > 0:
+        begin = index[missing[0], 0]
+        f.seek(begin)
+        data = f.read(index[missing[-1], 0] + index[missing[-1], 1] - begin)
+        payloads = [data[o - begin:o - begin + n]
+                    for o, n in index[missing, :2]]
+        decoded.update(zip(missing, pool.map(
+            lambda b, p: _decode(p, header, *index[b, 2:]),
+            missing, payloads)))
+
+    arrays = [decoded[b] for b in blocks]
+    for block in list(decoded):
+        if block not in blocks[-1:]:
+            del decoded[block]
+
+    if len(arrays) == 0:
+        arrays = {'points': np.zeros((0, 3)),
+                  'counts': np.zeros((0,), dtype=np.intp)}
+        arrays.update({name: np.zeros([0] + shape, dtype)
+                       for name, dtype, shape in header['columns']})
+    else:
+        arrays = {name: np.concatenate([a[name] for a in arrays])
+                  for name in arrays[0]}
+        relative = start - starts[blocks[0]]
+        arrays = _slice(arrays, relative, relative + stop - start)
+
+    counts = arrays.pop('counts')
+    arrays['offsets'] = np.zeros((len(counts) + 1,), dtype=np.intp)
+    np.cumsum(counts, out=arrays['offsets'][1:])
+
+    return from_buffers(_ras_mm, _transforms(header), arrays)
+
+
+def _transforms(header):
+    """Gets the transforms to voxel space from the header"""
+    return sl.io._transforms({
+        'voxel_to_rasmm': np.array(header['voxel_to_rasmm']),
+        'voxel_sizes': np.array(header['voxel_sizes']),
+        'dimensions': np.array(header['dimensions'])})
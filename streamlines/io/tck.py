@@ -0,0 +1,392 @@
+"""Native reading and writing of MRtrix .tck files
+
+A .tck file has a text header followed by a stream of points in native RAS
+(scanner) coordinates. The points of each streamline are followed by a
+(NaN, NaN, NaN) delimiter and the stream ends with (Inf, Inf, Inf). The
+stream is read in large blocks that are split into streamlines with
+vectorized searches for the delimiters, so files can be read in chunks
+without loading them in memory.
+
+The .tck format does not store the voxel space of the streamlines nor data
+per point or per streamline. Loaded streamlines are in native RAS without
+transforms and the data of saved streamlines is dropped.
+
+"""
+
+import os
+import re
+import shutil
+
+import numpy as np
+from nicoord import CoordinateSystem
+from nicoord import CoordinateSystemSpace
+from nicoord import CoordinateSystemAxes
+
+import streamlines as sl
+from streamlines import packed
+from streamlines.serialization import from_buffers
+
+
+# Streamlines in .tck format are always in native RAS space.
+_ras_mm = CoordinateSystem(
+    CoordinateSystemSpace.NATIVE, CoordinateSystemAxes.RAS)
+
+# The data types of the points supported in .tck files.
+_dtypes = {
+    'Float32LE': np.dtype('<f4'),
+    'Float32BE': np.dtype('>f4'),
+    'Float64LE': np.dtype('<f8'),
+    'Float64BE': np.dtype('>f8'),
+}
+
+# The number of points read at once.
+_BLOCK_SIZE = 2 ** 20
+
+# The number of digits of the count of streamlines in the header. The count
+# is padded so it can be updated in place when streamlines are appended.
+_COUNT_DIGITS = 10
+
+
+def load(filename):
+    """Loads the streamlines of a .tck file
+
+    Args:
+        filename: The name of the .tck file.
+
+    Returns:
+        A streamlines.Streamlines instance in native RAS.
+
+    """
+
+    chunks = list(load_chunks(filename, chunk_size=None))
+    if len(chunks) == 0:
+        return sl.Streamlines(None, _ras_mm)
+    return chunks[0]
+
+
+def load_chunks(filename, chunk_size=100000):
+    """Iterates over the streamlines of a .tck file in chunks
+
+    Args:
+        filename: The name of the .tck file.
+        chunk_size (optional): The maximum number of streamlines per chunk.
+            If None, all the streamlines are in a single chunk.
+
+    Yields:
+        streamlines.Streamlines instances in native RAS with at most
+        chunk_size streamlines.
+
+    """
+
+    # The packed blocks whose streamlines were not yielded yet. They are
+    # concatenated once there are enough streamlines for a chunk and the
+    # chunks are slices of the concatenated points.
+    blocks = []
+    nb_pending = 0
+    for block in _read_blocks(filename):
+        blocks.append(block)
+        nb_pending += len(block[1]) - 1
+        if chunk_size is None or nb_pending < chunk_size:
+            continue
+
+        points, offsets = _concatenate(blocks)
+        start = 0
+        while nb_pending - start >= chunk_size:
+            yield _from_packed(points, offsets, start, start + chunk_size)
+            start += chunk_size
+        blocks = [_slice(points, offsets, start, nb_pending)]
+        nb_pending -= start
+
+    if nb_pending > 0:
+        yield _from_packed(*_concatenate(blocks), 0, nb_pending)
+
+
+def save(streamlines, filename, append=False):
+    """Saves streamlines to a .tck file
+
+    Args:
+        streamlines (streamlines.Streamlines): The streamlines to save. They
+            must be in native RAS or have a transform to native RAS.
+        filename: The name of the .tck file.
+        append (optional): If True and the file exists, the streamlines are
+            added at the end of the file instead of overwriting it.
+
+    """
+    save_chunks([streamlines], filename, append)
+
+
+def save_chunks(chunks, filename, append=False):
+    """Saves chunks of streamlines to a .tck file
+
+    The chunks are written as they are produced so only one chunk is in
+    memory at any time.
+
+    Args:
+        chunks: An iterable of streamlines.Streamlines instances, for example
+            the output of load_chunks.
+        filename: The name of the .tck file.
+        append (optional): If True and the file exists, the streamlines are
+            added at the end of the file instead of overwriting it. If the
+            count of streamlines in the header has fewer digits than the
+            padded count of this module, e.g. in files written by MRtrix,
+            the file is first rewritten with a padded count.
+
+    """
+
+    if append and os.path.exists(filename):
+
+        # The final count is only known once the chunks are written, so it
+        # must fit in the header before any data is appended.
+        with open(filename, 'rb') as f:
+            header, _, _ = _read_header(f)
+        if 'count' in header and len(header['count']) < _COUNT_DIGITS:
+            _pad_count(filename)
+
+        f = open(filename, 'r+b')
+        header, dtype, count = _read_header(f)
+
+        # Overwrite the end of file marker.
+        f.seek(-3 * dtype.itemsize, os.SEEK_END)
+        if not np.all(np.isinf(np.fromfile(f, dtype, 3))):
+            f.close()
+            raise ValueError(f'The file {filename} does not end with an end '
+                             f'of file marker.')
+        f.seek(-3 * dtype.itemsize, os.SEEK_END)
+
+    else:
+        f = open(filename, 'wb')
+        dtype, count = _dtypes['Float32LE'], 0
+        header = _write_header(f, count)
+
+    with f:
+        for chunk in chunks:
+            _write_points(f, *_rasmm_points(chunk), dtype)
+            count += len(chunk)
+
+        np.full((1, 3), np.inf, dtype).tofile(f)
+        _write_count(f, header, count)
+
+
+def _read_header(f):
+    """Reads the header of a .tck file
+
+    Returns:
+        header: A dict of the values of the header with the position of the
+            count of streamlines in the file under the key 'count_position'.
+        dtype: The data type of the points.
+        count: The number of streamlines in the header.
+
+    """
+
+    if f.readline().strip() != b'mrtrix tracks':
+        raise ValueError(f'{f.name} is not a .tck file.')
+
+    header = {}
+    while True:
+        position = f.tell()
+        text = f.readline().decode('latin-1')
+        if text == '':
+            raise ValueError(f'The header of {f.name} has no END line.')
+        if text.strip() == 'END':
+            break
+
+        key, _, value = text.partition(':')
+        key, value = key.strip(), value.strip()
+        if key == 'count':
+            header['count_position'] = position + text.index(
+                value, len(key))
+        header[key] = value
+
+    datatype = header.get('datatype', 'Float32LE')
+    if datatype not in _dtypes:
+        raise ValueError(f'Unsupported data type {datatype} in {f.name}.')
+
+    match = re.fullmatch(r'\.\s+(\d+)', header.get('file', ''))
+    if match is None:
+        raise ValueError(f'The header of {f.name} has no data offset.')
+    header['offset'] = int(match.group(1))
+    f.seek(header['offset'])
+
+    return header, _dtypes[datatype], int(header.get('count', 0))
+
+
+def _write_header(f, count):
+    """Writes the header of a new .tck file"""
+
+    # The offset of the data is part of the header so its length is computed
+    # until it is stable.
+    offset = 0
+    while True:
+        lines = ['mrtrix tracks',
+                 'datatype: Float32LE',
+                 f'file: . {offset}',
+                 f'count: {count:0{_COUNT_DIGITS}d}',
+                 'END']
+        text = ('\n'.join(lines) + '\n').encode('latin-1')
+        if len(text) == offset:
+            break
+        offset = len(text)
+
+    f.write(text)
+    count_position = text.index(b'count: ') + len(b'count: ')
+
+    return {'offset': offset, 'count_position': count_position,
+            'count': f'{count:0{_COUNT_DIGITS}d}'}
+
+
+def _pad_count(filename):
+    """Rewrites a .tck file with a count of _COUNT_DIGITS digits
+
+    The header is written again with a padded count and the points are
+    copied after the new header.
+
+    """
+
+    with open(filename, 'rb') as f:
+        header, _, count = _read_header(f)
+        f.seek(0)
+        lines = []
+        for line in iter(f.readline, b''):
+            line = line.decode('latin-1').rstrip('\n')
+            if line.strip() == 'END':
+                break
+            lines.append(line)
+
+        # The offset of the data is part of the header so its length is
+        # computed until it is stable.
+        offset = 0
+        while True:
+            values = {'file': f'file: . {offset}',
+                      'count': f'count: {count:0{_COUNT_DIGITS}d}'}
+            new_lines = [values.get(line.partition(':')[0].strip(), line)
+                         for line in lines] + ['END']
+            text = ('\n'.join(new_lines) + '\n').encode('latin-1')
+            if len(text) == offset:
+                break
+            offset = len(text)
+
+        temporary = f'{filename}.tmp'
+        with open(temporary, 'wb') as out:
+            out.write(text)
+            f.seek(header['offset'])
+            shutil.copyfileobj(f, out)
+
+    os.replace(temporary, filename)
+
+
+def _write_count(f, header, count):
+    """Updates the number of streamlines in the header in place"""
+
+    # Files written by other software may not have a count.
+    if 'count_position' not in header:
+        return
+
+    width = len(header['count'])
+    text = f'{count:0{width}d}'
+    if len(text) > width:
+        raise ValueError(
+            f'The count of streamlines of {f.name} cannot be updated in '
+            f'place.')
+
+    f.seek(header['count_position'])
+    f.write(text.encode('latin-1'))
+
+
+def _read_blocks(filename):
+    """Reads the points of a .tck file in blocks
+
+    Yields:
+        The packed points and offsets (see streamlines.packed) of the
+        streamlines that end in each block.
+
+    """
+
+    with open(filename, 'rb') as f:
+        _, dtype, _ = _read_header(f)
+
+        # The points of the streamline that continues in the next block.
+        tail = np.zeros((0, 3))
+        while True:
+
+            block = np.fromfile(f, dtype, 3 * _BLOCK_SIZE)
+            if len(block) == 0:
+                return
+            block = block[:len(block) // 3 * 3].reshape((-1, 3))
+            points = np.concatenate((tail, block))
+
+            # Delimiters are the only points that are not finite. The first
+            # infinite point marks the end of the file.
+            delimiters = np.flatnonzero(~np.isfinite(points[:, 0]))
+            ends = np.flatnonzero(np.isinf(points[delimiters, 0]))
+            if len(ends) > 0:
+                delimiters = delimiters[:ends[0]]
+
+            if len(delimiters) > 0:
+                last = delimiters[-1]
+                keep = np.ones((last + 1,), dtype=bool)
+                keep[delimiters] = False
+                offsets = np.zeros((len(delimiters) + 1,), dtype=np.intp)
+                offsets[1:] = delimiters - np.arange(len(delimiters))
+                yield points[:last + 1][keep], offsets
+                tail = points[last + 1:]
+
+            if len(ends) > 0:
+                return
+            if len(delimiters) == 0:
+                tail = points
+
+
+def _write_points(f, points, offsets, dtype):
+    """Writes packed points with a delimiter after each streamline"""
+
+    nb_streamlines = len(offsets) - 1
+
+    # Each point moves down by the number of delimiters before it.
+    out = np.empty((len(points) + nb_streamlines, 3), dtype)
+    out[np.arange(len(points)) + packed.streamline_ids(offsets)] = points
+    out[offsets[1:] + np.arange(nb_streamlines)] = np.nan
+    out.tofile(f)
+
+
+def _rasmm_points(streamlines):
+    """Gets the packed points of streamlines in native RAS"""
+
+    points, offsets = packed.pack([s._points for s in streamlines])
+    if streamlines.coordinate_system == _ras_mm:
+        return points, offsets
+
+    valid_transforms = [t for t in streamlines.transforms
+                        if t.target == _ras_mm]
+    if len(valid_transforms) == 0:
+        raise ValueError(
+            'The streamlines are not in native RAS space and no transforms '
+            'to RAS are available. Cannot save to .tck format.')
+
+    affine = valid_transforms[0].affine
+    return np.dot(points, affine[:3, :3].T) + affine[:3, 3], offsets
+
+
+def _concatenate(blocks):
+    """Concatenates packed points and offsets"""
+
+    if len(blocks) == 1:
+        return blocks[0]
+
+    points = np.concatenate([p for p, _ in blocks])
+    starts = np.cumsum([0] + [len(p) for p, _ in blocks[:-1]])
+    offsets = np.concatenate(
+        [[0]] + [o[1:] + start for (_, o), start in zip(blocks, starts)])
+
+    return points, offsets
+
+
+def _slice(points, offsets, start, stop):
+    """Returns the packed points of the streamlines start to stop"""
+    first, last = offsets[start], offsets[stop]
+    return points[first:last], offsets[start:stop + 1] - first
+
+
+def _from_packed(points, offsets, start, stop):
+    """Creates streamlines in native RAS that are views into packed points"""
+    points, offsets = _slice(points, offsets, start, stop)
+    return from_buffers(_ras_mm, None, {'points': points, 'offsets': offsets})
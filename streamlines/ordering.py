@@ -0,0 +1,181 @@
+"""Spatial ordering of streamlines along space-filling curves
+
+Trackers write streamlines in the order of their seeds, so neighboring
+streamlines are scattered through files and memory. Sorting the streamlines
+by the position of an anchor point (their midpoint or their endpoints) along
+a space-filling curve places neighboring streamlines close to each other,
+which improves the locality of spatial queries, the compression of files and
+the homogeneity of chunks.
+
+The anchors are quantized on a regular grid of 2 ** bits cells per axis
+that covers their bounding box and the cells are numbered along a Morton
+(Z-order) or a Hilbert curve. The Hilbert curve has better locality: cells
+that are consecutive along the curve are always adjacent. The keys of all
+the streamlines are computed at once with bitwise operations on arrays.
+
+"""
+
+import numpy as np
+
+
+# The maximum number of bits per axis of keys stored in 64 bits.
+MAX_BITS = 21
+
+
+def morton_keys(cells, bits=MAX_BITS):
+    """Computes the Morton keys of integer coordinates
+
+    Args:
+        cells: A (N, 3) array of integer coordinates in [0, 2 ** bits).
+        bits (optional): The number of bits per axis.
+
+    Returns:
+        A (N,) array of uint64 keys.
+
+    """
+
+    cells = np.asarray(cells, dtype=np.uint64)
+    return (_spread(cells[:, 0]) | (_spread(cells[:, 1]) << np.uint64(1)) |
+            (_spread(cells[:, 2]) << np.uint64(2)))
+
+
+def hilbert_keys(cells, bits=MAX_BITS):
+    """Computes the Hilbert keys of integer coordinates
+
+    Uses the algorithm of Skilling (2004) to compute the transposed Hilbert
+    index of all the coordinates, one bit level at a time.
+
+    Args:
+        cells: A (N, 3) array of integer coordinates in [0, 2 ** bits).
+        bits (optional): The number of bits per axis.
+
+    Returns:
+        A (N,) array of uint64 keys.
+
+    """
+
+    x = np.array(cells, dtype=np.uint64).T
+
+    # Undo the excess work of the inverse transform.
+    q = 1 << (bits - 1)
+    while q > 1:
+        p = np.uint64(q - 1)
+        for i in range(3):
+            flip = (x[i] & np.uint64(q)) != 0
+            x[0, flip] ^= p
+            swap = (x[0] ^ x[i]) & p
+            swap[flip] = 0
+            x[0] ^= swap
+            x[i] ^= swap
+        q >>= 1
+
+    # Gray encode.
+    x[1] ^= x[0]
+    x[2] ^= x[1]
+    t = np.zeros((x.shape[1],), dtype=np.uint64)
+    q = 1 << (bits - 1)
+    while q > 1:
+        t[(x[2] & np.uint64(q)) != 0] ^= np.uint64(q - 1)
+        q >>= 1
+    x ^= t
+
+    # The first axis holds the most significant bit of each level.
+    return ((_spread(x[0]) << np.uint64(2)) |
+            (_spread(x[1]) << np.uint64(1)) | _spread(x[2]))
+
+
+# The functions that compute the keys of the space-filling curves.
+curves = {
+    'morton': morton_keys,
+    'hilbert': hilbert_keys,
+}
+
+anchors = ('midpoint', 'endpoints')
+
+
+def spatial_order(points, offsets, curve='hilbert', anchor='midpoint',
+                  bits=16):
+    """Sorts packed streamlines along a space-filling curve
+
+    Args:
+        points: The (P, 3) packed points.
+        offsets: The (N + 1,) offsets of the streamlines.
+        curve (optional): 'hilbert' or 'morton'.
+        anchor (optional): The points of the streamlines that are sorted.
+            With 'midpoint', the point halfway along the points of each
+            streamline. With 'endpoints', the streamlines are sorted by the
+            key of their first endpoint along the curve and then by the key
+            of the other one, so the order does not depend on their
+            orientation.
+        bits (optional): The number of bits per axis of the grid of cells.
+
+    Returns:
+        A (N,) array of int with the index of the streamline at each
+        position in the new order. Streamlines without points are last.
+
+    """
+
+    if curve not in curves:
+        raise ValueError(
+            f'The curve must be one of {tuple(curves)}, not {curve}.')
+    if anchor not in anchors:
+        raise ValueError(
+            f'The anchor must be one of {anchors}, not {anchor}.')
+    if not 1 <= bits <= MAX_BITS:
+        raise ValueError(
+            f'The number of bits must be between 1 and {MAX_BITS}, not '
+            f'{bits}.')
+
+    counts = np.diff(offsets)
+    empty = counts == 0
+    starts = offsets[:-1][~empty]
+    ends = offsets[1:][~empty] - 1
+    if anchor == 'midpoint':
+
+        # The average of the two middle points does not depend on the
+        # orientation of the streamlines.
+        middles = (starts + ends) // 2, (starts + ends + 1) // 2
+        positions = [(points[middles[0]] + points[middles[1]]) / 2]
+    else:
+        positions = [points[starts], points[ends]]
+
+    cells = _cells(positions, bits)
+    keys = [curves[curve](c, bits) for c in cells]
+    if anchor == 'endpoints':
+        keys = [np.minimum(*keys), np.maximum(*keys)]
+
+    order = np.flatnonzero(~empty)[np.lexsort(keys[::-1])]
+    return np.concatenate((order, np.flatnonzero(empty)))
+
+
+def _cells(positions, bits):
+    """Quantizes positions on a grid that covers all of them
+
+    The grid has the same cell size along all the axes so the curve
+    preserves distances equally in all directions.
+
+    """
+
+    stacked = np.concatenate(positions)
+    if len(stacked) == 0:
+        return [np.zeros((0, 3), dtype=np.uint64) for _ in positions]
+
+    minimum = stacked.min(0)
+    extent = np.max(stacked.max(0) - minimum)
+    scale = (2 ** bits - 1) / extent if extent > 0 else 0
+
+    return [np.round((p - minimum) * scale).astype(np.uint64)
+            for p in positions]
+
+
+def _spread(values):
+    """Inserts two zero bits between the bits of 21 bit integers"""
+
+    x = values & np.uint64(0x1fffff)
+    x = (x | x << np.uint64(32)) & np.uint64(0x1f00000000ffff)
+    x = (x | x << np.uint64(16)) & np.uint64(0x1f0000ff0000ff)
+    x = (x | x << np.uint64(8)) & np.uint64(0x100f00f00f00f00f)
+    x = (x | x << np.uint64(4)) & np.uint64(0x10c30c30c30c30c3)
+    x = (x | x << np.uint64(2)) & np.uint64(0x1249249249249249)
+
+    return x
@@ -0,0 +1,577 @@
+"""Kernels that operate on packed streamlines
+
+Packed streamlines store the points of all the streamlines of a tractogram in
+a single (P, 3) array. The streamline ``i`` is formed by the points
+``points[offsets[i]:offsets[i + 1]]``, i.e. ``offsets`` has one more element
+than there are streamlines. Operating on packed streamlines allows vectorized
+computations over the whole tractogram instead of Python loops over individual
+streamlines.
+
+"""
+
+import functools
+
+import numpy as np
+from scipy.interpolate import interp1d
+
+
+def pack(arrays):
+    """Packs a sequence of (N, 3) arrays into a single array
+
+    Args:
+        arrays: A sequence of (N, 3) arrays. N can differ for each array.
+
+    Returns:
+        points: A (P, 3) array that contains all the points.
+        offsets: A (len(arrays) + 1,) array of int with the index of the first
+            point of each streamline followed by P.
+
+    """
+
+    nb_points = np.array([len(a) for a in arrays], dtype=np.intp)
+    offsets = np.zeros((len(nb_points) + 1,), dtype=np.intp)
+    np.cumsum(nb_points, out=offsets[1:])
+
+    if len(arrays) == 0:
+        return np.empty((0, 3)), offsets
+
+    return np.concatenate(arrays).reshape((-1, 3)), offsets
+
+
+def unpack(points, offsets):
+    """Splits packed points into individual (N, 3) arrays
+
+    The returned arrays are views into ``points``.
+
+    """
+    return [points[s:e] for s, e in zip(offsets[:-1], offsets[1:])]
+
+
+def nb_points(offsets):
+    """Returns the number of points of each streamline"""
+    return np.diff(offsets)
+
+
+def streamline_ids(offsets):
+    """Returns the index of the streamline of each point"""
+    return np.repeat(np.arange(len(offsets) - 1), nb_points(offsets))
+
+
+def segment_lengths(points, offsets):
+    """Measures the length of the segments between consecutive points
+
+    Returns:
+        A (P,) array where element ``j`` is the distance between point ``j``
+        and the next point of the same streamline. It is 0 for the last point
+        of each streamline.
+
+    """
+
+    segments = np.zeros((len(points),))
+    if len(points) > 1:
+        segments[:-1] = np.sqrt(np.sum((points[1:] - points[:-1]) ** 2, 1))
+
+    # Mask the segments that join the last point of a streamline to the
+    # first point of the next one.
+    ends = offsets[1:] - 1
+    segments[ends[ends >= 0]] = 0.0
+
+    return segments
+
+
+def lengths(points, offsets):
+    """Measures the length of all streamlines"""
+
+    # The length of each streamline is the difference of the cumulative
+    # segment length at its first and last points, which is also correct for
+    # streamlines with 0 or 1 point.
+    cumulative = np.zeros((len(points) + 1,))
+    np.cumsum(segment_lengths(points, offsets), out=cumulative[1:])
+    starts = offsets[:-1]
+    ends = np.maximum(offsets[1:] - 1, starts)
+
+    return cumulative[ends] - cumulative[starts]
+
+
+def endpoints(points, offsets):
+    """Returns the first and last point of each streamline
+
+    Streamlines without points have NaN endpoints.
+
+    Returns:
+        starts: A (N, 3) array with the first point of each streamline.
+        ends: A (N, 3) array with the last point of each streamline.
+
+    """
+
+    empty = offsets[1:] == offsets[:-1]
+    starts = np.full((len(offsets) - 1, 3), np.nan)
+    ends = np.full((len(offsets) - 1, 3), np.nan)
+    starts[~empty] = points[offsets[:-1][~empty]]
+    ends[~empty] = points[offsets[1:][~empty] - 1]
+
+    return starts, ends
+
+
+def bounding_boxes(points, offsets):
+    """Computes the axis aligned bounding box of each streamline
+
+    Streamlines without points have NaN bounding boxes.
+
+    Returns:
+        minimums: A (N, 3) array with the minimum coordinates of each
+            streamline.
+        maximums: A (N, 3) array with the maximum coordinates of each
+            streamline.
+
+    """
+
+    empty = offsets[1:] == offsets[:-1]
+    minimums = np.full((len(offsets) - 1, 3), np.nan)
+    maximums = np.full((len(offsets) - 1, 3), np.nan)
+
+    starts = offsets[:-1][~empty]
+    if len(starts) > 0:
+        minimums[~empty] = np.minimum.reduceat(points, starts, axis=0)
+        maximums[~empty] = np.maximum.reduceat(points, starts, axis=0)
+
+    return minimums, maximums
+
+
+def reduce_any(values, offsets):
+    """Segmented logical or of per-point boolean values"""
+    counts = np.add.reduceat(
+        np.append(values, False).astype(np.intp), offsets[:-1])
+    return (counts > 0) & (offsets[1:] > offsets[:-1])
+
+
+def reduce_all(values, offsets):
+    """Segmented logical and of per-point boolean values
+
+    Streamlines without points are considered to satisfy the condition.
+
+    """
+    return ~reduce_any(~np.asarray(values, dtype=bool), offsets)
+
+
+def reduce_max(values, offsets):
+    """Segmented maximum of per-point values
+
+    Streamlines without points have a maximum of 0.
+
+    """
+
+    maximums = np.zeros((len(offsets) - 1,))
+    non_empty = offsets[1:] > offsets[:-1]
+    if np.any(non_empty):
+        maximums[non_empty] = np.maximum.reduceat(
+            values, offsets[:-1][non_empty])
+
+    return maximums
+
+
+def reduce_mean(values, offsets, where=None):
+    """Segmented mean of per-point values
+
+    Args:
+        values: The (P,) per-point values.
+        offsets: The (N + 1,) offsets of the streamlines.
+        where (optional): A (P,) array of bool that selects the values
+            included in the means. The default is all values.
+
+    Returns:
+        A (N,) array with the mean of each streamline, which is 0 for the
+        streamlines without selected values.
+
+    """
+
+    if where is None:
+        where = np.ones((len(values),), dtype=bool)
+
+    empty = offsets[1:] == offsets[:-1]
+    sums = np.add.reduceat(
+        np.append(np.where(where, values, 0), 0), offsets[:-1])
+    counts = np.add.reduceat(
+        np.append(where, False).astype(np.intp), offsets[:-1])
+    counts[empty] = 0
+
+    return np.divide(sums, counts, out=np.zeros((len(counts),)),
+                     where=counts > 0)
+
+
+def interior(offsets, width=1):
+    """Selects the points with width neighbors on both sides
+
+    Returns:
+        A (P,) array of bool that is True for the points with at least width
+        points before and after them in the same streamline, i.e. the points
+        where central differences over 2 * width + 1 points are defined.
+
+    """
+
+    counts = nb_points(offsets)
+    indices = np.arange(offsets[-1])
+    starts = np.repeat(offsets[:-1], counts)
+    ends = np.repeat(offsets[1:], counts)
+
+    return (indices - starts >= width) & (ends - indices > width)
+
+
+def _shifted(points, shift):
+    """Returns the point at index j + shift for each point j
+
+    Near the ends of the streamlines, these are points of other streamlines
+    and the results must be masked with interior.
+
+    """
+    return np.take(points, np.arange(len(points)) + shift, axis=0,
+                   mode='clip')
+
+
+def _derivatives(points):
+    """Estimates the derivatives of the curves by central differences
+
+    The derivatives are with respect to the index of the points. The first
+    and second derivatives are valid at the points with one neighbor on
+    both sides and the third derivative at the points with two neighbors on
+    both sides.
+
+    """
+
+    before, after = _shifted(points, -1), _shifted(points, 1)
+    first = (after - before) / 2
+    second = after - 2 * points + before
+    third = (_shifted(points, 2) - 2 * after + 2 * before -
+             _shifted(points, -2)) / 2
+
+    return first, second, third
+
+
+def curvatures(points, offsets):
+    """Measures the curvature of the streamlines at each point
+
+    The curvature is |r' x r''| / |r'|^3 where the derivatives of the curve
+    r are estimated by central differences over the packed points.
+
+    Returns:
+        A (P,) array with the curvature in 1 / unit of the points, e.g.
+        1 / mm. It is 0 at the first and last point of each streamline.
+
+    """
+
+    first, second, _ = _derivatives(points)
+    cross = np.linalg.norm(np.cross(first, second), axis=1)
+    speeds = np.linalg.norm(first, axis=1) ** 3
+
+    valid = interior(offsets, 1) & (speeds > 0)
+    return np.divide(cross, speeds, out=np.zeros((len(points),)),
+                     where=valid)
+
+
+def torsions(points, offsets):
+    """Measures the torsion of the streamlines at each point
+
+    The torsion is (r' x r'') . r''' / |r' x r''|^2 where the derivatives of
+    the curve r are estimated by central differences over the packed points.
+
+    Returns:
+        A (P,) array with the signed torsion in 1 / unit of the points. It
+        is 0 at the first and last two points of each streamline and where
+        the streamlines are straight.
+
+    """
+
+    first, second, third = _derivatives(points)
+    cross = np.cross(first, second)
+    squared_norms = np.einsum('ij,ij->i', cross, cross)
+
+    valid = interior(offsets, 2) & (squared_norms > 0)
+    return np.divide(np.einsum('ij,ij->i', cross, third), squared_norms,
+                     out=np.zeros((len(points),)), where=valid)
+
+
+def turning_angles(points, offsets):
+    """Measures the angle between consecutive segments at each point
+
+    Returns:
+        A (P,) array with the angle in degrees between the segment that ends
+        at each point and the segment that starts at it. It is 0 at the
+        first and last point of each streamline and next to segments of
+        length 0.
+
+    """
+
+    incoming = points - _shifted(points, -1)
+    outgoing = _shifted(points, 1) - points
+    norms = (np.linalg.norm(incoming, axis=1) *
+             np.linalg.norm(outgoing, axis=1))
+    cosines = np.divide(np.einsum('ij,ij->i', incoming, outgoing), norms,
+                        out=np.ones((len(points),)), where=norms > 0)
+
+    angles = np.degrees(np.arccos(np.clip(cosines, -1, 1)))
+    angles[~interior(offsets, 1)] = 0
+
+    return angles
+
+
+def tortuosities(points, offsets):
+    """Measures the ratio of the length to the distance between endpoints
+
+    Returns:
+        A (N,) array with the tortuosity of each streamline, which is at
+        least 1. Streamlines with less than 2 distinct points have a
+        tortuosity of 1 and closed loops have an infinite tortuosity.
+
+    """
+
+    starts, ends = endpoints(points, offsets)
+    distances = np.linalg.norm(ends - starts, axis=1)
+    streamline_lengths = lengths(points, offsets)
+
+    tortuosities = np.ones((len(distances),))
+    tortuosities[(distances == 0) & (streamline_lengths > 0)] = np.inf
+    valid = distances > 0
+    tortuosities[valid] = streamline_lengths[valid] / distances[valid]
+
+    return tortuosities
+
+
+def supersample(points, offsets, step):
+    """Adds points along segments so they are at most step apart
+
+    The segments of each streamline are divided into the smallest number of
+    equal parts that are shorter than step. The original points are kept.
+
+    Args:
+        points: The (P, 3) packed points.
+        offsets: The (N + 1,) offsets of the streamlines.
+        step: The maximum distance between consecutive points.
+
+    Returns:
+        The packed points and offsets of the supersampled streamlines.
+
+    """
+
+    # The number of points generated from each point, including itself.
+    # The last point of each streamline has no segment and generates only
+    # itself.
+    segments = segment_lengths(points, offsets)
+    counts = np.maximum(np.ceil(segments / step), 1).astype(np.intp)
+
+    new_offsets = np.zeros((len(points) + 1,), dtype=np.intp)
+    np.cumsum(counts, out=new_offsets[1:])
+
+    # The position of each new point along its segment.
+    sources = np.repeat(np.arange(len(points)), counts)
+    steps = np.arange(new_offsets[-1]) - new_offsets[sources]
+    t = (steps / counts[sources])[:, None]
+
+    targets = np.minimum(sources + 1, len(points) - 1)
+    new_points = points[sources] + t * (points[targets] - points[sources])
+
+    return new_points, new_offsets[offsets]
+
+
+def simplify(points, offsets, tolerance):
+    """Selects the points to keep to simplify streamlines within a tolerance
+
+    Uses the Ramer-Douglas-Peucker algorithm: the first and last points of
+    each streamline are kept and, recursively, the point farthest from the
+    segment between two kept points is kept if its distance is larger than
+    the tolerance. All the streamlines are processed together, one level of
+    recursion at a time.
+
+    Args:
+        points: The (P, 3) packed points.
+        offsets: The (N + 1,) offsets of the streamlines.
+        tolerance: The maximum distance between the removed points and the
+            simplified streamlines.
+
+    Returns:
+        A (P,) array of bool that is True for the points to keep.
+
+    """
+
+    keep = np.zeros((len(points),), dtype=bool)
+    non_empty = offsets[1:] > offsets[:-1]
+    keep[offsets[:-1][non_empty]] = True
+    keep[offsets[1:][non_empty] - 1] = True
+
+    # The intervals between kept points, as inclusive indices, that still
+    # contain points to verify.
+    firsts = offsets[:-1][non_empty]
+    lasts = offsets[1:][non_empty] - 1
+
+    while True:
+
+        nb_interior = lasts - firsts - 1
+        firsts, lasts = firsts[nb_interior > 0], lasts[nb_interior > 0]
+        nb_interior = nb_interior[nb_interior > 0]
+        if len(firsts) == 0:
+            break
+
+        # Indices of the interior points of all intervals.
+        starts = np.zeros((len(firsts),), dtype=np.intp)
+        np.cumsum(nb_interior[:-1], out=starts[1:])
+        intervals = np.repeat(np.arange(len(firsts)), nb_interior)
+        indices = (np.arange(len(intervals)) - starts[intervals] +
+                   firsts[intervals] + 1)
+
+        # The distance of the interior points to the segment between the
+        # ends of their interval.
+        origins = points[firsts][intervals]
+        directions = (points[lasts] - points[firsts])[intervals]
+        relative = points[indices] - origins
+        squared_lengths = np.einsum('ij,ij->i', directions, directions)
+        t = np.einsum('ij,ij->i', relative, directions)
+        np.divide(t, squared_lengths, out=t, where=squared_lengths > 0)
+        t[squared_lengths == 0] = 0
+        np.clip(t, 0, 1, out=t)
+        relative -= t[:, None] * directions
+        distances = np.einsum('ij,ij->i', relative, relative)
+
+        # The farthest point of each interval. Squared distances are
+        # compared to the squared tolerance.
+        maximums = np.maximum.reduceat(distances, starts)
+        farthest = np.flatnonzero(distances == maximums[intervals])
+        farthest_intervals = intervals[farthest]
+        first = np.ones((len(farthest),), dtype=bool)
+        first[1:] = farthest_intervals[1:] != farthest_intervals[:-1]
+        splits = indices[farthest[first]]
+
+        split = maximums > tolerance ** 2
+        keep[splits[split]] = True
+        firsts, lasts = (
+            np.concatenate((firsts[split], splits[split])),
+            np.concatenate((splits[split], lasts[split])))
+
+    return keep
+
+
+def resample(points, offsets, nb_points, kind='linear'):
+    """Resamples all streamlines to the same number of points
+
+    The points are placed at regular intervals of the point index, as in
+    streamlines.asarray.resample. Any (P, ...) per-point values, such as
+    data per point, can be resampled in the same way as the points.
+
+    Args:
+        points: A (P, ...) array with the points of all streamlines.
+        offsets: The (N + 1,) offsets of the streamlines.
+        nb_points: The number of points of the resampled streamlines.
+        kind (optional): 'linear' interpolates all streamlines at once.
+            'cubic' gives the same result as streamlines.asarray.resample:
+            the streamlines with the same number of points are resampled
+            together with precomputed spline weights.
+
+    Returns:
+        A (N, nb_points, ...) array with the resampled streamlines.
+        Streamlines without points are resampled as all zeros.
+
+    """
+
+    if kind == 'cubic':
+        return _resample_cubic(points, offsets, nb_points)
+    elif kind != 'linear':
+        raise ValueError(
+            f"The kind of interpolation must be 'linear' or 'cubic', not "
+            f"{kind!r}.")
+
+    counts = np.diff(offsets)
+    positions = ((np.maximum(counts, 1) - 1)[:, None] *
+                 np.linspace(0, 1, nb_points)[None, :])
+
+    # The index of the point before each new point and the position
+    # between that point and the next one.
+    before = np.floor(positions).astype(np.intp)
+    before = np.minimum(before, np.maximum(counts - 2, 0)[:, None])
+    fractions = (positions - before).reshape(
+        positions.shape + (1,) * (points.ndim - 1))
+    after = before + (counts > 1)[:, None]
+
+    resampled = np.zeros((len(counts), nb_points) + points.shape[1:])
+    non_empty = counts > 0
+    starts = offsets[:-1][non_empty, None]
+    resampled[non_empty] = (
+        points[starts + before[non_empty]] * (1 - fractions[non_empty]) +
+        points[starts + after[non_empty]] * fractions[non_empty])
+
+    return resampled
+
+
+def _resample_cubic(points, offsets, nb_points):
+    """Resamples streamlines with splines, grouped by number of points"""
+
+    counts = np.diff(offsets)
+    resampled = np.zeros((len(counts), nb_points) + points.shape[1:])
+    for count in np.unique(counts[counts > 0]).tolist():
+        rows = np.flatnonzero(counts == count)
+        group = points[offsets[rows, None] + np.arange(count)]
+        resampled[rows] = np.matmul(
+            _spline_weights(count, nb_points),
+            group.reshape((len(rows), count, -1))).reshape(
+                (len(rows), nb_points) + points.shape[1:])
+
+    return resampled
+
+
+@functools.lru_cache(maxsize=1024)
+def _spline_weights(count, nb_points):
+    """The (nb_points, count) weights of the resampling of count points
+
+    Interpolation is linear in the interpolated values, so resampling a
+    streamline of count points is a product with a matrix that only depends
+    on count. The interpolation is the same as in asarray.resample.
+
+    """
+
+    if count == 1:
+        return np.ones((nb_points, 1))
+
+    # Cubic interpolation is preferred, but requires a minimum number of
+    # points.
+    kind = {2: 'slinear', 3: 'quadratic'}.get(count, 'cubic')
+    interpolate = interp1d(
+        np.linspace(0, 1, count), np.eye(count), kind, axis=0)
+    weights = interpolate(np.linspace(0, 1, nb_points))
+    weights.flags.writeable = False
+
+    return weights
+
+
+class Arena(object):
+    """Growable storage for the points of many streamlines
+
+    Points are stored in blocks whose capacity grows geometrically. Adding
+    many small streamlines therefore costs amortized constant time per point
+    and uses a few large allocations instead of one per streamline. The
+    arrays returned by allocate are views into the blocks, which never move.
+    A block is freed when no view refers to it anymore, which is why the
+    streamlines that outlive their sequence copy their points.
+
+    """
+
+    def __init__(self, capacity=4096):
+        """Growable storage for the points of many streamlines
+
+        Args:
+            capacity (optional): The number of points of the first block.
+
+        """
+
+        self.capacity = capacity
+        self._block = np.empty((0, 3))
+        self._used = 0
+
+    def allocate(self, nb_points):
+        """Returns a (nb_points, 3) view into unused storage"""
+
+        if self._used + nb_points > len(self._block):
+            size = max(2 * len(self._block), self.capacity, nb_points)
+            self._block = np.empty((size, 3))
+            self._used = 0
+
+        view = self._block[self._used:self._used + nb_points]
+        self._used += nb_points
+
+        return view
@@ -0,0 +1,147 @@
+import numpy as np
+
+from . import packed
+from .asarray import resampled_distance
+
+
+class BundleProfile(object):
+    """The centroid and along-tract profiles of a bundle
+
+    All the streamlines of the bundle are resampled to the same number of
+    points (nodes) and oriented like a template. The centroid is the mean of
+    the oriented streamlines and the profile of each data per point key,
+    e.g. FA, is the mean, standard deviation and percentiles of its values at
+    each node.
+
+    Streamlines can be added in chunks: the means and standard deviations
+    are accumulated so that only the resampled chunk is in memory. The
+    percentiles need all the resampled values, which are kept only if
+    percentiles are requested.
+
+    """
+
+    def __init__(self, nb_points=20, template=None, percentiles=(5, 50, 95),
+                 keys=None):
+        """The centroid and along-tract profiles of a bundle
+
+        Args:
+            nb_points (optional): The number of nodes of the profiles.
+            template (optional): A (N, 3) array or Streamline used to orient
+                the streamlines. The default is the first streamline added.
+            percentiles (optional): The percentiles computed at each node.
+                Can be empty to keep memory bounded for large bundles.
+            keys (optional): The data per point keys to profile. The default
+                is all the data per point of the first streamline added.
+
+        """
+
+        self.nb_points = nb_points
+        self.percentiles = tuple(percentiles)
+        self.keys = None if keys is None else list(keys)
+        self.count = 0
+
+        self._template = None
+        if template is not None:
+            self._template = self._resample(
+                [getattr(template, '_points', template)])[0]
+
+        self._centroid = np.zeros((nb_points, 3))
+        self._means = {}
+        self._m2 = {}
+        self._values = {}
+
+    def add(self, streamlines):
+        """Adds streamlines to the profiles
+
+        Args:
+            streamlines: An iterable of Streamline instances.
+
+        Returns:
+            A (N,) array of bool that is True for the streamlines that were
+            reversed to follow the template.
+
+        """
+
+        streamlines = list(streamlines)
+        if len(streamlines) == 0:
+            return np.zeros((0,), dtype=bool)
+
+        if self.keys is None:
+            self.keys = [k for k, v in streamlines[0].data.items()
+                         if np.ndim(v) == 2]
+
+        points, offsets = packed.pack([s._points for s in streamlines])
+        resampled = packed.resample(points, offsets, self.nb_points)
+        if self._template is None:
+            self._template = resampled[0].copy()
+
+        # Orient all streamlines at once, like Streamline.reorient.
+        flipped = (resampled_distance(resampled, self._template) >
+                   resampled_distance(resampled[:, ::-1], self._template))
+        resampled[flipped] = resampled[flipped, ::-1]
+
+        count = self.count + len(streamlines)
+        self._centroid += (resampled.sum(0) - len(streamlines) *
+                           self._centroid) / count
+
+        for key in self.keys:
+
+            # The data per point has a (K, N) shape, nodes are resampled like
+            # the points and oriented to give a (N, K, nb_points) tensor.
+            values = np.concatenate([s.data[key].T for s in streamlines])
+            nodes = packed.resample(values, offsets, self.nb_points)
+            nodes[flipped] = nodes[flipped, ::-1]
+            nodes = nodes.transpose((0, 2, 1))
+
+            self._accumulate(key, nodes)
+            if len(self.percentiles) > 0:
+                self._values.setdefault(key, []).append(nodes)
+
+        self.count = count
+
+        return flipped
+
+    @property
+    def centroid(self):
+        """The (nb_points, 3) mean of the oriented streamlines"""
+        return self._centroid.copy()
+
+    def mean(self, key):
+        """The (K, nb_points) mean of the data key at each node"""
+        return self._means[key].copy()
+
+    def std(self, key):
+        """The (K, nb_points) standard deviation of the data key"""
+        return np.sqrt(self._m2[key] / max(self.count, 1))
+
+    def percentile(self, key):
+        """The (len(percentiles), K, nb_points) percentiles of the data key"""
+
+        if len(self.percentiles) == 0:
+            raise ValueError('No percentiles were requested.')
+
+        values = np.concatenate(self._values[key])
+        return np.percentile(values, self.percentiles, axis=0)
+
+    def _accumulate(self, key, nodes):
+        """Merges the mean and squared deviations of a chunk of values"""
+
+        # Chan et al. pairwise update of the mean and of the sum of squared
+        # deviations, which is stable for large bundles.
+        count = len(nodes)
+        mean = nodes.mean(0)
+        m2 = np.sum((nodes - mean) ** 2, 0)
+
+        if key not in self._means:
+            self._means[key], self._m2[key] = mean, m2
+            return
+
+        total = self.count + count
+        delta = mean - self._means[key]
+        self._means[key] = self._means[key] + delta * count / total
+        self._m2[key] = (self._m2[key] + m2 +
+                         delta ** 2 * self.count * count / total)
+
+    def _resample(self, arrays):
+        """Resamples (N, 3) arrays to the number of nodes"""
+        return packed.resample(*packed.pack(arrays), self.nb_points)
@@ -0,0 +1,226 @@
+import contextlib
+import functools
+import json
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+# The profiles that are currently collecting records. When it is empty,
+# instrumented functions are called directly and no measurement is made.
+_profiles = []
+
+
+class Profile(object):
+    """A collection of timing records
+
+    A Profile is returned by the profiling context manager and collects a
+    record every time an instrumented operation completes.
+
+    """
+
+    def __init__(self):
+        self.records = []
+
+    def summary(self):
+        """Aggregates the records by operation name
+
+        Returns:
+            A dict that maps each operation name to its number of calls, total
+            wall time, number of streamlines and points processed, throughput
+            (in points per second) and the maximum peak RSS.
+
+        """
+
+        summary = {}
+        for record in self.records:
+            entry = summary.setdefault(record['name'], {
+                'calls': 0,
+                'wall_time': 0.0,
+                'nb_streamlines': 0,
+                'nb_points': 0,
+                'peak_rss': None})
+            entry['calls'] += 1
+            entry['wall_time'] += record['wall_time']
+            entry['nb_streamlines'] += record['nb_streamlines'] or 0
+            entry['nb_points'] += record['nb_points'] or 0
+            if record['peak_rss'] is not None:
+                entry['peak_rss'] = max(
+                    entry['peak_rss'] or 0, record['peak_rss'])
+
+        for entry in summary.values():
+            entry['throughput'] = _throughput(
+                entry['nb_points'], entry['wall_time'])
+
+        return summary
+
+    def to_dict(self):
+        return {'records': self.records, 'summary': self.summary()}
+
+    def dump(self, filename):
+        """Writes the profile to a JSON file
+
+        Args:
+            filename: The name of the output file. If it is '-', the profile
+                is written to the standard output.
+
+        """
+
+        if filename == '-':
+            json.dump(self.to_dict(), sys.stdout, indent=2)
+            sys.stdout.write('\n')
+        else:
+            with open(filename, 'w') as f:
+                json.dump(self.to_dict(), f, indent=2)
+
+
+@contextlib.contextmanager
+def profiling():
+    """Collects timing records of instrumented operations
+
+    Every instrumented operation (load, save, filter, reorient, resample,
+    smooth and transform) that completes inside the context adds a record to
+    the returned profile.
+
+    Examples:
+        >>> import streamlines as sl
+
+        >>> with sl.profiling.profiling() as profile:
+        ...     streamlines = sl.io.load('test.trk')
+        ...     streamlines.smooth()
+        >>> profile.summary()['smooth']['wall_time']
+
+    """
+
+    profile = Profile()
+    _profiles.append(profile)
+    try:
+        yield profile
+    finally:
+        _profiles.remove(profile)
+
+
+def is_active():
+    """Returns True if a profile is currently collecting records"""
+    return len(_profiles) > 0
+
+
+@contextlib.contextmanager
+def timer(name, streamlines=None):
+    """Times a block of code
+
+    Args:
+        name: The name of the record.
+        streamlines (optional): The streamlines processed by the block. They
+            are used to count the number of streamlines and points.
+
+    """
+
+    if not _profiles:
+        yield
+        return
+
+    start = time.perf_counter()
+    yield
+    _add_record(name, time.perf_counter() - start, streamlines)
+
+
+def timed(name):
+    """Decorator that times a function when profiling is active
+
+    The streamlines processed by the function are counted to compute the
+    throughput. If the first argument is a Streamlines instance (e.g. for
+    methods or save), it is counted before the call. Otherwise, the returned
+    value is counted (e.g. for load).
+
+    Args:
+        name: The name of the record.
+
+    """
+
+    def decorator(function):
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+
+            # When profiling is off, the only overhead is this check.
+            if not _profiles:
+                return function(*args, **kwargs)
+
+            counts = None
+            if len(args) > 0:
+                counts = _count(args[0])
+
+            start = time.perf_counter()
+            result = function(*args, **kwargs)
+            wall_time = time.perf_counter() - start
+
+            if counts is None:
+                counts = _count(result)
+
+            _add_record(name, wall_time, counts=counts)
+
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def _add_record(name, wall_time, streamlines=None, counts=None):
+    """Adds a record to all active profiles"""
+
+    if counts is None:
+        counts = _count(streamlines)
+
+    nb_streamlines, nb_points = counts or (None, None)
+
+    record = {
+        'name': name,
+        'wall_time': wall_time,
+        'nb_streamlines': nb_streamlines,
+        'nb_points': nb_points,
+        'throughput': _throughput(nb_points, wall_time),
+        'peak_rss': _peak_rss()}
+
+    for profile in _profiles:
+        profile.records.append(record)
+
+
+def _count(streamlines):
+    """Counts the streamlines and points of a Streamlines instance"""
+
+    # Imported here because the streamlines package imports this module.
+    from streamlines import Streamlines
+
+    if not isinstance(streamlines, Streamlines):
+        return None
+
+    return len(streamlines), sum(len(s) for s in streamlines)
+
+
+def _peak_rss():
+    """Returns the peak resident set size of the process in bytes"""
+
+    if resource is None:
+        return None
+
+    # The maximum RSS is in kilobytes on Linux but in bytes on macOS.
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != 'darwin':
+        peak_rss *= 1024
+
+    return peak_rss
+
+
+def _throughput(nb_points, wall_time):
+    """Returns the number of points processed per second"""
+
+    if not nb_points or wall_time <= 0:
+        return None
+
+    return nb_points / wall_time
@@ -0,0 +1,247 @@
+import numpy as np
+from scipy.spatial.distance import cdist
+
+from . import packed
+from .asarray import mdf
+
+
+class CentroidIndex(object):
+    """A nearest neighbor index of bundle centroids
+
+    The index answers nearest neighbor and radius queries between streamlines
+    and the centroids of atlas bundles. Distances are orientation invariant
+    minimum average direct-flip (MDF) distances between streamlines resampled
+    to the same number of points with the cubic interpolation of
+    Streamline.resample (see streamlines.asarray.mdf).
+
+    Queries are pruned with a lower bound of the MDF distance: the distance
+    between the mean points of two streamlines is never larger than their MDF
+    distance. Exact distances are only computed for the pairs whose lower
+    bound can improve the result.
+
+    """
+
+    def __init__(self, centroids, labels, nb_points=20, block_size=100000):
+        """A nearest neighbor index of bundle centroids
+
+        Args:
+            centroids: An iterable of (N, 3) arrays or Streamline instances,
+                the centroids of the bundles.
+            labels: The name of the bundle of each centroid. A bundle can have
+                several centroids.
+            nb_points (optional): The number of points used to resample the
+                streamlines.
+            block_size (optional): The number of streamlines queried at once,
+                which bounds the memory used by queries.
+
+        """
+
+        arrays = [np.asarray(getattr(c, '_points', c), dtype=float)
+                  for c in centroids]
+        self.labels = list(labels)
+        if len(self.labels) != len(arrays):
+            raise ValueError(
+                f'There must be one label per centroid ({len(self.labels)} '
+                f'!= {len(arrays)}).')
+
+        self.bundles = sorted(set(self.labels))
+        self.nb_points = nb_points
+        self.block_size = block_size
+
+        self._centroids = packed.resample(
+            *packed.pack(arrays), nb_points, 'cubic')
+        self._means = self._centroids.mean(1)
+        self._bundle_ids = np.array(
+            [self.bundles.index(l) for l in self.labels], dtype=np.intp)
+
+    @classmethod
+    def from_bundles(cls, bundles, **kwargs):
+        """Creates an index from a dict of bundle names to centroids
+
+        Args:
+            bundles: A dict whose keys are bundle names and whose values are
+                iterables of centroids, e.g. streamlines.Streamlines.
+            **kwargs: The other arguments of CentroidIndex.
+
+        """
+
+        centroids, labels = [], []
+        for name, bundle in bundles.items():
+            for centroid in bundle:
+                centroids.append(centroid)
+                labels.append(name)
+
+        return cls(centroids, labels, **kwargs)
+
+    def __len__(self):
+        return len(self._centroids)
+
+    def query(self, streamlines, k=1):
+        """Finds the nearest centroids of streamlines
+
+        Args:
+            streamlines: An iterable of (N, 3) arrays or Streamline instances.
+            k (optional): The number of neighbors to find.
+
+        Returns:
+            distances: A (N, k) array with the distance to the k nearest
+                centroids, in increasing order.
+            indices: A (N, k) array of int with the index of the k nearest
+                centroids.
+
+        """
+
+        k = min(k, len(self))
+        distances, indices = [], []
+        for block in self._blocks(streamlines):
+            block_distances, block_indices = nearest(
+                block, self._centroids, k, self._means)
+            distances.append(block_distances)
+            indices.append(block_indices)
+
+        if len(distances) == 0:
+            return np.zeros((0, k)), np.zeros((0, k), dtype=np.intp)
+
+        return np.concatenate(distances), np.concatenate(indices)
+
+    def query_radius(self, streamlines, radius):
+        """Finds the centroids within a distance of streamlines
+
+        Args:
+            streamlines: An iterable of (N, 3) arrays or Streamline instances.
+            radius: The maximum distance to the centroids.
+
+        Returns:
+            streamline_ids: A (M,) array of int with the index of the
+                streamline of each match, in increasing order.
+            centroid_ids: A (M,) array of int with the index of the centroid
+                of each match.
+            distances: A (M,) array with the distance of each match.
+
+        """
+
+        streamline_ids, centroid_ids, distances = [], [], []
+        first = 0
+        for block in self._blocks(streamlines):
+
+            rows, columns = np.nonzero(
+                cdist(block.mean(1), self._means) <= radius)
+            block_distances = mdf(block[rows], self._centroids[columns])
+            close = block_distances <= radius
+
+            streamline_ids.append(rows[close] + first)
+            centroid_ids.append(columns[close])
+            distances.append(block_distances[close])
+            first += len(block)
+
+        if len(distances) == 0:
+            empty = np.zeros((0,), dtype=np.intp)
+            return empty, empty, np.zeros((0,))
+
+        return (np.concatenate(streamline_ids), np.concatenate(centroid_ids),
+                np.concatenate(distances))
+
+    def recognize(self, streamlines, threshold):
+        """Assigns streamlines to the bundle of their nearest centroid
+
+        Args:
+            streamlines: An iterable of (N, 3) arrays or Streamline instances.
+            threshold: The maximum distance between a streamline and the
+                nearest centroid of its bundle.
+
+        Returns:
+            A (N,) array of int with the index of the bundle of each
+            streamline in the bundles attribute, or -1 if no centroid is
+            within the threshold.
+
+        """
+
+        distances, indices = self.query(streamlines, k=1)
+        if len(self) == 0:
+            return np.full(len(indices), -1, dtype=np.intp)
+
+        bundle_ids = self._bundle_ids[indices[:, 0]]
+        bundle_ids[distances[:, 0] > threshold] = -1
+
+        return bundle_ids
+
+    def _blocks(self, streamlines):
+        """Resamples the streamlines one block at a time"""
+
+        streamlines = list(streamlines)
+        for start in range(0, len(streamlines), self.block_size):
+            block = streamlines[start:start + self.block_size]
+            arrays = [getattr(s, '_points', s) for s in block]
+            yield packed.resample(
+                *packed.pack(arrays), self.nb_points, 'cubic')
+
+
+def nearest(resampled, targets, k=1, target_means=None, max_pairs=10000000):
+    """Finds the nearest target of resampled streamlines
+
+    The distance is the MDF distance (see streamlines.asarray.mdf). Targets
+    are visited by increasing lower bound of the distance, the distance
+    between mean points, and exact distances are only computed while the
+    lower bound can improve the k nearest distances.
+
+    Args:
+        resampled: A (N, nb_points, 3) array of resampled streamlines.
+        targets: A (M, nb_points, 3) array of resampled streamlines.
+        k (optional): The number of neighbors to find.
+        target_means (optional): The (M, 3) mean points of the targets, if
+            they are already computed.
+        max_pairs (optional): The maximum number of lower bounds computed at
+            once, which bounds memory.
+
+    Returns:
+        distances: A (N, k) array with the distance to the k nearest targets
+            in increasing order, inf if there are fewer than k targets.
+        indices: A (N, k) array of int with the index of the k nearest
+            targets, -1 if there are fewer than k targets.
+
+    """
+
+    if target_means is None:
+        target_means = targets.mean(1)
+
+    distances = np.full((len(resampled), k), np.inf)
+    indices = np.full((len(resampled), k), -1, dtype=np.intp)
+    if len(targets) == 0:
+        return distances, indices
+
+    block_size = max(1, max_pairs // len(targets))
+    for start in range(0, len(resampled), block_size):
+        block = slice(start, start + block_size)
+        _nearest(resampled[block], targets, target_means,
+                 distances[block], indices[block])
+
+    return distances, indices
+
+
+def _nearest(resampled, targets, target_means, distances, indices):
+    """Updates the k nearest targets of a block of streamlines in place"""
+
+    nb_streamlines, k = distances.shape
+    lower_bounds = cdist(resampled.mean(1), target_means)
+    order = np.argsort(lower_bounds, axis=1)
+
+    # Visit the targets of each streamline by increasing lower bound and
+    # stop once no lower bound can improve the k nearest distances.
+    for rank in range(len(targets)):
+
+        candidates = order[:, rank]
+        bounds = lower_bounds[np.arange(nb_streamlines), candidates]
+        rows = np.flatnonzero(bounds < distances[:, -1])
+        if len(rows) == 0:
+            break
+
+        new_distances = mdf(resampled[rows], targets[candidates[rows]])
+
+        # Merge the new distances with the current k nearest.
+        merged_distances = np.concatenate(
+            (distances[rows], new_distances[:, None]), axis=1)
+        merged_indices = np.concatenate(
+            (indices[rows], candidates[rows, None]), axis=1)
+        best = np.argsort(merged_distances, axis=1, kind='stable')[:, :k]
+        distances[rows] = np.take_along_axis(merged_distances, best, 1)
+        indices[rows] = np.take_along_axis(merged_indices, best, 1)
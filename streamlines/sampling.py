@@ -0,0 +1,114 @@
+import numpy as np
+
+import streamlines as sl
+from . import packed
+
+
+def subsample(chunks, count=None, fraction=None, length_bins=None,
+              seed=None):
+    """Draws a uniformly random subset of streamlines in a single pass
+
+    The streamlines are read one chunk at a time, so memory only scales with
+    the size of the sample and of a chunk: the sampled streamlines are
+    copied out of the buffers of their chunk. Each streamline is given a random
+    key and the sample is formed by the streamlines with the smallest keys:
+    with a count, this is reservoir sampling and with a fraction, each
+    streamline is kept with a probability of fraction. Keys are drawn in file
+    order so the sample only depends on the seed, not on the chunk size.
+
+    Args:
+        chunks: An iterable of streamlines.Streamlines instances, for example
+            the output of streamlines.io.load_chunks.
+        count (optional): The number of streamlines to sample. With
+            length_bins, the number of streamlines to sample in each bin.
+        fraction (optional): The fraction of the streamlines to sample.
+            Exactly one of count and fraction must be provided.
+        length_bins (optional): The increasing edges of the length bins used
+            to stratify the sample. Streamlines outside the bins are never
+            sampled.
+        seed (optional): The seed of the random number generator.
+
+    Returns:
+        A streamlines.Streamlines instance with the sampled streamlines in
+        their original order.
+
+    Examples:
+        >>> import streamlines as sl
+        >>> from streamlines.sampling import subsample
+
+        >>> chunks = sl.io.load_chunks('test.trk', 10000)
+        >>> sample = subsample(chunks, fraction=0.01, seed=0)
+
+    """
+
+    if (count is None) == (fraction is None):
+        raise ValueError('Exactly one of count and fraction must be given.')
+
+    rng = np.random.default_rng(seed)
+    nb_bins = 1 if length_bins is None else len(length_bins) - 1
+
+    # The sample of each bin: the keys, the positions in the file and the
+    # streamlines themselves.
+    keys = [np.zeros((0,)) for _ in range(nb_bins)]
+    positions = [np.zeros((0,), dtype=np.intp) for _ in range(nb_bins)]
+    samples = [[] for _ in range(nb_bins)]
+
+    # Only the coordinate system of the first chunk is kept, keeping the
+    # chunk itself would keep its buffers alive.
+    space = None
+    position = 0
+    for chunk in chunks:
+
+        if space is None:
+            space = chunk.coordinate_system, chunk.transforms
+
+        chunk_keys = rng.random(len(chunk))
+        chunk_positions = np.arange(position, position + len(chunk))
+        position += len(chunk)
+
+        if length_bins is None:
+            bins = np.zeros((len(chunk),), dtype=np.intp)
+        else:
+            lengths = packed.lengths(*packed.pack([s._points for s in chunk]))
+            bins = np.digitize(lengths, length_bins) - 1
+            bins[lengths == length_bins[-1]] = nb_bins - 1
+
+        for i in range(nb_bins):
+            in_bin = np.flatnonzero(bins == i)
+            if fraction is not None:
+                in_bin = in_bin[chunk_keys[in_bin] < fraction]
+
+            # Keep the candidates with the smallest keys.
+            candidates = np.concatenate((keys[i], chunk_keys[in_bin]))
+            selected = np.arange(len(candidates))
+            if count is not None and len(candidates) > count:
+                selected = np.sort(np.argpartition(candidates, count)[:count])
+
+            # The new streamlines of the sample are views into the buffers
+            # of the chunk and are copied.
+            nb_sampled = len(samples[i])
+            items = samples[i] + [chunk[j] for j in in_bin]
+            keys[i] = candidates[selected]
+            positions[i] = np.concatenate(
+                (positions[i], chunk_positions[in_bin]))[selected]
+            samples[i] = [items[j] if j < nb_sampled else _copy(items[j])
+                          for j in selected]
+
+    if space is None:
+        return sl.Streamlines()
+
+    # Put the streamlines of all bins back in file order.
+    all_positions = np.concatenate(positions)
+    all_samples = [s for sample in samples for s in sample]
+    streamlines = sl.Streamlines(None, *space)
+    for i in np.argsort(all_positions, kind='stable'):
+        streamlines.append(all_samples[i])
+
+    return streamlines
+
+
+def _copy(streamline):
+    """Copies the points and data of a streamline"""
+    data = {key: value.copy() if isinstance(value, np.ndarray) else value
+            for key, value in streamline.data.items()}
+    return sl.Streamline(streamline._points, data)
@@ -0,0 +1,269 @@
+"""Contiguous buffers of streamlines for pickling and shared memory
+
+A streamlines.Streamlines instance is converted to a handful of contiguous
+arrays: the packed points and offsets (see streamlines.packed), one column
+per data key and the coordinate system information. Pickling these arrays is
+much faster than pickling every streamline and, with pickle protocol 5, the
+arrays can be transferred out-of-band without copies. The same arrays can
+also be placed in a block of shared memory that other processes attach to by
+name.
+
+The streamlines rebuilt from buffers are views into the buffers. The ones
+that outlive the rebuilt streamlines.Streamlines instance copy their points
+and data, so the buffers are freed with the instance.
+
+"""
+
+import threading
+import types
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import streamlines as sl
+from . import packed
+
+
+def to_buffers(streamlines):
+    """Converts streamlines to contiguous buffers
+
+    Data per point is stored as a (P, K) column aligned with the points and
+    data per streamline as a (N, ...) column. If the streamlines do not all
+    have the same data keys and shapes, their data is stored as a list of
+    dicts instead of columns.
+
+    Args:
+        streamlines (streamlines.Streamlines): The streamlines to convert.
+
+    Returns:
+        arrays: A dict of contiguous arrays with the keys 'points',
+            'offsets', 'point/<key>' and 'streamline/<key>'.
+        data: The list of the data dicts of the streamlines when the data
+            cannot be stored in columns, otherwise None.
+
+    """
+
+    items = streamlines._items
+    points, offsets = packed.pack([s._points for s in items])
+    arrays = {'points': np.ascontiguousarray(points, dtype=float),
+              'offsets': offsets}
+
+    columns = _columns(items)
+    if columns is None:
+        return arrays, [dict(s.data) for s in items]
+
+    arrays.update(columns)
+    return arrays, None
+
+
+def from_buffers(coordinate_system, transforms, arrays, data=None):
+    """Rebuilds streamlines from contiguous buffers
+
+    The points and data of the streamlines are views into the arrays.
+
+    Args:
+        coordinate_system: The coordinate system of the streamlines.
+        transforms: The transforms of the streamlines.
+        arrays: The dict of arrays returned by to_buffers.
+        data (optional): The list of data dicts returned by to_buffers.
+
+    Returns:
+        A streamlines.Streamlines instance.
+
+    """
+
+    streamlines = sl.Streamlines(None, coordinate_system, transforms)
+
+    offsets = arrays['offsets']
+    all_points = packed.unpack(arrays['points'], offsets)
+    for points in all_points:
+        streamline = sl.Streamline()
+        streamline._points = points
+        streamlines.append(streamline)
+
+    if data is not None:
+        for streamline, streamline_data in zip(streamlines, data):
+            streamline._data = streamline_data
+        return streamlines
+
+    for name, column in arrays.items():
+        kind, _, key = name.partition('/')
+        if kind == 'point':
+            for streamline, start, end in zip(
+                    streamlines, offsets[:-1], offsets[1:]):
+                streamline.data[key] = column[start:end].T
+        elif kind == 'streamline':
+            for streamline, value in zip(streamlines, column):
+                streamline.data[key] = value
+
+    return streamlines
+
+
+def _columns(items):
+    """Stacks the data of streamlines in columns if they are consistent"""
+
+    if len(items) == 0:
+        return {}
+
+    first = items[0].data
+    columns = {}
+    for key, value in first.items():
+
+        values = [s.data.get(key) for s in items]
+        if any(v is None for v in values):
+            return None
+
+        if np.ndim(value) == 2:
+            if any(np.ndim(v) != 2 or len(v) != len(value) for v in values):
+                return None
+            columns[f'point/{key}'] = np.ascontiguousarray(
+                np.concatenate([v.T for v in values]).reshape(
+                    (-1, len(value))))
+        else:
+            shape = np.shape(value)
+            if any(np.shape(v) != shape for v in values):
+                return None
+            columns[f'streamline/{key}'] = np.stack(values)
+
+    if any(len(s.data) != len(first) for s in items):
+        return None
+
+    return columns
+
+
+class SharedStreamlines(object):
+    """Streamlines stored in a block of shared memory
+
+    The buffers of the streamlines (see to_buffers) are copied once into a
+    block of shared memory. Instances are cheap to pickle: only the name of
+    the block and the layout of the buffers are sent to other processes,
+    which attach to the same memory to rebuild the streamlines without
+    copies.
+
+    The process that creates the block must keep it alive while it is used
+    and unlink it afterwards, e.g. by using the instance as a context
+    manager. The other processes only close their access to the block when
+    they are done, which the context manager also does: only the creator
+    unlinks the block, and the others do not register it with their
+    resource tracker, which would unlink it when they exit.
+
+    """
+
+    def __init__(self, streamlines, name=None):
+        """Streamlines stored in a block of shared memory
+
+        Args:
+            streamlines (streamlines.Streamlines): The streamlines to share.
+                Their data must be storable in columns.
+            name (optional): The name of the shared memory block. The default
+                is a unique name.
+
+        """
+
+        arrays, data = to_buffers(streamlines)
+        if data is not None:
+            raise ValueError(
+                'The streamlines must all have the same data keys and '
+                'shapes to be shared.')
+
+        self.coordinate_system = streamlines.coordinate_system
+        self.transforms = streamlines.transforms
+
+        # Align every array on 64 bytes in the block.
+        self.layout = []
+        size = 0
+        for key, array in arrays.items():
+            self.layout.append((key, array.dtype.str, array.shape, size))
+            size += -(-array.nbytes // 64) * 64
+
+        self._shared_memory = shared_memory.SharedMemory(
+            name, create=True, size=max(size, 1))
+        self._creator = True
+        for key, array in arrays.items():
+            self._view(key)[...] = array
+
+    @property
+    def name(self):
+        """The name of the shared memory block"""
+        return self._shared_memory.name
+
+    def attach(self):
+        """Returns the streamlines as views into the shared memory
+
+        The block stays open as long as the returned streamlines exist. The
+        streamlines kept after the returned instance is dropped are copied
+        out of the block.
+
+        """
+
+        arrays = {key: self._view(key) for key, *_ in self.layout}
+        streamlines = from_buffers(
+            self.coordinate_system, self.transforms, arrays)
+        streamlines._shared_memory = self._shared_memory
+
+        return streamlines
+
+    def close(self):
+        """Closes access to the shared memory from this process"""
+        self._shared_memory.close()
+
+    def unlink(self):
+        """Destroys the shared memory block"""
+        self._shared_memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+        if self._creator:
+            self.unlink()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_shared_memory'] = self._shared_memory.name
+        state['_creator'] = False
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._shared_memory = _attach(state['_shared_memory'])
+
+    def _view(self, key):
+        """Returns an array of the layout as a view into the block"""
+        _, dtype, shape, offset = next(l for l in self.layout if l[0] == key)
+        return np.ndarray(shape, dtype, self._shared_memory.buf, offset)
+
+
+# Attaching to blocks temporarily replaces the resource tracker of the
+# shared_memory module, see _attach.
+_attach_lock = threading.Lock()
+_untracked = types.SimpleNamespace(
+    register=lambda name, rtype: None,
+    unregister=lambda name, rtype: None)
+
+
+def _attach(name):
+    """Attaches to an existing block of shared memory without tracking it
+
+    Before Python 3.13, attaching to a block registers it with the resource
+    tracker of the process. A tracker that is not the one of the creator
+    (e.g. in processes started before the block was created) unlinks the
+    block when the process exits and warns about a leak. Unregistering the
+    block instead would also unregister it from a tracker shared with the
+    creator, so the block is never registered.
+
+    """
+
+    try:
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:
+        pass
+
+    with _attach_lock:
+        resource_tracker = shared_memory.resource_tracker
+        shared_memory.resource_tracker = _untracked
+        try:
+            return shared_memory.SharedMemory(name)
+        finally:
+            shared_memory.resource_tracker = resource_tracker
@@ -0,0 +1,281 @@
+"""Map-reduce execution over shards of a tractogram
+
+A tractogram is split into shards, i.e. files with consecutive ranges of its
+streamlines, so that an operation can be run on each shard by a different
+process or node. The outputs of the shards are then concatenated in order
+into a single file. Shards keep the coordinate system and transforms of the
+original file.
+
+The shards of a tractogram are named after their index and the number of
+shards (see shard_filenames), so processes on different nodes that share a
+file system can process a subset of the shards of the same directory and a
+final step can reduce them.
+
+"""
+
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import streamlines as sl
+from streamlines.io import load
+from streamlines.io import load_chunks
+from streamlines.io import save
+from streamlines.io import save_chunks
+
+
+balance_modes = ('streamlines', 'points')
+
+
+def shard_filenames(directory, nb_shards, suffix='', extension='trk'):
+    """Returns the file names of the shards of a tractogram
+
+    Args:
+        directory: The directory of the shards.
+        nb_shards: The number of shards.
+        suffix (optional): Appended to the name of the shards, e.g. to name
+            the outputs of an operation on the shards.
+        extension (optional): The extension of the files.
+
+    """
+    return [os.path.join(
+                directory,
+                f'shard-{i:05d}-of-{nb_shards:05d}{suffix}.{extension}')
+            for i in range(nb_shards)]
+
+
+def shard(filename, directory, nb_shards, balance='streamlines',
+          chunk_size=100000):
+    """Splits a tractogram into balanced shards
+
+    The file is read twice: once to measure the size of the streamlines and
+    once to write the shards, one chunk at a time.
+
+    Args:
+        filename: The file that contains the streamlines to split.
+        directory: The directory where the shards are saved. It is created
+            if it does not exist.
+        nb_shards: The number of shards.
+        balance (optional): 'streamlines' to give each shard the same number
+            of streamlines or 'points' to give each shard the same number of
+            points.
+        chunk_size (optional): The number of streamlines read at once.
+
+    Returns:
+        The file names of the shards, in order.
+
+    """
+
+    if balance not in balance_modes:
+        raise ValueError(
+            f'The balance must be one of {balance_modes}, not {balance}.')
+    if nb_shards < 1:
+        raise ValueError(
+            f'The number of shards must be positive, not {nb_shards}.')
+
+    weights = []
+    for chunk in load_chunks(filename, chunk_size):
+        if balance == 'points':
+            weights.extend(len(s) for s in chunk)
+        else:
+            weights.extend([1] * len(chunk))
+
+    # The streamlines before each stop have the weight closest to the share
+    # of the total weight of the shards up to that stop.
+    bounds = np.zeros((len(weights) + 1,))
+    np.cumsum(weights, out=bounds[1:])
+    targets = bounds[-1] * np.arange(1, nb_shards + 1) / nb_shards
+    stops = np.clip(np.searchsorted(bounds, targets), 1, len(bounds) - 1)
+    closer = targets - bounds[stops - 1] < bounds[stops] - targets
+    stops[closer] -= 1
+    stops[-1] = len(weights)
+
+    os.makedirs(directory, exist_ok=True)
+    extension = os.path.basename(filename).split('.', 1)[-1]
+    filenames = shard_filenames(directory, nb_shards, extension=extension)
+
+    chunks = _Splitter(load_chunks(filename, chunk_size))
+    for shard_filename, stop in zip(filenames, stops):
+        save_chunks(chunks.until(stop), shard_filename)
+
+    return filenames
+
+
+def map_shards(function, input_filenames, output_filenames, processes=None,
+               **kwargs):
+    """Runs an operation on shards with a local process pool
+
+    Args:
+        function: A picklable function called as function(input_filename,
+            output_filename, **kwargs) for each shard, for example a command
+            of streamlines.cli.commands or an Operation.
+        input_filenames: The file names of the input shards.
+        output_filenames: The file names of the output shards.
+        processes (optional): The number of processes. The default is the
+            number of CPUs. With 1, the shards are processed in the current
+            process.
+        **kwargs: The other arguments of function.
+
+    Returns:
+        The file names of the output shards.
+
+    """
+
+    if len(input_filenames) != len(output_filenames):
+        raise ValueError(
+            f'There must be one output per shard ({len(output_filenames)} '
+            f'!= {len(input_filenames)}).')
+
+    if processes == 1:
+        for input_filename, output_filename in zip(
+                input_filenames, output_filenames):
+            function(input_filename, output_filename, **kwargs)
+        return list(output_filenames)
+
+    with ProcessPoolExecutor(processes) as executor:
+        futures = [
+            executor.submit(function, i, o, **kwargs)
+            for i, o in zip(input_filenames, output_filenames)]
+
+        # Raise the errors of the workers.
+        for future in futures:
+            future.result()
+
+    return list(output_filenames)
+
+
+def reduce_shards(filenames, output_filename, chunk_size=100000):
+    """Concatenates shards, in order, into a single file
+
+    Args:
+        filenames: The file names of the shards.
+        output_filename: The file where all the streamlines are saved.
+        chunk_size (optional): The number of streamlines read at once.
+
+    """
+
+    save_chunks(
+        (chunk for f in filenames for chunk in load_chunks(f, chunk_size)),
+        output_filename)
+
+
+def map_reduce(function, input_filename, output_filename, nb_shards=None,
+               processes=None, directory=None, balance='streamlines',
+               chunk_size=100000, **kwargs):
+    """Runs an operation on a tractogram split into shards
+
+    The tractogram is split into shards, the operation is run on each shard
+    in a process pool and the outputs are concatenated in order.
+
+    Args:
+        function: A picklable function called as function(input_filename,
+            output_filename, **kwargs) for each shard. See map_shards.
+        input_filename: The file that contains the streamlines.
+        output_filename: The file where the output is saved.
+        nb_shards (optional): The number of shards. The default is the
+            number of CPUs.
+        processes (optional): The number of processes. See map_shards.
+        directory (optional): The directory where the temporary directory
+            of the shards is created, e.g. on a shared file system. The
+            default is the system temporary directory.
+        balance (optional): How the shards are balanced. See shard.
+        chunk_size (optional): The number of streamlines read at once.
+        **kwargs: The other arguments of function.
+
+    Examples:
+        >>> from streamlines.cli.commands.smooth import smooth
+        >>> from streamlines.sharding import Operation, map_reduce
+
+        >>> map_reduce(smooth, 'test.trk', 'smoothed.trk', 8)
+        >>> map_reduce(Operation('filter', min_length=50), 'test.trk',
+        ...            'filtered.trk', 8)
+
+    """
+
+    nb_shards = nb_shards or os.cpu_count() or 1
+
+    with tempfile.TemporaryDirectory(dir=directory) as work_directory:
+
+        inputs = shard(
+            input_filename, work_directory, nb_shards, balance, chunk_size)
+        extension = os.path.basename(output_filename).split('.', 1)[-1]
+        outputs = shard_filenames(
+            work_directory, nb_shards, '-output', extension)
+
+        map_shards(function, inputs, outputs, processes, **kwargs)
+        reduce_shards(outputs, output_filename, chunk_size)
+
+
+class Operation(object):
+    """A Streamlines method applied to files
+
+    Operation instances are picklable functions of an input and an output
+    file that can be used with map_shards and map_reduce.
+
+    """
+
+    def __init__(self, name, *args, **kwargs):
+        """A Streamlines method applied to files
+
+        Args:
+            name: The name of the method of streamlines.Streamlines, e.g.
+                'smooth' or 'filter'.
+            *args: The positional arguments of the method.
+            **kwargs: The keyword arguments of the method.
+
+        """
+
+        if not callable(getattr(sl.Streamlines, name, None)):
+            raise ValueError(f'Streamlines has no method named {name}.')
+
+        self.name = name
+        self.args = args
+        self.kwargs = kwargs
+
+    def __call__(self, input_filename, output_filename):
+        streamlines = load(input_filename)
+        getattr(streamlines, self.name)(*self.args, **self.kwargs)
+        save(streamlines, output_filename)
+
+
+class _Splitter(object):
+    """Splits a sequence of chunks at given streamline indices"""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._pending = []
+        self._position = 0
+        self._header = None
+
+    def until(self, stop):
+        """Yields the chunks of the streamlines up to index stop"""
+
+        # A shard always has at least one, possibly empty, chunk so it keeps
+        # the header of the file.
+        yielded = False
+        while self._position < stop:
+
+            if len(self._pending) == 0:
+                chunk = next(self._chunks, None)
+                if chunk is None:
+                    break
+                self._header = (chunk.coordinate_system, chunk.transforms)
+                self._pending = chunk[:]
+
+            count = min(len(self._pending), stop - self._position)
+            yield self._new_chunk(self._pending[:count])
+            yielded = True
+            self._pending = self._pending[count:]
+            self._position += count
+
+        if not yielded and self._header is not None:
+            yield self._new_chunk([])
+
+    def _new_chunk(self, items):
+        """Creates a chunk with the header of the file"""
+        chunk = sl.Streamlines(None, *self._header)
+        for streamline in items:
+            chunk.append(streamline)
+        return chunk
@@ -0,0 +1,190 @@
+import numpy as np
+from nicoord import CoordinateSystem
+from nicoord import CoordinateSystemSpace
+from nicoord import CoordinateSystemAxes
+from nicoord import VoxelSpace
+from nicoord import coord
+
+
+# The native RAS coordinate system, i.e. the space of images affines.
+_ras_mm = CoordinateSystem(
+    CoordinateSystemSpace.NATIVE, CoordinateSystemAxes.RAS)
+
+
+def voxel_affine(streamlines, image_affine=None):
+    """Gets the affine transform from streamlines to voxel space
+
+    The transform to voxel space attached to the streamlines (e.g. by
+    streamlines.io.load) is used if it exists. Otherwise, if the streamlines
+    are in native RAS, the inverse of the affine of an image is used.
+
+    Args:
+        streamlines (streamlines.Streamlines): The streamlines to transform.
+        image_affine (optional): The (4, 4) voxel to native RAS affine of an
+            image, used if the streamlines have no transform to voxel space.
+
+    Returns:
+        The (4, 4) affine from the coordinate system of the streamlines to
+        voxel space.
+
+    Raises:
+        ValueError: If no transform to voxel space is available.
+
+    """
+
+    target = coord('voxel', 'ras')
+    if streamlines.coordinate_system == target:
+        return np.eye(4)
+
+    valid_transforms = [t for t in streamlines.transforms
+                        if t.target == target]
+    if len(valid_transforms) > 0:
+        return valid_transforms[0].affine
+
+    if image_affine is not None and streamlines.coordinate_system == _ras_mm:
+        return np.linalg.inv(image_affine)
+
+    raise ValueError(
+        'The streamlines have no transform to voxel space and are not in '
+        'native RAS.')
+
+
+def voxel_shape(streamlines):
+    """Gets the shape of the voxel space of streamlines
+
+    Returns:
+        The shape of the voxel space of the transform to voxel space attached
+        to the streamlines (e.g. by streamlines.io.load) or None if it is not
+        available.
+
+    """
+
+    target = coord('voxel', 'ras')
+    coordinate_systems = [streamlines.coordinate_system] + [
+        t.target for t in streamlines.transforms if t.target == target]
+
+    for coordinate_system in coordinate_systems:
+        if isinstance(coordinate_system, VoxelSpace):
+            return tuple(int(s) for s in coordinate_system.shape)
+
+    return None
+
+
+def to_voxels(points, affine):
+    """Applies an affine transform to a (P, 3) array of points"""
+    return np.dot(points, affine[:3, :3].T) + affine[:3, 3]
+
+
+def voxel_indices(coordinates, shape):
+    """Gets the indices of the voxels that contain points
+
+    Voxel centers are at integer coordinates.
+
+    Args:
+        coordinates: A (P, 3) array of voxel coordinates.
+        shape: The shape of the volume.
+
+    Returns:
+        indices: A (P, 3) array of int with the index of the voxel of each
+            point. Indices of points outside the volume are set to 0.
+        inside: A (P,) array of bool that is True for points inside the
+            volume.
+
+    """
+
+    shape = np.asarray(shape[:3])
+    with np.errstate(invalid='ignore'):
+        rounded = np.rint(coordinates)
+        inside = np.all((rounded >= 0) & (rounded < shape), axis=1)
+
+    indices = np.zeros((len(coordinates), 3), dtype=np.intp)
+    indices[inside] = rounded[inside]
+
+    return indices, inside
+
+
+def lookup(volume, coordinates, fill=0):
+    """Gets the value of the nearest voxel of each point
+
+    Args:
+        volume: The (X, Y, Z, ...) volume.
+        coordinates: A (P, 3) array of voxel coordinates.
+        fill (optional): The value of points outside the volume.
+
+    Returns:
+        A (P, ...) array with the value of the volume at each point.
+
+    """
+
+    indices, inside = voxel_indices(coordinates, volume.shape)
+    values = volume[indices[:, 0], indices[:, 1], indices[:, 2]]
+    values[~inside] = fill
+
+    return values
+
+
+def interpolate(volume, coordinates, fill=0):
+    """Trilinearly interpolates a volume at each point
+
+    The eight neighbors of all the points are gathered at once. Points
+    within half a voxel of the border of the volume use the value of the
+    nearest border voxels.
+
+    Args:
+        volume: The (X, Y, Z, ...) volume.
+        coordinates: A (P, 3) array of voxel coordinates.
+        fill (optional): The value of points outside the volume.
+
+    Returns:
+        A (P, ...) array of float with the value of the volume at each point.
+
+    """
+
+    shape = np.asarray(volume.shape[:3])
+    with np.errstate(invalid='ignore'):
+        inside = np.all(
+            (coordinates >= -0.5) & (coordinates < shape - 0.5), axis=1)
+    coordinates = np.where(inside[:, None], coordinates, 0)
+
+    lower = np.floor(coordinates).astype(np.intp)
+    fractions = coordinates - lower
+    flat_volume = volume.reshape((-1,) + volume.shape[3:])
+
+    values = np.zeros((len(coordinates),) + volume.shape[3:])
+    for corner in np.ndindex(2, 2, 2):
+        indices = np.clip(lower + corner, 0, shape - 1)
+        weights = np.prod(
+            np.where(corner, fractions, 1 - fractions), axis=1)
+        values += (
+            weights.reshape((-1,) + (1,) * (volume.ndim - 3)) *
+            flat_volume[np.ravel_multi_index(indices.T, shape)])
+
+    values[~inside] = fill
+
+    return values
+
+
+# The interpolation methods of sample.
+interpolations = {'nearest': lookup, 'trilinear': interpolate}
+
+
+def sample(volume, coordinates, interpolation='trilinear', fill=0):
+    """Gets the value of a volume at each point
+
+    Args:
+        volume: The (X, Y, Z, ...) volume.
+        coordinates: A (P, 3) array of voxel coordinates.
+        interpolation (optional): 'nearest' or 'trilinear'.
+        fill (optional): The value of points outside the volume.
+
+    Returns:
+        A (P, ...) array with the value of the volume at each point.
+
+    """
+
+    if interpolation not in interpolations:
+        raise ValueError(
+            f'The interpolation must be one of {tuple(interpolations)}, not '
+            f'{interpolation}.')
+
+    return interpolations[interpolation](volume, coordinates, fill)
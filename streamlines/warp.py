@@ -0,0 +1,59 @@
+import numpy as np
+
+from . import packed
+from .serialization import from_buffers
+from .voxels import interpolate, to_voxels
+
+
+def warp(streamlines, field, affine, coordinate_system=None,
+         transforms=None):
+    """Applies a displacement field to streamlines
+
+    Each point p is moved to p + d(p) where d is the displacement field
+    trilinearly interpolated at p. The points of all the streamlines are
+    packed and mapped to the voxel grid of the field with a single affine
+    transform, the displacements are interpolated at all points at once and
+    added to the packed points in place.
+
+    The displacements must be in the coordinate system of the streamlines
+    and map them to the target space. For warps estimated by image
+    registration, this is usually the inverse of the warp used to resample
+    images from the space of the streamlines to the target space. Points
+    outside the field are not moved.
+
+    Args:
+        streamlines (streamlines.Streamlines): The streamlines to warp.
+        field: The (X, Y, Z, 3) displacement field.
+        affine: The (4, 4) affine from the coordinate system of the
+            streamlines to the voxel grid of the field.
+        coordinate_system (optional): The coordinate system of the target
+            space. The default is the coordinate system of the streamlines.
+        transforms (optional): The affine transforms of the target space,
+            e.g. to the voxel space of a template. The transforms of the
+            streamlines are not valid in the target space and are dropped.
+
+    Returns:
+        A new streamlines.Streamlines instance in the target space with the
+        data of the streamlines. The points of the warped streamlines are
+        views into a single contiguous array.
+
+    """
+
+    field = np.asarray(field)
+    if field.shape[3:] != (3,):
+        raise ValueError(
+            f'The displacement field must have a shape of (X, Y, Z, 3), not '
+            f'{field.shape}.')
+
+    if coordinate_system is None:
+        coordinate_system = streamlines.coordinate_system
+
+    points, offsets = packed.pack([s._points for s in streamlines])
+    points += interpolate(field, to_voxels(points, affine))
+
+    warped = from_buffers(
+        coordinate_system, transforms, {'points': points, 'offsets': offsets})
+    for new, streamline in zip(warped, streamlines):
+        new._data = dict(streamline.data)
+
+    return warped
@@ -1,8 +1,11 @@
+import pickle
 import unittest
+import weakref
 
 import numpy as np
 
 import streamlines as sl
+from streamlines.serialization import from_buffers
 
 
 class TestStreamline(unittest.TestCase):
@@ -33,6 +36,26 @@ class TestStreamline(unittest.TestCase):
         points = [[1, 2], [3, 4]]
         self.assertRaises(ValueError, sl.Streamline, points)
 
+    def test_compress(self):
+        """Test the compress method"""
+
+        # A straight streamline is compressed to its endpoints and the data
+        # of the endpoints is kept.
+        x = np.linspace(0, 10, 11)
+        zeros = np.zeros((11,))
+        streamline = sl.Streamline(
+            np.array([x, zeros, zeros]).T,
+            {'fa': x[None, :], 'id': np.array([3])})
+        streamline.compress()
+        self.assertEqual(len(streamline), 2)
+        np.testing.assert_array_almost_equal(streamline.data['fa'], [[0, 10]])
+        np.testing.assert_array_equal(streamline.data['id'], [3])
+
+        # All streamlines are compressed together.
+        streamlines = sl.Streamlines([np.array([x, zeros, zeros]).T] * 3)
+        streamlines.compress()
+        self.assertEqual([len(s) for s in streamlines], [2, 2, 2])
+
     def test_contains(self):
         """Test the __contains__ magic method"""
 
@@ -120,3 +143,226 @@ class TestStreamline(unittest.TestCase):
         streamline = sl.Streamline()
         for point in reversed(streamline):
             self.assertTrue(False)
+
+    def test_reverse(self):
+        """Test reversing a streamline without copying its points"""
+
+        points = np.array([[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [3.0, 0.0, 0.0]])
+        streamline = sl.Streamline(
+            points, {'fa': np.array([[1.0, 2.0, 3.0]]), 'id': np.array([7])})
+        length = streamline.length
+        streamline.reverse()
+
+        # The points are a reversed view of the stored points.
+        np.testing.assert_array_equal(streamline[0], points[-1])
+        np.testing.assert_array_equal(list(streamline), points[::-1])
+        self.assertTrue(
+            np.shares_memory(streamline._points, streamline._array))
+        np.testing.assert_array_equal(streamline.data['fa'], [[3, 2, 1]])
+        np.testing.assert_array_equal(streamline.data['id'], [7])
+        self.assertEqual(streamline.length, length)
+
+        # New data per point is given in the orientation of the streamline.
+        streamline.data['md'] = np.array([[4.0, 5.0, 6.0]])
+        streamline.reverse()
+        np.testing.assert_array_equal(streamline.data['md'], [[6, 5, 4]])
+        np.testing.assert_array_equal(streamline.points, points)
+
+        # Selecting points of a reversed streamline keeps the right data.
+        streamline.reverse()
+        streamline._select_points(np.array([True, False, True]))
+        np.testing.assert_array_equal(streamline.points, points[[2, 0]])
+        np.testing.assert_array_equal(streamline.data['fa'], [[3, 1]])
+        streamline.reverse()
+        np.testing.assert_array_equal(streamline.data['fa'], [[1, 3]])
+
+    def test_data(self):
+        """Test that the data of a streamline behaves like a dict"""
+
+        streamline = sl.Streamline(
+            [[0, 0, 0], [1, 0, 0]], {'fa': np.array([[1.0, 2.0]])})
+        data = streamline.data
+        self.assertIs(streamline.data, data)
+        self.assertIn('fa', data)
+        self.assertEqual(list(data.keys()), ['fa'])
+        self.assertIsNone(data.get('md'))
+        self.assertEqual(data, {'fa': data['fa']})
+
+        # Copies are dicts in the current orientation.
+        streamline.reverse()
+        copy = data.copy()
+        self.assertIsInstance(copy, dict)
+        np.testing.assert_array_equal(copy['fa'], [[2, 1]])
+        np.testing.assert_array_equal(dict(data)['fa'], [[2, 1]])
+        copy['md'] = np.array([[0.0, 0.0]])
+        self.assertNotIn('md', streamline.data)
+
+        data.update(md=np.array([[3.0, 4.0]]))
+        del data['fa']
+        self.assertEqual(list(streamline.data), ['md'])
+        np.testing.assert_array_equal(streamline._data['md'], [[4, 3]])
+
+        # Pickled streamlines have their own data.
+        other = pickle.loads(pickle.dumps(streamline))
+        other.data['fa'] = np.array([[0.0, 0.0]])
+        self.assertNotIn('fa', streamline.data)
+        np.testing.assert_array_equal(other.data['md'], [[3, 4]])
+
+    def test_reorient_flags(self):
+        """Test that reorienting streamlines only flips orientations"""
+
+        x = np.linspace(0, 10, 11)
+        zeros = np.zeros((11,))
+        points = np.array([x, zeros, zeros]).T
+        streamlines = sl.Streamlines([points, points[::-1], points])
+        arrays = [s._array for s in streamlines]
+
+        streamlines.reorient()
+        np.testing.assert_array_equal(
+            streamlines.orientations, [False, True, False])
+        for streamline, array in zip(streamlines, arrays):
+            self.assertIs(streamline._array, array)
+            np.testing.assert_array_equal(streamline.points, points)
+
+        streamlines.reverse()
+        np.testing.assert_array_equal(
+            streamlines.orientations, [True, False, True])
+        np.testing.assert_array_equal(streamlines[1].points, points[::-1])
+
+    def test_extend(self):
+        """Test appending points to streamlines"""
+
+        points = [np.random.randn(n, 3) for n in [3, 1, 0, 5]]
+        streamlines = sl.Streamlines()
+        streamlines.append(points[0])
+        streamlines.extend([points[1], sl.Streamline(points[2]), points[3]])
+
+        self.assertEqual(len(streamlines), 4)
+        for streamline, expected in zip(streamlines, points):
+            np.testing.assert_array_equal(streamline.points, expected)
+
+        # The points are copied into shared blocks.
+        self.assertTrue(np.shares_memory(
+            streamlines[0]._array.base, streamlines[3]._array))
+
+        # Many small streamlines fit in a few blocks.
+        streamlines = sl.Streamlines([np.zeros((2, 3))] * 10)
+        for _ in range(10000):
+            streamlines.append(np.ones((2, 3)))
+        blocks = {id(s._array.base) for s in streamlines}
+        self.assertLess(len(blocks), 10)
+
+        self.assertRaises(ValueError, streamlines.append, [1, 2, 3])
+        self.assertRaises(ValueError, streamlines.extend, [[[1, 2]]])
+
+    def test_outlive_blocks(self):
+        """Test that kept streamlines do not keep the shared blocks alive"""
+
+        streamlines = sl.Streamlines(np.random.randn(10, 5, 3))
+        kept = streamlines[3]
+        kept.data['fa'] = np.arange(10.0)[None, :5]
+        points = kept.points
+        block = weakref.ref(kept._array.base)
+
+        del streamlines
+        self.assertIsNone(block())
+        self.assertIsNone(kept._array.base)
+        self.assertIsNone(kept.data['fa'].base)
+        np.testing.assert_array_equal(kept.points, points)
+
+        # Streamlines rebuilt from buffers own their points once the
+        # buffers are dropped.
+        arrays = {'points': np.random.randn(10, 3),
+                  'offsets': np.array([0, 4, 10])}
+        buffer = weakref.ref(arrays['points'])
+        kept = from_buffers(sl.Streamlines().coordinate_system, None,
+                            arrays)[1]
+        del arrays
+        self.assertIsNone(buffer())
+        self.assertEqual(len(kept), 6)
+
+    def test_concatenate(self):
+        """Test the concatenation of streamlines"""
+
+        first = sl.Streamlines([np.random.randn(4, 3)])
+        first[0].data['fa'] = np.array([[1.0, 2.0, 3.0, 4.0]])
+        first.reverse()
+        second = sl.Streamlines([np.random.randn(2, 3), np.random.randn(3, 3)])
+
+        streamlines = sl.Streamlines.concatenate([first, second])
+        self.assertEqual(len(streamlines), 3)
+        for streamline, expected in zip(
+                streamlines, list(first) + list(second)):
+            np.testing.assert_array_equal(streamline.points, expected.points)
+        np.testing.assert_array_equal(
+            streamlines[0].data['fa'], [[4, 3, 2, 1]])
+
+        # All the points are in a single array.
+        self.assertEqual(len({id(s._array.base) for s in streamlines}), 1)
+
+        self.assertEqual(len(sl.Streamlines.concatenate([])), 0)
+
+        voxel = sl.Streamlines(
+            [], coordinate_system=sl.CoordinateSystem(
+                sl.CoordinateSystemSpace.VOXEL, sl.CoordinateSystemAxes.RAS))
+        self.assertRaises(
+            ValueError, sl.Streamlines.concatenate, [first, voxel])
+
+    def test_geometry(self):
+        """Test computing the geometry of streamlines as data per point"""
+
+        streamlines = sl.Streamlines([
+            [[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0]],
+            [[0, 0, 0], [1, 0, 0]]])
+        streamlines[0].reverse()
+
+        streamlines.geometry()
+        np.testing.assert_array_almost_equal(
+            streamlines[0].data['turning_angle'], [[0, 90, 90, 0]])
+        np.testing.assert_array_equal(
+            streamlines[1].data['curvature'], [[0, 0]])
+        self.assertEqual(streamlines[0].data['torsion'].shape, (1, 4))
+
+    def test_reorder(self):
+        """Test sorting streamlines spatially and restoring their order"""
+
+        arrays = [np.random.randn(10, 3) + np.random.randint(0, 50, 3)
+                  for _ in range(20)]
+        streamlines = sl.Streamlines(arrays)
+        for i, streamline in enumerate(streamlines):
+            streamline.data['index'] = np.array([i])
+
+        order = streamlines.reorder()
+        for streamline, i in zip(streamlines, order):
+            np.testing.assert_array_equal(streamline.points, arrays[i])
+            self.assertEqual(streamline.data['index'], i)
+
+        streamlines.permute(np.argsort(order))
+        for streamline, array in zip(streamlines, arrays):
+            np.testing.assert_array_equal(streamline.points, array)
+
+        self.assertRaises(ValueError, streamlines.permute, [0, 0])
+
+    def test_sample(self):
+        """Test sampling volumes at the points of streamlines"""
+
+        volume = np.arange(4.0)[:, None, None] * np.ones((4, 2, 2))
+        vectors = np.stack((volume, -volume), axis=-1)
+        streamlines = sl.Streamlines([
+            [[0, 0, 0], [1.5, 0, 0], [3, 1, 1]],
+            [[0.25, 0, 0], [9, 0, 0]]])
+        streamlines[1].reverse()
+
+        streamlines.sample({'x': volume, 'v': vectors}, np.eye(4))
+        np.testing.assert_array_almost_equal(
+            streamlines[0].data['x'], [[0, 1.5, 3]])
+        np.testing.assert_array_almost_equal(
+            streamlines[0].data['v'], [[0, 1.5, 3], [0, -1.5, -3]])
+        np.testing.assert_array_almost_equal(
+            streamlines[1].data['x'], [[0, 0.25]])
+
+        streamlines.sample({'x': volume}, np.eye(4), 'nearest')
+        np.testing.assert_array_equal(streamlines[0].data['x'], [[0, 2, 3]])
+
+        self.assertRaises(
+            ValueError, streamlines.sample, {'x': volume}, np.eye(4), 'cubic')
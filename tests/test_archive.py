@@ -0,0 +1,125 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from nicoord import AffineTransform
+from nicoord import CoordinateSystemAxes
+from nicoord import VoxelSpace
+
+import streamlines as sl
+from streamlines.io import archive
+
+
+class TestArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.test_dir.name, 'test.slz')
+
+        # Random walks with steps of about 1mm, far from the origin so the
+        # first points of the streamlines are stored as large deltas.
+        self.points = [np.cumsum(np.random.randn(n, 3), 0) + 1000
+                       for n in [10, 1, 0, 2, 25, 3]]
+        self.streamlines = sl.Streamlines(self.points)
+        for i, streamline in enumerate(self.streamlines):
+            streamline.data['weight'] = np.array([i], dtype=np.int32)
+            streamline.data['fa'] = np.random.rand(2, len(streamline))
+
+    def tearDown(self):
+        self.test_dir.cleanup()
+
+    def assertArchived(self, streamlines, expected, precision=0.01):
+        self.assertEqual(len(streamlines), len(expected))
+        for streamline, original in zip(streamlines, expected):
+            self.assertEqual(len(streamline), len(original))
+            self.assertLessEqual(
+                np.max(np.abs(streamline.points - original.points),
+                       initial=0), precision / 2 + 1e-9)
+            self.assertEqual(set(streamline.data), set(original.data))
+            for key, value in original.data.items():
+                np.testing.assert_array_equal(streamline.data[key], value)
+                self.assertEqual(streamline.data[key].dtype, value.dtype)
+
+    def test_save_and_load(self):
+        """Test saving and loading archive files"""
+
+        sl.io.save(self.streamlines, self.filename)
+        recovered = sl.io.load(self.filename)
+        self.assertArchived(recovered, self.streamlines)
+        self.assertEqual(recovered.coordinate_system,
+                         self.streamlines.coordinate_system)
+
+        for codec in archive.codecs:
+            archive.save(self.streamlines, self.filename, precision=0.5,
+                         codec=codec, block_size=2)
+            self.assertArchived(
+                archive.load(self.filename, threads=2), self.streamlines,
+                0.5)
+
+        # An empty file.
+        sl.io.save(sl.Streamlines(), self.filename)
+        self.assertEqual(len(sl.io.load(self.filename)), 0)
+
+        self.assertRaises(ValueError, archive.save, self.streamlines,
+                          self.filename, precision=0)
+        self.assertRaises(ValueError, archive.save, self.streamlines,
+                          self.filename, codec='zip')
+
+    def test_voxel_space(self):
+        """Test that the voxel space of the streamlines is preserved"""
+
+        affine = np.array([[-1.25, 0., 0., 90.],
+                           [0., 1.25, 0., -126.],
+                           [0., 0., 1.25, -72.],
+                           [0., 0., 0., 1.]])
+        source = VoxelSpace(
+            (1.25, 1.25, 1.25), (256, 256, 256), CoordinateSystemAxes.RAS)
+        transform = AffineTransform(
+            source, self.streamlines.coordinate_system, affine)
+
+        # The streamlines are saved in native RAS.
+        streamlines = sl.Streamlines(
+            self.points, coordinate_system=source, transforms=[transform])
+        sl.io.save(streamlines, self.filename)
+        recovered = sl.io.load(self.filename)
+
+        self.assertEqual(recovered.coordinate_system,
+                         self.streamlines.coordinate_system)
+        np.testing.assert_array_almost_equal(
+            recovered[0].points,
+            np.dot(self.points[0], affine[:3, :3].T) + affine[:3, 3], 2)
+
+        transforms = recovered.transforms
+        self.assertEqual(len(transforms), 1)
+        np.testing.assert_array_almost_equal(
+            transforms[0].affine, np.linalg.inv(affine))
+        np.testing.assert_array_almost_equal(
+            transforms[0].target.voxel_sizes, (1.25, 1.25, 1.25))
+
+    def test_random_access(self):
+        """Test loading ranges and chunks of streamlines"""
+
+        archive.save(self.streamlines, self.filename, block_size=2)
+
+        for start, stop in [(0, 6), (1, 4), (3, 4), (4, 100), (2, 2)]:
+            self.assertArchived(
+                archive.load(self.filename, start, stop),
+                self.streamlines[start:stop])
+
+        chunks = list(sl.io.load_chunks(self.filename, 4))
+        self.assertEqual([len(c) for c in chunks], [4, 2])
+        self.assertArchived(
+            [s for c in chunks for s in c], self.streamlines)
+
+        # Saving in chunks is the same as saving all the streamlines.
+        output = os.path.join(self.test_dir.name, 'chunks.slz')
+        sl.io.save_chunks(chunks, output)
+        self.assertArchived(sl.io.load(output), self.streamlines)
+
+    def test_invalid(self):
+        """Test loading a file that is not an archive"""
+
+        with open(self.filename, 'wb') as f:
+            f.write(b'not an archive file')
+        self.assertRaises(ValueError, sl.io.load, self.filename)
@@ -2,7 +2,8 @@ import unittest
 
 import numpy as np
 
-from streamlines.asarray import distance, length, reorient, resample, smooth
+from streamlines.asarray import distance, length, mdf, reorient, resample
+from streamlines.asarray import smooth
 
 
 class TestAsArray(unittest.TestCase):
@@ -21,6 +22,21 @@ class TestAsArray(unittest.TestCase):
 
         self.assertAlmostEqual(distance(left, right), 1.0)
 
+    def test_mdf(self):
+        """Tests the mdf function"""
+
+        left = np.array([
+            [0.0, 0.0, 0.0],
+            [1.0, 0.0, 0.0]
+        ])
+        right = left[::-1] + [0.0, 1.0, 0.0]
+
+        # The distance does not depend on the orientation and broadcasts
+        # over stacks of streamlines.
+        self.assertAlmostEqual(mdf(left, right), 1.0)
+        np.testing.assert_array_almost_equal(
+            mdf(left, np.stack((right, left))), [1.0, 0.0])
+
     def test_length(self):
         """Tests the length function"""
 
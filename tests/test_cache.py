@@ -0,0 +1,105 @@
+import unittest
+
+import numpy as np
+
+import streamlines as sl
+from streamlines.cache import FeatureCache, default
+
+
+class TestFeatureCache(unittest.TestCase):
+
+    def test_get(self):
+        """Test getting features from the cache"""
+
+        cache = FeatureCache()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return np.zeros((10,))
+
+        # The feature is only computed once.
+        value = cache.get(0, 'feature', compute)
+        np.testing.assert_array_equal(value, np.zeros((10,)))
+        cache.get(0, 'feature', compute)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.nbytes, 80)
+
+        # Cached arrays cannot be modified.
+        self.assertFalse(value.flags.writeable)
+
+        # Invalidating the token removes its features.
+        cache.invalidate(0)
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.nbytes, 0)
+
+    def test_eviction(self):
+        """Test evicting features when the budget is exceeded"""
+
+        cache = FeatureCache(max_bytes=200)
+        for token in range(3):
+            cache.get(token, 'feature', lambda: np.zeros((10,)))
+        self.assertEqual(len(cache), 2)
+
+        # The least recently used feature is evicted first.
+        computed = []
+        cache.get(0, 'feature', lambda: computed.append(0) or np.zeros(10))
+        self.assertEqual(computed, [0])
+        cache.get(2, 'feature', lambda: computed.append(2) or np.zeros(10))
+        self.assertEqual(computed, [0])
+
+        # Reducing the budget evicts features.
+        cache.max_bytes = 0
+        self.assertEqual(len(cache), 0)
+
+    def test_invalidation(self):
+        """Test that modifying a streamline invalidates its features"""
+
+        streamlines = sl.Streamlines([[[0, 0, 0], [1, 0, 0]]])
+        streamline = streamlines[0]
+        self.assertAlmostEqual(streamline.length, 1.0)
+        first_hash = hash(streamline)
+
+        streamline.resample(3)
+        self.assertAlmostEqual(streamline.length, 1.0)
+        self.assertEqual(len(streamline), 3)
+
+        streamline._points = np.array([[0, 0, 0], [2, 0, 0]])
+        self.assertAlmostEqual(streamline.length, 2.0)
+        self.assertNotEqual(hash(streamline), first_hash)
+        np.testing.assert_array_almost_equal(
+            streamline.bounding_box, [[0, 0, 0], [2, 0, 0]])
+
+        streamlines.smooth()
+        self.assertAlmostEqual(streamlines.lengths[0], 2.0)
+
+    def test_release(self):
+        """Test that the features of old points free the budget"""
+
+        streamlines = sl.Streamlines([np.random.randn(10, 3)])
+        streamline = streamlines[0]
+        streamline._resampled(100)
+        nbytes = streamlines.cache.nbytes
+        self.assertGreaterEqual(nbytes, 100 * 3 * 8)
+
+        # Assigning new points removes the features of the old points.
+        streamline.resample(20)
+        self.assertEqual(streamlines.cache.nbytes, 0)
+        self.assertEqual(len(streamlines.cache), 0)
+
+        # The features of standalone streamlines are removed from the
+        # default cache when they are collected.
+        before = default.nbytes
+        streamline = sl.Streamline(np.random.randn(10, 3))
+        streamline._resampled(100)
+        self.assertEqual(default.nbytes, before + 100 * 3 * 8)
+        del streamline
+        self.assertEqual(default.nbytes, before)
+
+        # Appending a standalone streamline moves its features.
+        streamline = sl.Streamline(np.random.randn(10, 3))
+        streamline._resampled(100)
+        streamlines.append(streamline)
+        self.assertEqual(default.nbytes, before)
+        streamline.length
+        self.assertEqual(len(streamlines.cache), 1)
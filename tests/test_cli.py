@@ -2,13 +2,27 @@ import os
 import tempfile
 import unittest
 
+import nibabel as nib
 import numpy as np
 
 from streamlines import Streamlines
+from streamlines.cli.cache import ResultCache
 from streamlines.cli.commands.reorient import reorient
+from streamlines.cli.commands.archive import archive
+from streamlines.cli.commands.compare import compare
+from streamlines.cli.commands.compress import compress
+from streamlines.cli.commands.connectivity import connectivity
+from streamlines.cli.commands.density import density
 from streamlines.cli.commands.filter import filter
+from streamlines.cli.commands.geometry import geometry
 from streamlines.cli.commands.info import info
 from streamlines.cli.commands.merge import merge
+from streamlines.cli.commands.recognize import recognize
+from streamlines.cli.commands.reorder import reorder
+from streamlines.cli.commands.roi import roi
+from streamlines.cli.commands.sample import sample
+from streamlines.cli.commands.subsample import subsample
+from streamlines.cli.commands.warp import warp
 from streamlines.io import load, save
 
 
@@ -61,12 +75,113 @@ class TestCLI(unittest.TestCase):
         filename = os.path.join(cls.test_dir.name, 'bundle-flipped.trk')
         save(streamlines, filename)
 
+        # Masks of the middle and start of the bundle. The voxel coordinates
+        # are shifted by 10 mm.
+        affine = np.eye(4)
+        affine[:3, 3] = -10
+        middle = np.zeros((130, 20, 20))
+        middle[40:60] = 1
+        filename = os.path.join(cls.test_dir.name, 'middle.nii.gz')
+        nib.save(nib.Nifti1Image(middle, affine), filename)
+        start = np.zeros((130, 20, 20))
+        start[:20] = 1
+        filename = os.path.join(cls.test_dir.name, 'start.nii.gz')
+        nib.save(nib.Nifti1Image(start, affine), filename)
+
+        # A parcellation with one label at each end of the bundle.
+        labels = np.zeros((130, 20, 20), dtype=np.int16)
+        labels[:20] = 1
+        labels[100:] = 2
+        filename = os.path.join(cls.test_dir.name, 'labels.nii.gz')
+        nib.save(nib.Nifti1Image(labels, affine), filename)
+
     @classmethod
     def tearDownClass(cls):
         """Removes the streamlines file used to test the CLI"""
 
         cls.test_dir.cleanup()
 
+    def test_archive(self):
+        """Test the archive command of the CLI"""
+
+        # Archive the bundle in chunks and filter the archive.
+        bundle = os.path.join(self.test_dir.name, 'bundle.trk')
+        output = os.path.join(self.test_dir.name, 'test-archive.slz')
+        archive(bundle, output, precision=0.1, block_size=10, chunk_size=30)
+        self.assertEqual(len(load(output)), 100)
+
+        filtered = os.path.join(self.test_dir.name, 'test-archive-2.slz')
+        filter(output, filtered, min_points=1000, chunk_size=7)
+        self.assertEqual(len(load(filtered)), 100)
+
+    def test_compare(self):
+        """Test the compare command of the CLI"""
+
+        # Compare the bundle to itself, with flipped orientations, and to
+        # short streamlines.
+        bundle = os.path.join(self.test_dir.name, 'bundle.trk')
+        flipped = os.path.join(self.test_dir.name, 'bundle-flipped.trk')
+        short = os.path.join(self.test_dir.name, 'short.trk')
+        reference = os.path.join(self.test_dir.name, 'middle.nii.gz')
+        compare(bundle, flipped, reference=reference, chunk_size=30)
+        compare(short, bundle, reference=reference, step=0.5)
+
+    def test_compress(self):
+        """Test the compress command of the CLI"""
+
+        # Compressing the bundle removes points but keeps the endpoints.
+        bundle = os.path.join(self.test_dir.name, 'bundle.trk')
+        output = os.path.join(self.test_dir.name, 'test-compress.trk')
+        compress(bundle, output, tolerance=5, chunk_size=30)
+
+        streamlines = load(bundle)
+        compressed = load(output)
+        self.assertEqual(len(compressed), 100)
+        for streamline, new_streamline in zip(streamlines, compressed):
+            self.assertLess(len(new_streamline), len(streamline))
+            np.testing.assert_array_almost_equal(
+                new_streamline[0], streamline[0], 4)
+            np.testing.assert_array_almost_equal(
+                new_streamline[-1], streamline[-1], 4)
+
+    def test_connectivity(self):
+        """Test the connectivity command of the CLI"""
+
+        bundle = os.path.join(self.test_dir.name, 'bundle.trk')
+        labels = os.path.join(self.test_dir.name, 'labels.nii.gz')
+        output = os.path.join(self.test_dir.name, 'test-connectivity.txt')
+        lengths = os.path.join(self.test_dir.name, 'test-lengths.txt')
+        assignments = os.path.join(self.test_dir.name, 'test-assign.txt')
+
+        # All the streamlines of the bundle connect label 1 to label 2.
+        connectivity(bundle, labels, output, mean_lengths=lengths,
+                     assignments=assignments, chunk_size=30)
+        np.testing.assert_array_equal(
+            np.loadtxt(output), [[0, 100], [100, 0]])
+        self.assertGreater(np.loadtxt(lengths)[0, 1], 100)
+        np.testing.assert_array_equal(
+            np.loadtxt(assignments), np.tile([1, 2], (100, 1)))
+
+    def test_density(self):
+        """Test the density command of the CLI"""
+
+        bundle = os.path.join(self.test_dir.name, 'bundle.trk')
+        reference = os.path.join(self.test_dir.name, 'middle.nii.gz')
+        output = os.path.join(self.test_dir.name, 'test-density.nii.gz')
+
+        # Each streamline is counted at most once per voxel and every
+        # streamline crosses the middle of the image.
+        density(bundle, output, reference=reference, step=0.5)
+        image = nib.load(output)
+        self.assertEqual(image.shape, (130, 20, 20))
+        self.assertLessEqual(image.get_fdata().max(), 100)
+        self.assertGreaterEqual(image.get_fdata()[60].sum(), 100)
+
+        # All endpoints are in the image.
+        density(bundle, output, endpoints=True, reference=reference,
+                chunk_size=30)
+        self.assertEqual(nib.load(output).get_fdata().sum(), 200)
+
     def test_filter(self):
         """Test the filter command of the CLI"""
 
@@ -80,6 +195,81 @@ class TestCLI(unittest.TestCase):
         streamlines = load(output)
         self.assertEqual(len(streamlines), 0)
 
+        # Filtering the bundle in chunks should give the same result as
+        # filtering it in memory.
+        output = os.path.join(self.test_dir.name, 'test-filter-2.trk')
+        filter(
+            os.path.join(self.test_dir.name, 'bundle.trk'),
+            output,
+            min_points=1000,
+            endpoint_region=[-10, -10, -10, 10, 10, 10],
+            chunk_size=7)
+        streamlines = load(output)
+        self.assertEqual(len(streamlines), 100)
+
+        output = os.path.join(self.test_dir.name, 'test-filter-3.trk')
+        filter(
+            os.path.join(self.test_dir.name, 'bundle.trk'),
+            output,
+            max_points=999,
+            chunk_size=7)
+        streamlines = load(output)
+        self.assertEqual(len(streamlines), 0)
+
+        # Every streamline of the bundle has similar streamlines, so the
+        # cluster confidence index removes none of them in memory or in
+        # chunks.
+        for chunk_size in (None, 7):
+            output = os.path.join(self.test_dir.name, 'test-filter-4.trk')
+            filter(
+                os.path.join(self.test_dir.name, 'bundle.trk'),
+                output,
+                min_cci=1,
+                chunk_size=chunk_size)
+            streamlines = load(output)
+            self.assertEqual(len(streamlines), 100)
+
+        # The bundle is straight on average but its noisy points turn
+        # sharply.
+        output = os.path.join(self.test_dir.name, 'test-filter-6.trk')
+        filter(
+            os.path.join(self.test_dir.name, 'bundle.trk'),
+            output,
+            max_tortuosity=100,
+            chunk_size=7)
+        self.assertEqual(len(load(output)), 100)
+        filter(
+            os.path.join(self.test_dir.name, 'bundle.trk'),
+            output,
+            max_angle=10)
+        self.assertEqual(len(load(output)), 0)
+
+        # The single streamline of the random tractogram has no similar
+        # streamline.
+        output = os.path.join(self.test_dir.name, 'test-filter-5.trk')
+        filter(
+            os.path.join(self.test_dir.name, 'random.trk'),
+            output,
+            min_cci=1,
+            chunk_size=1)
+        streamlines = load(output)
+        self.assertEqual(len(streamlines), 0)
+
+    def test_geometry(self):
+        """Test the geometry command of the CLI"""
+
+        for chunk_size in (None, 7):
+            output = os.path.join(self.test_dir.name, 'test-geometry.trk')
+            geometry(os.path.join(self.test_dir.name, 'bundle.trk'), output,
+                     chunk_size=chunk_size)
+            streamlines = load(output)
+            self.assertEqual(len(streamlines), 100)
+            self.assertEqual(
+                set(streamlines[0].data),
+                {'curvature', 'torsion', 'turning_angle'})
+            self.assertEqual(
+                streamlines[0].data['curvature'].shape, (1, 1000))
+
     def test_info(self):
         """Test the info command of the CLI"""
 
@@ -106,6 +296,110 @@ class TestCLI(unittest.TestCase):
         streamlines = load(output)
         self.assertEqual(len(streamlines), 3)
 
+    def test_recognize(self):
+        """Test the recognize command of the CLI"""
+
+        # An atlas with the centroid of the bundle and a distant bundle.
+        x = np.linspace(0, 100, 50)
+        zeros = np.zeros((50,))
+        atlas = [os.path.join(self.test_dir.name, f'{name}.trk')
+                 for name in ['arcuate', 'other']]
+        save(Streamlines([np.array([x, zeros, zeros]).T]), atlas[0])
+        save(Streamlines([np.array([zeros, x, zeros]).T]), atlas[1])
+
+        # The streamlines have data per point and per streamline.
+        streamlines = load(
+            os.path.join(self.test_dir.name, 'bundle-flipped.trk'))
+        for i, streamline in enumerate(streamlines):
+            streamline.data['fa'] = np.full((1, len(streamline)), 0.5)
+            streamline.data['index'] = np.array([i])
+        bundle = os.path.join(self.test_dir.name, 'test-recognize-data.trk')
+        save(streamlines, bundle)
+
+        output = os.path.join(self.test_dir.name, 'test-recognize')
+        labels = os.path.join(self.test_dir.name, 'test-recognize.txt')
+        recognize(bundle, atlas, output, threshold=5, labels=labels)
+
+        arcuate = load(os.path.join(output, 'arcuate.trk'))
+        self.assertEqual(len(arcuate), 100)
+        self.assertEqual(len(load(os.path.join(output, 'other.trk'))), 0)
+        for i, streamline in enumerate(arcuate):
+            np.testing.assert_array_almost_equal(
+                streamline.data['fa'], np.full((1, len(streamline)), 0.5))
+            np.testing.assert_array_equal(streamline.data['index'], [i])
+        with open(labels) as f:
+            self.assertEqual(f.read().split(), ['arcuate'] * 100)
+
+    def test_roi(self):
+        """Test the roi command of the CLI"""
+
+        bundle = os.path.join(self.test_dir.name, 'bundle.trk')
+        middle = os.path.join(self.test_dir.name, 'middle.nii.gz')
+        start = os.path.join(self.test_dir.name, 'start.nii.gz')
+        output = os.path.join(self.test_dir.name, 'test-roi.trk')
+
+        # All streamlines of the bundle pass through the middle mask but
+        # none of them end there.
+        roi(bundle, middle, output)
+        self.assertEqual(len(load(output)), 100)
+        roi(bundle, middle, output, mode='exclude')
+        self.assertEqual(len(load(output)), 0)
+        roi(bundle, middle, output, mode='endpoints', chunk_size=30)
+        self.assertEqual(len(load(output)), 0)
+
+        # Only one endpoint is in the start mask.
+        roi(bundle, start, output, mode='endpoints')
+        self.assertEqual(len(load(output)), 100)
+        roi(bundle, start, output, mode='both-endpoints', chunk_size=30)
+        self.assertEqual(len(load(output)), 0)
+
+    def test_reorder(self):
+        """Test the reorder command of the CLI"""
+
+        bundle = os.path.join(self.test_dir.name, 'bundle.trk')
+        output = os.path.join(self.test_dir.name, 'test-reorder-1.trk')
+        permutation = os.path.join(self.test_dir.name, 'permutation.npy')
+        reorder(bundle, output, curve='morton', anchor='endpoints',
+                permutation=permutation)
+        self.assertEqual(len(load(output)), 100)
+
+        # Restoring the order gives back the original file.
+        restored = os.path.join(self.test_dir.name, 'test-reorder-2.trk')
+        reorder(output, restored, permutation=permutation, restore=True)
+        for streamline, original in zip(load(restored), load(bundle)):
+            np.testing.assert_array_almost_equal(
+                streamline.points, original.points)
+
+    def test_sample(self):
+        """Test the sample command of the CLI"""
+
+        bundle = os.path.join(self.test_dir.name, 'bundle.trk')
+        middle = os.path.join(self.test_dir.name, 'middle.nii.gz')
+        labels = os.path.join(self.test_dir.name, 'labels.nii.gz')
+        output = os.path.join(self.test_dir.name, 'test-sample.trk')
+
+        sample(bundle, output, [middle, labels], interpolation='nearest')
+        streamlines = load(output)
+        self.assertEqual(len(streamlines), 100)
+        self.assertEqual(streamlines[0].data['middle'].shape,
+                         (1, len(streamlines[0])))
+        self.assertEqual(
+            set(np.unique(streamlines[0].data['labels'])), {0, 1, 2})
+
+        sample(bundle, output, [middle], names=['roi'], chunk_size=30)
+        self.assertIn('roi', load(output)[0].data)
+
+    def test_subsample(self):
+        """Test the subsample command of the CLI"""
+
+        bundle = os.path.join(self.test_dir.name, 'bundle.trk')
+        output = os.path.join(self.test_dir.name, 'test-subsample.trk')
+
+        subsample(bundle, output, count=10, seed=0, chunk_size=30)
+        self.assertEqual(len(load(output)), 10)
+        subsample(bundle, output, fraction=0, chunk_size=30)
+        self.assertEqual(len(load(output)), 0)
+
     def test_reorient(self):
         """Test the reorient command of the CLI"""
 
@@ -132,3 +426,53 @@ class TestCLI(unittest.TestCase):
         for streamline, new_streamline in zip(streamlines, new_streamlines):
             np.testing.assert_array_almost_equal(new_streamline._points,
                                                  streamline._points)
+
+        # Chunks are all reoriented like the first streamline of the file.
+        output = os.path.join(self.test_dir.name, 'test-reorient-3.trk')
+        reorient(
+            os.path.join(self.test_dir.name, 'bundle-flipped.trk'),
+            output, chunk_size=30)
+        new_streamlines = load(output)
+        self.assertEqual(len(new_streamlines), 100)
+        for streamline, new_streamline in zip(streamlines, new_streamlines):
+            np.testing.assert_array_almost_equal(new_streamline._points,
+                                                 streamline._points)
+
+    def test_warp(self):
+        """Test the warp command of the CLI"""
+
+        # A constant displacement of 1 mm along z in the grid of the masks.
+        field = np.zeros((130, 20, 20, 1, 3), dtype=np.float32)
+        field[..., 2] = 1
+        affine = np.eye(4)
+        affine[:3, 3] = -10
+        field_filename = os.path.join(self.test_dir.name, 'field.nii.gz')
+        nib.save(nib.Nifti1Image(field, affine), field_filename)
+
+        bundle = os.path.join(self.test_dir.name, 'bundle.trk')
+        reference = os.path.join(self.test_dir.name, 'middle.nii.gz')
+        output = os.path.join(self.test_dir.name, 'test-warp.trk')
+        streamlines = load(bundle)
+
+        warp(bundle, field_filename, output, reference_filename=reference)
+        warped = load(output)
+        self.assertEqual(len(warped), 100)
+        np.testing.assert_array_almost_equal(
+            warped[0].points, streamlines[0].points + [0, 0, 1], 4)
+
+        # The contents of the reference are part of the cache key.
+        cache = ResultCache(os.path.join(self.test_dir.name, 'cache'))
+        parameters = {'input_filename': bundle,
+                      'field_filename': field_filename,
+                      'output_filename': output,
+                      'reference_filename': reference}
+        self.assertFalse(cache.run('warp', warp, parameters))
+        self.assertTrue(cache.run('warp', warp, parameters))
+        image = nib.load(reference)
+        nib.save(nib.Nifti1Image(
+            np.asarray(image.dataobj), image.affine * [2, 2, 2, 1]),
+            reference)
+        self.assertFalse(cache.run('warp', warp, parameters))
+
+        warp(bundle, field_filename, output, lps=True, chunk_size=30)
+        self.assertEqual(len(load(output)), 100)
@@ -0,0 +1,80 @@
+import unittest
+
+import numpy as np
+
+import streamlines as sl
+from streamlines.compare import compare
+
+
+class TestCompare(unittest.TestCase):
+
+    def setUp(self):
+
+        # Streamlines along x at y = 0 and y = 2 in a (10, 4, 1) grid.
+        x = np.linspace(0, 9, 10)
+        zeros = np.zeros((10,))
+        self.along_x = np.array([x, zeros, zeros]).T
+        self.shifted = self.along_x + [0, 2, 0]
+        self.grid = {'shape': (10, 4, 1), 'affine': np.eye(4)}
+
+    def test_identical(self):
+        """Test the comparison of identical bundles"""
+
+        bundle = sl.Streamlines([self.along_x, self.shifted[::-1]])
+        metrics = compare(bundle, bundle, **self.grid)
+
+        self.assertEqual(metrics['dice'], 1)
+        self.assertEqual(metrics['overlap'], 1)
+        self.assertEqual(metrics['overreach'], 0)
+        self.assertEqual(metrics['bundle_adjacency'], 1)
+        self.assertEqual(metrics['bundle_distance'], 0)
+        self.assertEqual(metrics['candidate_voxels'], 20)
+
+    def test_compare(self):
+        """Test the metrics of different bundles"""
+
+        candidate = sl.Streamlines([self.along_x, self.along_x + [0, 1, 0]])
+        reference = sl.Streamlines([self.shifted])
+        metrics = compare(candidate, reference, threshold=1.5, **self.grid)
+
+        # The candidate crosses 20 voxels, none of them in the reference.
+        self.assertEqual(metrics['dice'], 0)
+        self.assertEqual(metrics['overlap'], 0)
+        self.assertEqual(metrics['overreach'], 2)
+
+        # Only one candidate streamline is within threshold, the reference
+        # streamline is 1 mm away from its nearest candidate.
+        self.assertAlmostEqual(metrics['bundle_adjacency'], 0.75)
+        self.assertAlmostEqual(metrics['candidate_distance'], 1.5)
+        self.assertAlmostEqual(metrics['reference_distance'], 1)
+        self.assertAlmostEqual(metrics['bundle_distance'], 1.5625)
+        self.assertEqual(metrics['candidate_streamlines'], 2)
+        self.assertEqual(metrics['reference_streamlines'], 1)
+
+    def test_stream(self):
+        """Test that streaming either bundle gives the same metrics"""
+
+        candidate = sl.Streamlines(
+            [self.along_x + [0, 0.5 * i, 0] for i in range(7)])
+        reference = sl.Streamlines([self.along_x, self.shifted])
+        expected = compare(candidate, reference, **self.grid)
+
+        chunks = [candidate[:3], candidate[3:]]
+        chunks = [sl.Streamlines(c) for c in chunks]
+        self.assertEqual(
+            compare(chunks, reference, **self.grid), expected)
+        self.assertEqual(
+            compare(candidate, [reference], stream='reference', **self.grid),
+            expected)
+
+        with self.assertRaises(ValueError):
+            compare(candidate, reference, stream='both', **self.grid)
+
+    def test_empty(self):
+        """Test the comparison with an empty bundle"""
+
+        metrics = compare(sl.Streamlines(), sl.Streamlines([self.along_x]),
+                          **self.grid)
+        self.assertEqual(metrics['dice'], 0)
+        self.assertEqual(metrics['candidate_streamlines'], 0)
+        self.assertTrue(np.isnan(metrics['candidate_distance']))
@@ -0,0 +1,72 @@
+import unittest
+
+import numpy as np
+
+import streamlines as sl
+from streamlines.asarray import mdf
+from streamlines.confidence import cluster_confidence
+from streamlines.confidence import confidence_scores
+from streamlines.criteria import ClusterConfidence
+from streamlines.criteria import Selection
+
+
+class TestConfidence(unittest.TestCase):
+
+    def setUp(self):
+
+        # A bundle of parallel lines along x and an outlier along z.
+        rng = np.random.RandomState(0)
+        x = np.linspace(0, 20, 30)
+        self.streamlines = sl.Streamlines(
+            [np.array([x, np.full_like(x, y), np.full_like(x, z)]).T
+             for y, z in rng.uniform(-2, 2, (40, 2))] +
+            [np.array([np.zeros_like(x), np.zeros_like(x), x + 10]).T])
+
+    def test_confidence_scores(self):
+        """Test the cluster confidence index against all pairs"""
+
+        rng = np.random.RandomState(1)
+        resampled = rng.uniform(0, 10, (60, 12, 3))
+        resampled[1] = resampled[0]
+
+        # Sum the weights of all the pairs.
+        first, second = np.triu_indices(len(resampled), 1)
+        distances = mdf(resampled[first], resampled[second])
+        close = (distances < 6) & (distances > 0)
+        expected = np.zeros((len(resampled),))
+        np.add.at(expected, first[close], distances[close] ** -2)
+        np.add.at(expected, second[close], distances[close] ** -2)
+
+        # Small tiles must give the same scores as a single tile.
+        for max_pairs in (1, 100, 100000):
+            np.testing.assert_array_almost_equal(
+                confidence_scores(resampled, 6, 2, max_pairs), expected)
+
+        np.testing.assert_array_almost_equal(
+            confidence_scores(resampled, 6, 2, 100, processes=2), expected)
+
+        self.assertEqual(len(confidence_scores(np.zeros((0, 12, 3)))), 0)
+
+    def test_cluster_confidence(self):
+        """Test removing outliers with the cluster confidence index"""
+
+        scores, mask = cluster_confidence(self.streamlines, max_pairs=50)
+        self.assertEqual(scores[-1], 0)
+        self.assertTrue(np.all(scores[:-1] > 1))
+        self.assertTrue(np.all(mask))
+
+        scores, mask = cluster_confidence(self.streamlines, min_score=1)
+        np.testing.assert_array_equal(mask, [True] * 40 + [False])
+
+        self.streamlines.filter(criterion=ClusterConfidence(1))
+        self.assertEqual(len(self.streamlines), 40)
+
+    def test_selection(self):
+        """Test filtering streamlines with a precomputed selection"""
+
+        mask = np.arange(len(self.streamlines)) % 2 == 0
+        self.streamlines.filter(criterion=Selection(mask))
+        self.assertEqual(len(self.streamlines), 21)
+
+        self.assertRaises(ValueError, self.streamlines.filter,
+                          criterion=Selection(mask))
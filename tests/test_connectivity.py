@@ -0,0 +1,58 @@
+import unittest
+
+import numpy as np
+
+import streamlines as sl
+from streamlines.connectivity import Connectome, connectivity
+
+
+class TestConnectivity(unittest.TestCase):
+
+    def setUp(self):
+
+        # Three regions along x with background in between.
+        self.labels = np.zeros((5, 1, 1), dtype=int)
+        self.labels[0] = 1
+        self.labels[2] = 2
+        self.labels[4] = 3
+
+        self.streamlines = sl.Streamlines([
+            [[0, 0, 0], [4, 0, 0]],
+            [[4, 0, 0], [0, 0, 0]],
+            [[0, 0, 0], [1, 0, 0]],
+        ])
+        for value, streamline in zip([1.0, 3.0, 5.0], self.streamlines):
+            streamline.data['weight'] = np.array([value])
+
+    def test_connectivity(self):
+        """Test the connectivity function"""
+
+        connectome, assignments = connectivity(
+            self.streamlines, self.labels, affine=np.eye(4),
+            data_keys=['weight'])
+
+        np.testing.assert_array_equal(assignments, [[1, 3], [3, 1], [1, 0]])
+        np.testing.assert_array_equal(connectome.region_labels(), [1, 2, 3])
+
+        # The matrices are symmetric.
+        counts = connectome.counts.toarray()
+        self.assertEqual(counts[1, 3], 2)
+        self.assertEqual(counts[3, 1], 2)
+        self.assertEqual(counts[0, 1], 1)
+        np.testing.assert_array_almost_equal(
+            connectome.to_dense(connectome.counts),
+            [[0, 0, 2], [0, 0, 0], [2, 0, 0]])
+
+        self.assertAlmostEqual(connectome.mean_lengths[1, 3], 4.0)
+        self.assertAlmostEqual(connectome.mean_data('weight')[3, 1], 2.0)
+
+    def test_radius(self):
+        """Test assigning unlabeled endpoints to nearby labels"""
+
+        connectome = Connectome(self.labels, radius=1, affine=np.eye(4))
+        assignments = connectome.add(self.streamlines)
+        np.testing.assert_array_equal(assignments[2], [1, 1])
+
+        # Adding streamlines accumulates the counts.
+        connectome.add(self.streamlines)
+        self.assertEqual(connectome.counts[1, 3], 4)
@@ -0,0 +1,119 @@
+import unittest
+
+import numpy as np
+
+import streamlines as sl
+from streamlines.criteria import BoundingBox
+from streamlines.criteria import Curvature
+from streamlines.criteria import Data
+from streamlines.criteria import EndpointRegion
+from streamlines.criteria import Features
+from streamlines.criteria import Length
+from streamlines.criteria import NbPoints
+from streamlines.criteria import Roi
+from streamlines.criteria import Torsion
+from streamlines.criteria import Tortuosity
+from streamlines.criteria import TurningAngle
+
+
+class TestCriteria(unittest.TestCase):
+
+    def setUp(self):
+
+        # Three straight streamlines along x with lengths of 1, 2 and 3.
+        self.streamlines = sl.Streamlines([
+            [[0, 0, 0], [1, 0, 0]],
+            [[0, 0, 0], [1, 0, 0], [2, 0, 0]],
+            [[0, 0, 0], [1, 0, 0], [2, 0, 0], [3, 0, 0]],
+        ])
+        for i, streamline in enumerate(self.streamlines):
+            streamline.data['weight'] = np.array([i])
+        self.features = Features(self.streamlines)
+
+    def test_ranges(self):
+        """Test the range criteria"""
+
+        np.testing.assert_array_equal(
+            Length(1.5)(self.features), [False, True, True])
+        np.testing.assert_array_equal(
+            Length(maximum=2.5)(self.features), [True, True, False])
+        np.testing.assert_array_equal(
+            NbPoints(3, 3)(self.features), [False, True, False])
+        np.testing.assert_array_equal(
+            Data('weight', 1)(self.features), [False, True, True])
+
+    def test_geometry(self):
+        """Test the geometry criteria"""
+
+        # A streamline with a right angle and a straight streamline.
+        features = Features(sl.Streamlines([
+            [[0, 0, 0], [1, 0, 0], [1, 1, 0]],
+            [[0, 0, 0], [1, 0, 0], [2, 0, 0]],
+        ]))
+
+        np.testing.assert_array_equal(
+            TurningAngle(maximum=45)(features), [False, True])
+        np.testing.assert_array_equal(
+            Curvature(maximum=0.5)(features), [False, True])
+        np.testing.assert_array_equal(
+            Curvature(minimum=2, reduction='mean')(features), [True, False])
+        np.testing.assert_array_equal(
+            Torsion(maximum=0)(features), [True, True])
+        np.testing.assert_array_equal(
+            Tortuosity(maximum=1.2)(features), [False, True])
+
+        self.assertRaises(ValueError, Curvature, reduction='median')
+
+    def test_regions(self):
+        """Test the box criteria"""
+
+        box = BoundingBox([-1, -1, -1], [2.5, 1, 1])
+        np.testing.assert_array_equal(
+            box(self.features), [True, True, False])
+
+        region = EndpointRegion([2.5, -1, -1], [3.5, 1, 1])
+        np.testing.assert_array_equal(
+            region(self.features), [False, False, True])
+
+        region = EndpointRegion([-1, -1, -1], [1.5, 1, 1], 'both')
+        np.testing.assert_array_equal(
+            region(self.features), [True, False, False])
+
+        self.assertRaises(
+            ValueError, EndpointRegion, [0, 0, 0], [1, 1, 1], 'none')
+
+    def test_roi(self):
+        """Test the region of interest criterion"""
+
+        # The streamlines are in native RAS without a transform to voxel
+        # space, the affine of the mask is used.
+        mask = np.zeros((4, 1, 1))
+        mask[2] = 1
+        affine = np.eye(4)
+
+        np.testing.assert_array_equal(
+            Roi(mask, 'include', affine)(self.features), [False, True, True])
+        np.testing.assert_array_equal(
+            Roi(mask, 'exclude', affine)(self.features), [True, False, False])
+        np.testing.assert_array_equal(
+            Roi(mask, 'endpoints', affine)(self.features),
+            [False, True, False])
+        self.assertRaises(ValueError, Roi(mask), self.features)
+
+    def test_combinations(self):
+        """Test combining criteria with boolean operators"""
+
+        short = Length(maximum=1.5)
+        long = Length(2.5)
+        np.testing.assert_array_equal(
+            (short | long)(self.features), [True, False, True])
+        np.testing.assert_array_equal(
+            (~short & ~long)(self.features), [False, True, False])
+
+    def test_filter(self):
+        """Test filtering streamlines with criteria"""
+
+        self.streamlines.filter(
+            max_length=2.5, criterion=NbPoints(3) | Data('weight', 0, 0))
+        self.assertEqual(len(self.streamlines), 2)
+        self.assertEqual(len(self.streamlines[1]), 3)
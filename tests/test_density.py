@@ -0,0 +1,38 @@
+import unittest
+
+import numpy as np
+
+import streamlines as sl
+from streamlines.density import endpoint_density, track_density
+
+
+class TestDensity(unittest.TestCase):
+
+    def setUp(self):
+        self.streamlines = sl.Streamlines([
+            [[0, 0, 0], [3, 0, 0]],
+            [[0, 0, 0], [0.1, 0, 0], [0.2, 0, 0], [1, 0, 0]],
+        ])
+
+    def test_track_density(self):
+        """Test the track_density function"""
+
+        # Without supersampling, only voxels that contain points are counted
+        # and streamlines are counted once per voxel.
+        counts = track_density(self.streamlines, (4, 1, 1), np.eye(4))
+        np.testing.assert_array_equal(counts.ravel(), [2, 1, 0, 1])
+
+        # With supersampling, voxels crossed by segments are also counted.
+        counts = track_density(
+            self.streamlines, (4, 1, 1), np.eye(4), step=0.5)
+        np.testing.assert_array_equal(counts.ravel(), [2, 2, 1, 1])
+
+        # Counts can be accumulated.
+        track_density(self.streamlines, (4, 1, 1), np.eye(4), out=counts)
+        np.testing.assert_array_equal(counts.ravel(), [4, 3, 1, 2])
+
+    def test_endpoint_density(self):
+        """Test the endpoint_density function"""
+
+        counts = endpoint_density(self.streamlines, (4, 1, 1), np.eye(4))
+        np.testing.assert_array_equal(counts.ravel(), [2, 1, 0, 1])
@@ -131,3 +131,66 @@ class TestIO(unittest.TestCase):
 
         new_voxel_sizes = recovered_streamlines.coordinate_system.voxel_sizes
         np.testing.assert_array_almost_equal(voxel_sizes, new_voxel_sizes)
+
+    def test_chunks(self):
+        """Test loading and saving streamlines in chunks"""
+
+        streamlines = sl.Streamlines(np.random.randn(9, 10, 3))
+        for i, streamline in enumerate(streamlines):
+            streamline.data['weight'] = np.array([i])
+
+        output = NamedTemporaryFile(mode='w', delete=True, suffix='.trk').name
+        sl.io.save(streamlines, output)
+
+        chunks = list(sl.io.load_chunks(output, 4))
+        self.assertEqual([len(c) for c in chunks], [4, 4, 1])
+
+        chunked_output = NamedTemporaryFile(
+            mode='w', delete=True, suffix='.trk').name
+        sl.io.save_chunks(chunks, chunked_output)
+        recovered_streamlines = sl.io.load(chunked_output)
+
+        self.assertEqual(len(recovered_streamlines), 9)
+        for i, (streamline, recovered) in enumerate(
+                zip(streamlines, recovered_streamlines)):
+            np.testing.assert_almost_equal(
+                streamline.points, recovered.points, 5)
+            self.assertEqual(recovered.data['weight'][0], i)
+
+    def test_prefetch(self):
+        """Test iterating on a background thread"""
+
+        self.assertEqual(list(sl.io.prefetch(range(10), 2)), list(range(10)))
+
+        # Errors of the iterable are raised by the consumer.
+        def failing():
+            yield 1
+            raise RuntimeError('failed')
+
+        items = sl.io.prefetch(failing())
+        self.assertEqual(next(items), 1)
+        with self.assertRaises(RuntimeError):
+            next(items)
+
+        # The consumer can stop early.
+        items = sl.io.prefetch(iter(range(1000)), 1)
+        self.assertEqual(next(items), 0)
+        items.close()
+
+    def test_map_chunks(self):
+        """Test processing a file in chunks with prefetching"""
+
+        streamlines = sl.Streamlines(np.random.randn(9, 10, 3))
+        output = NamedTemporaryFile(mode='w', delete=True, suffix='.trk').name
+        sl.io.save(streamlines, output)
+
+        reversed_output = NamedTemporaryFile(
+            mode='w', delete=True, suffix='.trk').name
+        sl.io.map_chunks(lambda c: c.reverse(), output,
+                         reversed_output, chunk_size=4)
+        recovered_streamlines = sl.io.load(reversed_output)
+
+        self.assertEqual(len(recovered_streamlines), 9)
+        for streamline, recovered in zip(streamlines, recovered_streamlines):
+            np.testing.assert_almost_equal(
+                streamline.points[::-1], recovered.points, 5)
@@ -0,0 +1,54 @@
+import unittest
+
+import numpy as np
+
+from streamlines.ordering import hilbert_keys
+from streamlines.ordering import morton_keys
+from streamlines.ordering import spatial_order
+from streamlines.packed import pack
+
+
+class TestOrdering(unittest.TestCase):
+
+    def test_keys(self):
+        """Test the keys of the space-filling curves"""
+
+        for bits in (1, 2, 3):
+            cells = np.indices((2 ** bits,) * 3).reshape((3, -1)).T
+
+            # The keys number all the cells of the grid.
+            for keys in (morton_keys, hilbert_keys):
+                np.testing.assert_array_equal(
+                    np.sort(keys(cells, bits)), np.arange(len(cells)))
+
+            # Consecutive cells along the Hilbert curve are adjacent.
+            path = cells[np.argsort(hilbert_keys(cells, bits))]
+            np.testing.assert_array_equal(
+                np.abs(np.diff(path, axis=0)).sum(1), 1)
+
+        np.testing.assert_array_equal(
+            morton_keys([[1, 0, 0], [0, 1, 0], [0, 0, 1], [3, 3, 3]]),
+            [1, 2, 4, 63])
+
+    def test_spatial_order(self):
+        """Test sorting streamlines along space-filling curves"""
+
+        # Streamlines at positions 2, 0, 3, 1 along x, one of them reversed,
+        # and an empty streamline.
+        line = np.array([[0, 0, 0], [0.1, 0, 0], [0.2, 0, 0], [0.3, 0, 0]])
+        arrays = [line + [2, 0, 0], line, (line + [3, 0, 0])[::-1],
+                  np.zeros((0, 3)), line + [1, 0, 0]]
+        points, offsets = pack(arrays)
+
+        for curve in ('morton', 'hilbert'):
+            for anchor in ('midpoint', 'endpoints'):
+                np.testing.assert_array_equal(
+                    spatial_order(points, offsets, curve, anchor),
+                    [1, 4, 0, 2, 3])
+
+        self.assertRaises(ValueError, spatial_order, points, offsets, 'peano')
+        self.assertRaises(
+            ValueError, spatial_order, points, offsets, anchor='start')
+        self.assertRaises(ValueError, spatial_order, points, offsets, bits=22)
+
+        self.assertEqual(len(spatial_order(*pack([]))), 0)
@@ -0,0 +1,182 @@
+import unittest
+
+import numpy as np
+
+from streamlines.asarray import length
+from streamlines.asarray import resample as resample_streamline
+from streamlines.packed import bounding_boxes, curvatures, endpoints
+from streamlines.packed import interior, lengths, pack, reduce_all
+from streamlines.packed import reduce_any, reduce_max, reduce_mean
+from streamlines.packed import resample, simplify, torsions, tortuosities
+from streamlines.packed import turning_angles, unpack
+
+
+class TestPacked(unittest.TestCase):
+
+    def setUp(self):
+        self.arrays = [np.random.randn(n, 3) for n in [0, 3, 1, 0, 5, 2, 0]]
+        self.points, self.offsets = pack(self.arrays)
+
+    def test_pack(self):
+        """Test packing and unpacking streamlines"""
+
+        np.testing.assert_array_equal(
+            self.offsets, [0, 0, 3, 4, 4, 9, 11, 11])
+        self.assertEqual(self.points.shape, (11, 3))
+
+        for array, unpacked in zip(self.arrays, unpack(*pack(self.arrays))):
+            np.testing.assert_array_equal(array, unpacked)
+
+        # Packing no streamlines is valid.
+        points, offsets = pack([])
+        self.assertEqual(points.shape, (0, 3))
+        np.testing.assert_array_equal(offsets, [0])
+
+    def test_lengths(self):
+        """Test the lengths function"""
+
+        expected = [length(a) for a in self.arrays]
+        np.testing.assert_array_almost_equal(
+            lengths(self.points, self.offsets), expected)
+
+    def test_bounding_boxes(self):
+        """Test the bounding_boxes function"""
+
+        minimums, maximums = bounding_boxes(self.points, self.offsets)
+        for array, minimum, maximum in zip(self.arrays, minimums, maximums):
+            if len(array) == 0:
+                self.assertTrue(np.all(np.isnan(minimum)))
+            else:
+                np.testing.assert_array_equal(minimum, array.min(0))
+                np.testing.assert_array_equal(maximum, array.max(0))
+
+    def test_endpoints(self):
+        """Test the endpoints function"""
+
+        starts, ends = endpoints(self.points, self.offsets)
+        np.testing.assert_array_equal(starts[1], self.arrays[1][0])
+        np.testing.assert_array_equal(ends[4], self.arrays[4][-1])
+        self.assertTrue(np.all(np.isnan(starts[0])))
+
+    def test_reduce(self):
+        """Test the segmented any and all reductions"""
+
+        values = self.points[:, 0] > 0
+        np.testing.assert_array_equal(
+            reduce_any(values, self.offsets),
+            [np.any(a[:, 0] > 0) for a in self.arrays])
+        np.testing.assert_array_equal(
+            reduce_all(values, self.offsets),
+            [np.all(a[:, 0] > 0) for a in self.arrays])
+
+    def test_reduce_max_mean(self):
+        """Test the segmented maximum and mean reductions"""
+
+        values = self.points[:, 0]
+        np.testing.assert_array_almost_equal(
+            reduce_max(values, self.offsets),
+            [a[:, 0].max() if len(a) > 0 else 0 for a in self.arrays])
+        np.testing.assert_array_almost_equal(
+            reduce_mean(values, self.offsets),
+            [a[:, 0].mean() if len(a) > 0 else 0 for a in self.arrays])
+
+        # Only the interior points are averaged.
+        np.testing.assert_array_almost_equal(
+            reduce_mean(values, self.offsets, interior(self.offsets)),
+            [a[1:-1, 0].mean() if len(a) > 2 else 0 for a in self.arrays])
+
+    def test_geometry(self):
+        """Test the curvature, torsion and turning angles"""
+
+        # A helix of radius 3 and pitch 2 pi has a curvature of 0.3 and a
+        # torsion of 0.1.
+        t = np.linspace(0, 4 * np.pi, 400)
+        helix = np.array([3 * np.cos(t), 3 * np.sin(t), t]).T
+        x = np.arange(5.0)
+        line = np.array([x, 0 * x, 0 * x]).T
+        square = np.array([[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0],
+                           [0, 0, 0]])
+        points, offsets = pack([helix, line, square[:1], square])
+
+        values = unpack(curvatures(points, offsets), offsets)
+        np.testing.assert_array_almost_equal(values[0][1:-1], 0.3, 3)
+        self.assertEqual(values[0][0], 0)
+        np.testing.assert_array_equal(values[1], 0)
+        np.testing.assert_array_equal(values[2], 0)
+
+        values = unpack(torsions(points, offsets), offsets)
+        np.testing.assert_array_almost_equal(values[0][2:-2], 0.1, 3)
+        np.testing.assert_array_equal(values[0][[0, 1, -2, -1]], 0)
+        np.testing.assert_array_equal(values[1], 0)
+
+        values = unpack(turning_angles(points, offsets), offsets)
+        np.testing.assert_array_almost_equal(values[3], [0, 90, 90, 90, 0])
+        np.testing.assert_array_almost_equal(values[1], 0)
+
+        np.testing.assert_array_almost_equal(
+            tortuosities(points, offsets)[1:], [1, 1, np.inf])
+        self.assertAlmostEqual(
+            tortuosities(points, offsets)[0],
+            length(helix) / np.linalg.norm(helix[-1] - helix[0]))
+
+    def test_resample(self):
+        """Test the resample function"""
+
+        resampled = resample(self.points, self.offsets, 4)
+        self.assertEqual(resampled.shape, (len(self.arrays), 4, 3))
+        for array, streamline in zip(self.arrays, resampled):
+            if len(array) == 0:
+                np.testing.assert_array_equal(streamline, 0)
+            elif len(array) == 1:
+                np.testing.assert_array_almost_equal(
+                    streamline, np.repeat(array, 4, axis=0))
+            else:
+                np.testing.assert_array_almost_equal(
+                    streamline[[0, -1]], array[[0, -1]])
+
+        # Points are interpolated linearly along the point index.
+        points, offsets = pack([np.array([[0, 0, 0], [1, 0, 0], [1, 2, 0]])])
+        np.testing.assert_array_almost_equal(
+            resample(points, offsets, 5)[0],
+            [[0, 0, 0], [0.5, 0, 0], [1, 0, 0], [1, 1, 0], [1, 2, 0]])
+
+        # Cubic interpolation matches the resampling of a single streamline.
+        arrays = self.arrays + [np.random.randn(n, 3) for n in [4, 9, 9]]
+        resampled = resample(*pack(arrays), 7, 'cubic')
+        for array, streamline in zip(arrays, resampled):
+            np.testing.assert_array_almost_equal(
+                streamline, resample_streamline(array, 7))
+        self.assertRaises(
+            ValueError, resample, self.points, self.offsets, 4, 'nearest')
+
+    def test_simplify(self):
+        """Test the simplify function"""
+
+        # Straight streamlines are reduced to their endpoints, the corner of
+        # the second streamline is kept.
+        x = np.linspace(0, 10, 11)
+        zeros = np.zeros((11,))
+        straight = np.array([x, zeros, zeros]).T
+        turn = straight[-1] + straight[1:, [1, 0, 2]]
+        corner = np.concatenate((straight, turn))
+        points, offsets = pack([straight, corner, straight[:1]])
+
+        keep = simplify(points, offsets, 0.1)
+        kept = [np.flatnonzero(k) for k in unpack(keep, offsets)]
+        np.testing.assert_array_equal(kept[0], [0, 10])
+        np.testing.assert_array_equal(kept[1], [0, 10, 20])
+        np.testing.assert_array_equal(kept[2], [0])
+
+        # All removed points are within the tolerance.
+        noisy = straight + np.random.randn(11, 3) * 0.1
+        points, offsets = pack([noisy])
+        keep = simplify(points, offsets, 0.2)
+        for i in np.flatnonzero(~keep):
+            previous = np.flatnonzero(keep[:i])[-1]
+            following = i + np.flatnonzero(keep[i:])[0]
+            direction = noisy[following] - noisy[previous]
+            relative = noisy[i] - noisy[previous]
+            t = np.clip(np.dot(relative, direction) /
+                        np.dot(direction, direction), 0, 1)
+            self.assertLessEqual(
+                np.linalg.norm(relative - t * direction), 0.2)
@@ -0,0 +1,76 @@
+import unittest
+
+import numpy as np
+
+import streamlines as sl
+from streamlines.profiles import BundleProfile
+
+
+class TestBundleProfile(unittest.TestCase):
+
+    def setUp(self):
+
+        # A bundle along x with FA increasing along x. Half the streamlines
+        # are reversed and have different numbers of points.
+        self.streamlines = []
+        for i in range(10):
+            x = np.linspace(0, 10, 11 + 10 * (i % 3))
+            points = np.array([x, np.full_like(x, i - 4.5), 0 * x]).T
+            fa = np.array([x / 10, 1 - x / 10])
+            if i % 2:
+                points, fa = points[::-1], fa[:, ::-1]
+            self.streamlines.append(sl.Streamline(points, {'fa': fa}))
+
+    def test_profile(self):
+        """Test the centroid and profiles of a bundle"""
+
+        profile = BundleProfile(nb_points=11, percentiles=(0, 50, 100))
+        flipped = profile.add(self.streamlines)
+
+        np.testing.assert_array_equal(flipped, [False, True] * 5)
+        self.assertEqual(profile.count, 10)
+        self.assertEqual(profile.keys, ['fa'])
+
+        x = np.linspace(0, 10, 11)
+        np.testing.assert_array_almost_equal(
+            profile.centroid, np.array([x, 0 * x, 0 * x]).T)
+        np.testing.assert_array_almost_equal(
+            profile.mean('fa'), [x / 10, 1 - x / 10])
+        np.testing.assert_array_almost_equal(profile.std('fa'), 0)
+        percentiles = profile.percentile('fa')
+        self.assertEqual(percentiles.shape, (3, 2, 11))
+        np.testing.assert_array_almost_equal(
+            percentiles[1], [x / 10, 1 - x / 10])
+
+    def test_chunks(self):
+        """Test that chunks give the same profiles"""
+
+        for streamline in self.streamlines:
+            streamline.data['fa'] = (
+                streamline.data['fa'] +
+                np.random.rand(*streamline.data['fa'].shape))
+
+        whole = BundleProfile(percentiles=())
+        whole.add(self.streamlines)
+        chunked = BundleProfile(percentiles=())
+        for start in range(0, 10, 3):
+            chunked.add(self.streamlines[start:start + 3])
+
+        np.testing.assert_array_almost_equal(chunked.centroid, whole.centroid)
+        np.testing.assert_array_almost_equal(
+            chunked.mean('fa'), whole.mean('fa'))
+        np.testing.assert_array_almost_equal(
+            chunked.std('fa'), whole.std('fa'))
+        with self.assertRaises(ValueError):
+            chunked.percentile('fa')
+
+    def test_streamlines(self):
+        """Test the profile method of Streamlines"""
+
+        streamlines = sl.Streamlines()
+        for streamline in self.streamlines:
+            streamlines.append(streamline)
+        profile = streamlines.profile(nb_points=5, chunk_size=4)
+        self.assertEqual(profile.count, 10)
+        self.assertEqual(profile.centroid.shape, (5, 3))
+        self.assertEqual(profile.percentile('fa').shape, (3, 2, 5))
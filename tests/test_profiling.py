@@ -0,0 +1,78 @@
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import streamlines as sl
+from streamlines.profiling import profiling
+from streamlines.profiling import timed
+
+
+class TestProfiling(unittest.TestCase):
+
+    def test_profiling(self):
+        """Test collecting records with the profiling context manager"""
+
+        streamlines = sl.Streamlines(np.random.randn(10, 20, 3))
+
+        with profiling() as profile:
+            streamlines.resample(30)
+            streamlines.smooth()
+
+        # There should be one record per operation with the number of
+        # streamlines and points.
+        names = [r['name'] for r in profile.records]
+        self.assertEqual(names, ['resample', 'smooth'])
+        self.assertEqual(profile.records[0]['nb_streamlines'], 10)
+        self.assertEqual(profile.records[0]['nb_points'], 200)
+        self.assertEqual(profile.records[1]['nb_points'], 300)
+        self.assertGreater(profile.records[0]['wall_time'], 0)
+
+        summary = profile.summary()
+        self.assertEqual(summary['smooth']['calls'], 1)
+
+        # Outside of the context, nothing is recorded.
+        streamlines.smooth()
+        self.assertEqual(len(profile.records), 2)
+
+    def test_load_and_save(self):
+        """Test that load and save are recorded"""
+
+        streamlines = sl.Streamlines(np.random.randn(5, 10, 3))
+
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'test.trk')
+            with profiling() as profile:
+                sl.io.save(streamlines, filename)
+                sl.io.load(filename)
+
+            output = os.path.join(directory, 'profile.json')
+            profile.dump(output)
+            with open(output) as f:
+                dumped = json.load(f)
+
+        names = [r['name'] for r in dumped['records']]
+        self.assertIn('save', names)
+        self.assertIn('load', names)
+        self.assertIn('load.decode', names)
+        load_record = dumped['records'][names.index('load')]
+        self.assertEqual(load_record['nb_streamlines'], 5)
+        self.assertEqual(load_record['nb_points'], 50)
+
+    def test_timed(self):
+        """Test the timed decorator"""
+
+        @timed('test')
+        def function(value):
+            return value + 1
+
+        # The decorated function is called normally with or without
+        # profiling.
+        self.assertEqual(function(1), 2)
+        with profiling() as profile:
+            self.assertEqual(function(2), 3)
+
+        self.assertEqual(len(profile.records), 1)
+        self.assertIsNone(profile.records[0]['nb_points'])
@@ -0,0 +1,97 @@
+import unittest
+
+import numpy as np
+
+import streamlines as sl
+from streamlines.asarray import mdf
+from streamlines.packed import pack, resample
+from streamlines.recognition import CentroidIndex
+
+
+class TestCentroidIndex(unittest.TestCase):
+
+    def setUp(self):
+
+        # Two bundles along x and y, with two centroids for y.
+        x = np.linspace(0, 10, 11)
+        zeros = np.zeros((11,))
+        self.along_x = np.array([x, zeros, zeros]).T
+        self.along_y = np.array([zeros, x, zeros]).T
+        self.index = CentroidIndex.from_bundles({
+            'x': sl.Streamlines([self.along_x]),
+            'y': sl.Streamlines([self.along_y, self.along_y + [0, 0, 5]]),
+        }, nb_points=11, block_size=3)
+
+    def test_query(self):
+        """Test the query method"""
+
+        subjects = [self.along_x + [0, 0, 1],
+                    self.along_y[::-1] + [0, 0, 4],
+                    self.along_x[::2] + [0, 1, 0]]
+        distances, indices = self.index.query(subjects, k=2)
+
+        np.testing.assert_array_equal(indices[:, 0], [0, 2, 0])
+        np.testing.assert_array_almost_equal(distances[:, 0], [1, 1, 1])
+        self.assertTrue(np.all(distances[:, 0] <= distances[:, 1]))
+
+        # The pruned results match an exhaustive search.
+        subjects = [np.random.randn(np.random.randint(2, 20), 3) * 5
+                    for _ in range(20)]
+        distances, indices = self.index.query(subjects, k=3)
+        for subject, d, i in zip(subjects, distances, indices):
+            resampled = resample(*pack([subject]), 11, 'cubic')[0]
+            expected = np.sort(mdf(resampled, self.index._centroids))
+            np.testing.assert_array_almost_equal(d, expected)
+            np.testing.assert_array_almost_equal(
+                mdf(resampled, self.index._centroids[i]), d)
+
+    def test_distances(self):
+        """Test that distances are the MDF distances of the streamlines"""
+
+        subjects = [sl.Streamline(np.random.randn(n, 3) * 5)
+                    for n in [2, 3, 4, 12]]
+        centroids = [sl.Streamline(np.random.randn(n, 3) * 5)
+                     for n in [3, 7, 20]]
+        index = CentroidIndex(centroids, ['a', 'b', 'c'], nb_points=20)
+        distances, indices = index.query(subjects, k=3)
+
+        for subject, d, i in zip(subjects, distances, indices):
+            expected = [min(subject.distance(centroids[j]),
+                            subject.distance(
+                                sl.Streamline(centroids[j].points).reverse()))
+                        for j in i]
+            np.testing.assert_array_almost_equal(d, expected)
+
+    def test_query_radius(self):
+        """Test the query_radius method"""
+
+        subjects = sl.Streamlines([self.along_y + [0, 0, 2.5],
+                                   self.along_x + [0, 0, 20]])
+        streamline_ids, centroid_ids, distances = self.index.query_radius(
+            subjects, 3)
+
+        np.testing.assert_array_equal(streamline_ids, [0, 0])
+        np.testing.assert_array_equal(np.sort(centroid_ids), [1, 2])
+        np.testing.assert_array_almost_equal(distances, [2.5, 2.5])
+
+    def test_recognize(self):
+        """Test the recognize method"""
+
+        self.assertEqual(self.index.bundles, ['x', 'y'])
+        subjects = [self.along_x[::-1], self.along_y + [0, 0, 4],
+                    self.along_x + [0, 0, 20]]
+        np.testing.assert_array_equal(
+            self.index.recognize(subjects, 2), [0, 1, -1])
+        self.assertEqual(len(self.index.recognize([], 2)), 0)
+
+    def test_recognize_empty_atlas(self):
+        """Test that nothing is recognized without centroids"""
+        index = CentroidIndex(sl.Streamlines(), [])
+        subjects = sl.Streamlines([self.along_x, self.along_y])
+        np.testing.assert_array_equal(index.recognize(subjects, 5), [-1, -1])
+        self.assertEqual(len(index.recognize([], 5)), 0)
+
+    def test_labels(self):
+        """Test that there must be one label per centroid"""
+        with self.assertRaises(ValueError):
+            CentroidIndex([self.along_x], ['x', 'y'])
@@ -0,0 +1,80 @@
+import os
+import tempfile
+import unittest
+
+from streamlines.cli.cache import ResultCache
+
+
+class TestResultCache(unittest.TestCase):
+
+    def setUp(self):
+
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.test_dir.name, 'cache')
+        self.input = os.path.join(self.test_dir.name, 'input.txt')
+        self.output = os.path.join(self.test_dir.name, 'output.txt')
+        with open(self.input, 'w') as f:
+            f.write('streamlines')
+
+        self.calls = 0
+
+    def tearDown(self):
+        self.test_dir.cleanup()
+
+    def command(self, input_filename, output_filename, factor=1):
+        """A command that repeats the contents of a file"""
+        self.calls += 1
+        with open(input_filename) as f:
+            contents = f.read()
+        with open(output_filename, 'w') as f:
+            f.write(contents * factor)
+
+    def run_command(self, cache, **kwargs):
+        parameters = {'input_filename': self.input,
+                      'output_filename': self.output}
+        parameters.update(kwargs)
+        return cache.run('command', self.command, parameters)
+
+    def read_output(self):
+        with open(self.output) as f:
+            return f.read()
+
+    def test_run(self):
+        """Test that outputs are reused for identical inputs"""
+
+        cache = ResultCache(self.cache_dir)
+        self.assertFalse(self.run_command(cache, factor=2))
+        os.remove(self.output)
+        self.assertTrue(self.run_command(cache, factor=2))
+        self.assertEqual(self.read_output(), 'streamlines' * 2)
+        self.assertEqual(self.calls, 1)
+
+        # Other parameters or input contents are cache misses.
+        self.assertFalse(self.run_command(cache, factor=3))
+        with open(self.input, 'w') as f:
+            f.write('other')
+        self.assertFalse(self.run_command(cache, factor=2))
+        self.assertEqual(self.read_output(), 'other' * 2)
+        self.assertEqual(self.calls, 3)
+
+        # Outputs can be hard links to the entries.
+        cache = ResultCache(self.cache_dir, link=True)
+        self.assertTrue(self.run_command(cache, factor=2))
+        self.assertEqual(self.read_output(), 'other' * 2)
+
+    def test_evict(self):
+        """Test that the least recently used entries are evicted"""
+
+        # Entries of 11, 22 and 33 bytes with a budget of 45 bytes.
+        cache = ResultCache(self.cache_dir, max_bytes=45)
+        for factor in [1, 2, 1]:
+            self.run_command(cache, factor=factor)
+        self.assertEqual(self.calls, 2)
+
+        # The entry of factor 2 is the least recently used and is evicted to
+        # make room for factor 3.
+        self.run_command(cache, factor=3)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+        self.assertTrue(self.run_command(cache, factor=1))
+        self.assertTrue(self.run_command(cache, factor=3))
+        self.assertFalse(self.run_command(cache, factor=2))
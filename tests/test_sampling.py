@@ -0,0 +1,86 @@
+import unittest
+import weakref
+
+import numpy as np
+
+import streamlines as sl
+from streamlines.sampling import subsample
+
+
+class TestSampling(unittest.TestCase):
+
+    def setUp(self):
+
+        # Streamlines of increasing lengths 1 to 100 in chunks of 7.
+        x = np.array([0.0, 1.0])
+        zeros = np.zeros((2,))
+        self.streamlines = sl.Streamlines(
+            [np.array([x * i, zeros, zeros]).T for i in range(1, 101)])
+
+    def _chunks(self, chunk_size):
+        """Splits the streamlines in chunks"""
+        for start in range(0, len(self.streamlines), chunk_size):
+            chunk = sl.Streamlines()
+            for streamline in self.streamlines[start:start + chunk_size]:
+                chunk.append(streamline)
+            yield chunk
+
+    def test_count(self):
+        """Test reservoir sampling of a fixed number of streamlines"""
+
+        sample = subsample(self._chunks(7), count=10, seed=1)
+        lengths = sample.lengths
+        self.assertEqual(len(sample), 10)
+        self.assertEqual(len(set(lengths)), 10)
+        self.assertEqual(lengths, sorted(lengths))
+
+        # The sample does not depend on the chunk size.
+        other = subsample(self._chunks(30), count=10, seed=1)
+        self.assertEqual(other.lengths, lengths)
+
+        # Asking for more streamlines than available returns all of them.
+        self.assertEqual(len(subsample(self._chunks(7), count=200)), 100)
+        self.assertEqual(len(subsample([], count=10)), 0)
+
+    def test_chunk_buffers(self):
+        """Test that the sample does not keep the chunk buffers alive"""
+
+        chunks = [sl.Streamlines([s.points for s in chunk]).geometry()
+                  for chunk in self._chunks(10)]
+        sample = subsample(chunks, count=5, seed=0)
+
+        buffers = [chunk[0]._array.base for chunk in chunks]
+        for streamline in sample:
+            self.assertFalse(any(
+                np.shares_memory(streamline._array, b) for b in buffers))
+            self.assertIsNone(streamline.data['curvature'].base)
+
+        blocks = [weakref.ref(b) for b in buffers]
+        del chunks, buffers
+        self.assertTrue(all(block() is None for block in blocks))
+
+        # The sampled streamlines keep their points and data.
+        self.assertEqual(len(sample), 5)
+        for streamline in sample:
+            self.assertEqual(streamline.data['curvature'].shape, (1, 2))
+
+    def test_fraction(self):
+        """Test sampling a fraction of the streamlines"""
+
+        sample = subsample(self._chunks(7), fraction=0.5, seed=2)
+        self.assertGreater(len(sample), 20)
+        self.assertLess(len(sample), 80)
+        self.assertEqual(len(subsample(self._chunks(7), fraction=0)), 0)
+
+        with self.assertRaises(ValueError):
+            subsample(self._chunks(7), count=10, fraction=0.5)
+
+    def test_length_bins(self):
+        """Test sampling stratified by length"""
+
+        sample = subsample(self._chunks(7), count=3,
+                           length_bins=[0, 10, 50, 100], seed=3)
+        lengths = np.array(sample.lengths)
+        self.assertEqual(len(sample), 9)
+        np.testing.assert_array_equal(
+            np.histogram(lengths, [0, 10, 50, 100])[0], [3, 3, 3])
@@ -0,0 +1,93 @@
+import pickle
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from unittest import mock
+
+import numpy as np
+
+import streamlines as sl
+from streamlines.serialization import SharedStreamlines
+
+
+def _sums(shared):
+    """Sums the points of shared streamlines in another process"""
+    with shared:
+        return [float(s._points.sum()) for s in shared.attach()]
+
+
+class TestSerialization(unittest.TestCase):
+
+    def setUp(self):
+        self.streamlines = sl.Streamlines(
+            [np.random.randn(n, 3) for n in [3, 0, 5]])
+        for i, streamline in enumerate(self.streamlines):
+            streamline.data['fa'] = np.random.rand(2, len(streamline))
+            streamline.data['id'] = np.array([i])
+
+    def assertStreamlinesEqual(self, streamlines, other):
+        self.assertEqual(len(streamlines), len(other))
+        self.assertEqual(
+            streamlines.coordinate_system, other.coordinate_system)
+        for streamline, other_streamline in zip(streamlines, other):
+            np.testing.assert_array_equal(
+                streamline.points, other_streamline.points)
+            self.assertEqual(
+                streamline.data.keys(), other_streamline.data.keys())
+            for key, value in streamline.data.items():
+                np.testing.assert_array_equal(
+                    value, other_streamline.data[key])
+
+    def test_pickle(self):
+        """Test pickling streamlines as contiguous buffers"""
+
+        unpickled = pickle.loads(pickle.dumps(self.streamlines))
+        self.assertStreamlinesEqual(self.streamlines, unpickled)
+
+        # With protocol 5, the buffers are transferred out-of-band.
+        buffers = []
+        data = pickle.dumps(
+            self.streamlines, protocol=5, buffer_callback=buffers.append)
+        self.assertGreater(len(buffers), 0)
+        unpickled = pickle.loads(data, buffers=buffers)
+        self.assertStreamlinesEqual(self.streamlines, unpickled)
+
+        # Streamlines with inconsistent data are also supported.
+        self.streamlines[0].data['extra'] = np.array([1.0])
+        unpickled = pickle.loads(pickle.dumps(self.streamlines))
+        self.assertStreamlinesEqual(self.streamlines, unpickled)
+
+    def test_pickle_streamline(self):
+        """Test pickling a single streamline"""
+
+        streamline = self.streamlines[0]
+        unpickled = pickle.loads(pickle.dumps(streamline))
+        np.testing.assert_array_equal(unpickled.points, streamline.points)
+        self.assertNotEqual(unpickled._token, streamline._token)
+        self.assertAlmostEqual(unpickled.length, streamline.length)
+
+    def test_shared_memory(self):
+        """Test attaching to streamlines in shared memory"""
+
+        with SharedStreamlines(self.streamlines) as shared:
+
+            # Other instances do not register the block with the resource
+            # tracker and only close their access to it.
+            with mock.patch('multiprocessing.resource_tracker.register') as \
+                    register:
+                other = pickle.loads(pickle.dumps(shared))
+            register.assert_not_called()
+            with other:
+                attached = other.attach()
+                self.assertStreamlinesEqual(self.streamlines, attached)
+                del attached
+            self.assertIsNone(other._shared_memory.buf)
+            self.assertStreamlinesEqual(self.streamlines, shared.attach())
+
+            with ProcessPoolExecutor(1) as executor:
+                sums = executor.submit(_sums, shared).result()
+            np.testing.assert_array_almost_equal(
+                sums, [s._points.sum() for s in self.streamlines])
+
+        self.streamlines[0].data['extra'] = np.array([1.0])
+        with self.assertRaises(ValueError):
+            SharedStreamlines(self.streamlines)
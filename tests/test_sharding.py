@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import streamlines as sl
+from streamlines.cli.commands.smooth import smooth
+from streamlines.io import load, save
+from streamlines.sharding import Operation, map_reduce, map_shards
+from streamlines.sharding import reduce_shards, shard, shard_filenames
+
+
+class TestSharding(unittest.TestCase):
+
+    def setUp(self):
+
+        # Streamlines with 2 to 11 points.
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.test_dir.name, 'test.trk')
+        self.streamlines = sl.Streamlines(
+            [np.random.randn(n, 3) for n in range(2, 12)])
+        save(self.streamlines, self.filename)
+
+    def tearDown(self):
+        self.test_dir.cleanup()
+
+    def test_shard(self):
+        """Test the shard function"""
+
+        directory = os.path.join(self.test_dir.name, 'shards')
+        filenames = shard(self.filename, directory, 3, chunk_size=4)
+        self.assertEqual(filenames, shard_filenames(directory, 3))
+        self.assertEqual([len(load(f)) for f in filenames], [3, 4, 3])
+
+        # Balancing points gives fewer long streamlines to the last shards.
+        filenames = shard(self.filename, directory, 3, 'points')
+        self.assertEqual([len(load(f)) for f in filenames], [5, 3, 2])
+
+        # Concatenating the shards gives back the original streamlines.
+        output = os.path.join(self.test_dir.name, 'reduced.trk')
+        reduce_shards(filenames, output, chunk_size=2)
+        for streamline, new_streamline in zip(self.streamlines, load(output)):
+            np.testing.assert_array_almost_equal(
+                streamline.points, new_streamline.points, 4)
+
+        # Extra shards are empty.
+        filenames = shard(self.filename, directory, 12)
+        self.assertEqual(sum(len(load(f)) for f in filenames), 10)
+
+        with self.assertRaises(ValueError):
+            shard(self.filename, directory, 3, 'length')
+
+    def test_map_reduce(self):
+        """Test running operations on shards"""
+
+        # Reversing the streamlines of each shard reverses all of them in
+        # the original order.
+        output = os.path.join(self.test_dir.name, 'reversed.trk')
+        map_reduce(Operation('reverse'), self.filename, output, 3,
+                   processes=2)
+        for streamline, new_streamline in zip(self.streamlines, load(output)):
+            np.testing.assert_array_almost_equal(
+                streamline.points[::-1], new_streamline.points, 4)
+
+        # CLI commands can also be mapped over shards.
+        directory = os.path.join(self.test_dir.name, 'shards')
+        inputs = shard(self.filename, directory, 2)
+        outputs = shard_filenames(directory, 2, '-smoothed')
+        map_shards(smooth, inputs, outputs, processes=1)
+        self.assertEqual(sum(len(load(f)) for f in outputs), 10)
+
+        with self.assertRaises(ValueError):
+            Operation('not_a_method')
@@ -0,0 +1,120 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import nibabel as nib
+import numpy as np
+
+import streamlines as sl
+from streamlines.io import tck
+
+
+class TestTck(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.test_dir.name, 'test.tck')
+        self.points = [np.random.randn(n, 3).astype(np.float32)
+                       for n in [10, 1, 2, 25, 3]]
+
+    def tearDown(self):
+        self.test_dir.cleanup()
+
+    def assertPointsEqual(self, streamlines, points):
+        self.assertEqual(len(streamlines), len(points))
+        for streamline, expected in zip(streamlines, points):
+            np.testing.assert_array_almost_equal(streamline.points, expected)
+
+    def test_save_and_load(self):
+        """Test saving and loading .tck files"""
+
+        streamlines = sl.Streamlines(self.points)
+        streamlines[0].data['weight'] = np.array([1])
+        sl.io.save(streamlines, self.filename)
+
+        recovered = sl.io.load(self.filename)
+        self.assertPointsEqual(recovered, self.points)
+        self.assertEqual(recovered.coordinate_system,
+                         streamlines.coordinate_system)
+
+        # The file can be read by nibabel.
+        tractogram = nib.streamlines.load(self.filename).tractogram
+        self.assertEqual(len(tractogram), len(self.points))
+        for loaded, expected in zip(tractogram.streamlines, self.points):
+            np.testing.assert_array_almost_equal(loaded, expected)
+
+        # An empty file.
+        sl.io.save(sl.Streamlines(), self.filename)
+        self.assertEqual(len(sl.io.load(self.filename)), 0)
+
+    def test_load_nibabel(self):
+        """Test loading a .tck file written by nibabel"""
+
+        tractogram = nib.streamlines.Tractogram(
+            self.points, affine_to_rasmm=np.eye(4))
+        nib.streamlines.save(tractogram, self.filename)
+
+        self.assertPointsEqual(sl.io.load(self.filename), self.points)
+
+    def test_chunks(self):
+        """Test reading and writing .tck files in chunks"""
+
+        sl.io.save(sl.Streamlines(self.points), self.filename)
+
+        # Streamlines span several small blocks.
+        with mock.patch.object(tck, '_BLOCK_SIZE', 4):
+            chunks = list(sl.io.load_chunks(self.filename, 2))
+        self.assertEqual([len(c) for c in chunks], [2, 2, 1])
+        self.assertPointsEqual(
+            [s for c in chunks for s in c], self.points)
+        for chunk_size, block_size in [(1, 4), (3, 13), (None, 4)]:
+            with mock.patch.object(tck, '_BLOCK_SIZE', block_size):
+                chunks = list(sl.io.load_chunks(self.filename, chunk_size))
+            self.assertPointsEqual(
+                [s for c in chunks for s in c], self.points)
+
+        output = os.path.join(self.test_dir.name, 'chunks.tck')
+        sl.io.save_chunks(chunks, output)
+        self.assertPointsEqual(sl.io.load(output), self.points)
+
+    def test_append(self):
+        """Test appending streamlines to a .tck file"""
+
+        tck.save(sl.Streamlines(self.points[:2]), self.filename)
+        tck.save(sl.Streamlines(self.points[2:]), self.filename, append=True)
+        self.assertPointsEqual(sl.io.load(self.filename), self.points)
+
+        with open(self.filename, 'rb') as f:
+            _, _, count = tck._read_header(f)
+        self.assertEqual(count, len(self.points))
+
+        # A count without padding, as written by MRtrix, is padded before
+        # streamlines are appended.
+        points, offsets = sl.packed.pack(self.points)
+        with open(self.filename, 'wb') as f:
+            f.write(b'mrtrix tracks\ndatatype: Float32LE\ncount: 5\n'
+                    b'file: . 71\ntimestamp: 0\nEND\n')
+            tck._write_points(f, points, offsets, np.dtype('<f4'))
+            np.full((1, 3), np.inf, '<f4').tofile(f)
+        self.assertPointsEqual(sl.io.load(self.filename), self.points)
+
+        tck.save(sl.Streamlines(self.points * 2), self.filename, append=True)
+        self.assertPointsEqual(sl.io.load(self.filename), self.points * 3)
+        with open(self.filename, 'rb') as f:
+            header, _, count = tck._read_header(f)
+        self.assertEqual(count, 15)
+        self.assertEqual(header['timestamp'], '0')
+
+        # Appending to a missing file creates it.
+        output = os.path.join(self.test_dir.name, 'new.tck')
+        tck.save_chunks([sl.Streamlines(self.points)], output, append=True)
+        self.assertPointsEqual(sl.io.load(output), self.points)
+
+    def test_invalid(self):
+        """Test that invalid files are rejected"""
+
+        with open(self.filename, 'wb') as f:
+            f.write(b'not a tck file\n')
+        with self.assertRaises(ValueError):
+            sl.io.load(self.filename)
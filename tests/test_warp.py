@@ -0,0 +1,61 @@
+import unittest
+
+import numpy as np
+
+import streamlines as sl
+from streamlines.voxels import interpolate
+from streamlines.warp import warp
+
+
+class TestWarp(unittest.TestCase):
+
+    def test_interpolate(self):
+        """Test the trilinear interpolation of volumes"""
+
+        # A volume that is linear in x.
+        volume = np.zeros((4, 2, 2, 2))
+        volume[..., 0] = np.arange(4)[:, None, None]
+        volume[..., 1] = 1
+
+        coordinates = np.array([[0.25, 0.5, 0.5],
+                                [2.5, 0.0, 1.0],
+                                [3.25, 1.0, 0.0],
+                                [-0.75, 0.0, 0.0],
+                                [np.nan, 0.0, 0.0]])
+        values = interpolate(volume, coordinates, fill=-1)
+
+        np.testing.assert_array_almost_equal(
+            values, [[0.25, 1], [2.5, 1], [3, 1], [-1, -1], [-1, -1]])
+
+    def test_warp(self):
+        """Test warping streamlines with a displacement field"""
+
+        # A field that translates by 1 mm along y for x < 2 and by 2 mm
+        # along z for x >= 3, in a grid with 2 mm voxels.
+        field = np.zeros((5, 2, 2, 3))
+        field[:2, ..., 1] = 1
+        field[3:, ..., 2] = 2
+        affine = np.diag([0.5, 0.5, 0.5, 1])
+
+        x = np.array([0.0, 2.0, 6.0, 8.0])
+        zeros = np.zeros((4,))
+        points = np.array([x, zeros, zeros]).T
+        streamlines = sl.Streamlines([points, points[:2]])
+        streamlines[0].data['fa'] = np.array([[1, 2, 3, 4]])
+        streamlines.reverse()
+
+        warped = warp(streamlines, field, affine)
+
+        expected = np.array([[8, 0, 2], [6, 0, 2], [2, 1, 0], [0, 1, 0]])
+        np.testing.assert_array_almost_equal(warped[0].points, expected)
+        np.testing.assert_array_almost_equal(
+            warped[1].points, [[2, 1, 0], [0, 1, 0]])
+        np.testing.assert_array_equal(warped[0].data['fa'], [[4, 3, 2, 1]])
+        self.assertEqual(
+            warped.coordinate_system, streamlines.coordinate_system)
+
+        # The input streamlines are not modified.
+        np.testing.assert_array_equal(streamlines[0].points, points[::-1])
+
+        self.assertRaises(
+            ValueError, warp, streamlines, np.zeros((5, 2, 2)), affine)